@@ -8,47 +8,169 @@ import config
 from services.case_service import CaseService
 from services.handoff_service import HandoffService
 from services.agent_service import AgentForceService
+from services.message_cache import MessageCache
+from services.slack_scheduler import SlackScheduler, ScheduledWebClient
+from services.team_registry import TeamRegistry
+from services.work_queue import WorkQueue
+from services.dedup_service import EventDeduplicator
+from services.metrics import MetricsServer, registry
+from services.loop_monitor import LoopLagMonitor
+from services.profiler import Profiler
+from services.runbook_executor import RunbookExecutor
+from services.runbook_index import RunbookIndex
+from services.semantic_matcher import build_matcher
+from services.team_classifier import HandoffLog, build_classifier
+from services.log_pipeline import configure_logging
+from services.tracing import tracer
+from services.traffic_capture import TrafficRecorder
 
 # Import handlers
 from handlers.message_handlers import MessageHandlers
 from handlers.action_handlers import ActionHandlers
 
 # Configure logging
-logging.basicConfig(level=getattr(logging, config.LOG_LEVEL),
-                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+log_pipeline = configure_logging()
 logger = logging.getLogger(__name__)
 
 class SlackBot:
     def __init__(self):
         # Initialize the Slack app
         self.app = AsyncApp(token=config.SLACK_BOT_TOKEN)
-        logger.info(f"Initializing bot ")
+        # Per-request clients copy this; only changed to point at a local stand-in
+        self.app.client.base_url = config.SLACK_API_URL
+        self.socket_handler = None
+        self.traffic_recorder = None
+        logger.info("Initializing bot")
         
         # Initialize services
-        self.case_service = CaseService()
-        self.handoff_service = HandoffService()
         self.agent_service = AgentForceService()
+        self.message_cache = MessageCache()
+        self.slack_scheduler = SlackScheduler()
+        self.work_queue = WorkQueue()
+        self.deduplicator = EventDeduplicator()
+        self.team_registry = TeamRegistry()
+        self.runbook_index = RunbookIndex(matcher=build_matcher())
+        # Runs commands from RUNBOOK_DIR on this host, so it is opt-in
+        self.runbook_executor = RunbookExecutor() if config.RUNBOOK_EXECUTION_ENABLED else None
+        self.handoff_log = HandoffLog() if config.HANDOFF_LOG_PATH else None
+        self.case_service = CaseService(self.agent_service, self.message_cache, self.team_registry, build_classifier())
+        self.handoff_service = HandoffService(self.message_cache, self.team_registry, self.handoff_log)
+        self.metrics_server = MetricsServer()
+        self.loop_monitor = LoopLagMonitor()
+        self.profiler = Profiler()
+        # Local only, like /metrics: operators trigger a profile with curl
+        self.metrics_server.add_get("/debug/profile", self.profiler.handle_profile)
+        self.register_metrics()
+        
+        # Skip events Slack redelivers after slow acks or reconnects
+        @self.app.middleware
+        async def skip_duplicate_events(body, next, resp):
+            if body.get("type") == "event_callback" and await self.deduplicator.is_duplicate(body):
+                return resp
+            await next()
+        
+        # Route every outbound Slack call through the rate-limit scheduler
+        if config.SLACK_SCHEDULER_ENABLED:
+            @self.app.middleware
+            async def schedule_slack_calls(context, next):
+                context["client"] = ScheduledWebClient.wrap(context.client, self.slack_scheduler)
+                # Rebuild say() lazily so it uses the scheduled client
+                context.pop("say", None)
+                await next()
         
         # Register handlers
-        self.message_handlers = MessageHandlers(self.app, self.case_service, self.agent_service)
-        self.action_handlers = ActionHandlers(self.app, self.handoff_service, self.case_service)
+        self.message_handlers = MessageHandlers(self.app, self.case_service, self.agent_service, self.message_cache, self.work_queue,
+                                                self.runbook_index, self.runbook_executor)
+        self.action_handlers = ActionHandlers(self.app, self.handoff_service, self.case_service, self.message_cache, self.work_queue)
         
         # Register error handler directly
         @self.app.error
         async def handle_errors(error):
-            logger.error(f"Error: {error}")
+            logger.error("Error: %s", error)
+
+    def register_metrics(self):
+        """Expose service counters that are read when /metrics is scraped"""
+        registry.gauge("cases_in_flight", "Case jobs currently running", function=lambda: self.work_queue.in_flight)
+        registry.gauge("work_queue_depth", "Jobs waiting in the work queue", function=self.work_queue.queue.qsize)
+        registry.counter("work_queue_rejected_total", "Jobs rejected because the queue was full",
+                         function=lambda: self.work_queue.rejected)
+        registry.gauge("slack_scheduler_queue_depth", "Slack calls waiting for a rate limit token",
+                       function=lambda: self.slack_scheduler.queue_depth)
+        registry.counter("slack_updates_coalesced_total", "chat.update calls merged into a later one",
+                         function=lambda: self.slack_scheduler.coalesced)
+        registry.counter("message_cache_hits_total", "Original message lookups served from cache",
+                         function=lambda: self.message_cache.messages.hits)
+        registry.counter("message_cache_misses_total", "Original message lookups that called Slack",
+                         function=lambda: self.message_cache.messages.misses)
+        registry.counter("duplicate_events_total", "Redelivered Slack events that were skipped",
+                         function=lambda: self.deduplicator.hits)
+        registry.counter("agentforce_token_refreshes_total", "AgentForce OAuth token fetches",
+                         function=lambda: self.agent_service.token_manager.refresh_count)
+        registry.counter("agentforce_response_cache_hits_total", "AgentForce queries answered from the cache or a call in flight",
+                         function=lambda: self.agent_service.response_cache.hits)
+        registry.counter("agentforce_response_cache_misses_total", "AgentForce queries that made their own call",
+                         function=lambda: self.agent_service.response_cache.misses)
+        registry.gauge("agentforce_response_cache_hit_ratio", "Share of AgentForce queries served without a new call",
+                       function=lambda: self.agent_service.response_cache.hit_ratio)
+        registry.gauge("agentforce_response_cache_bytes", "Bytes of AgentForce replies held in memory",
+                       function=lambda: self.agent_service.response_cache.bytes)
+        registry.counter("event_loop_stalls_total", "Times the event loop lagged past LOOP_LAG_THRESHOLD",
+                         function=lambda: self.loop_monitor.stalls)
+        registry.gauge("teams_configured", "Teams in the routing table", function=lambda: len(self.team_registry.teams))
+        registry.counter("team_registry_reloads_total", "Times TEAMS_FILE was reloaded after a change",
+                         function=lambda: self.team_registry.reloads)
+        registry.gauge("runbooks_indexed", "Runbooks in the search index", function=lambda: len(self.runbook_index.snapshot.docs))
+        registry.counter("runbook_index_rebuilds_total", "Times the runbook index was rewritten after changes",
+                         function=lambda: self.runbook_index.rebuilds)
+        registry.counter("team_predictions_total", "Free-form cases given a team by the classifier",
+                         function=lambda: self.case_service.predictions)
+        registry.counter("handoff_decisions_logged_total", "Hand-offs written to HANDOFF_LOG_PATH for training",
+                         function=lambda: self.handoff_log.recorded if self.handoff_log else 0)
+        registry.counter("log_records_dropped_total", "Log records dropped because the log queue was full",
+                         function=lambda: log_pipeline.dropped)
+        registry.counter("log_records_sampled_out_total", "Log records skipped by LOG_SAMPLING",
+                         function=lambda: log_pipeline.sampled_out)
 
     async def start(self):
         """Start the Slack bot with Socket Mode"""
         try:
-            handler = AsyncSocketModeHandler(
+            # Open the shared AgentForce connection pool before events arrive
+            await self.agent_service.start()
+            await self.work_queue.start()
+            await self.team_registry.start()
+            await self.runbook_index.start()
+            await self.metrics_server.start()
+            await self.loop_monitor.start()
+            
+            self.socket_handler = AsyncSocketModeHandler(
                 app_token=config.SLACK_APP_TOKEN,
                 app=self.app
             )
+            if config.SOCKET_MODE_CAPTURE_PATH:
+                # Record incoming envelopes for benchmarks/replay.py
+                self.traffic_recorder = TrafficRecorder(
+                    config.SOCKET_MODE_CAPTURE_PATH,
+                    redact_content=config.SOCKET_MODE_CAPTURE_REDACT
+                )
+                self.socket_handler.client.message_listeners.append(self.traffic_recorder.record)
             logger.info("Starting Socket Mode handler...")
-            await handler.start_async()
+            await self.socket_handler.start_async()
         except Exception as e:
-            logger.exception(f"Failed to start app: {e}")
+            logger.exception("Failed to start app: %s", e)
+        finally:
+            if self.socket_handler is not None:
+                await self.socket_handler.close_async()
+            if self.traffic_recorder is not None:
+                self.traffic_recorder.close()
+            self.loop_monitor.close()
+            await self.metrics_server.close()
+            await self.work_queue.close()
+            await self.team_registry.close()
+            await self.runbook_index.close()
+            await self.agent_service.close()
+            self.deduplicator.close()
+            tracer.close()
+            log_pipeline.close()
 
 # Run the app
 if __name__ == "__main__":
@@ -0,0 +1,52 @@
+import argparse
+import logging
+import asyncio
+import config
+
+# Import services
+from services.agent_service import AgentForceService
+from services.backfill_service import BackfillCheckpoint, BackfillService
+from services.case_service import CaseService
+from services.message_cache import MessageCache
+from services.slack_scheduler import SlackScheduler, ScheduledWebClient
+from services.team_classifier import build_classifier
+from services.team_registry import TeamRegistry
+from services.log_pipeline import configure_logging
+from services.tracing import tracer
+
+# Configure logging
+log_pipeline = configure_logging()
+logger = logging.getLogger(__name__)
+
+async def backfill(args):
+    """Triage central_case messages that arrived while the bot was down"""
+    client = ScheduledWebClient(token=config.SLACK_BOT_TOKEN)
+    client.scheduler = SlackScheduler()
+
+    agent_service = AgentForceService()
+    # Same routing as the live bot, including predicted teams for free-form messages
+    case_service = CaseService(agent_service, MessageCache(), TeamRegistry(), build_classifier())
+    service = BackfillService(
+        client,
+        case_service,
+        BackfillCheckpoint(args.checkpoint),
+        concurrency=args.concurrency,
+        include_handled=args.include_handled
+    )
+    try:
+        await agent_service.start()
+        await service.run(channel=args.channel, since=args.since)
+    finally:
+        await agent_service.close()
+        tracer.close()
+        log_pipeline.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill missed cases from the central case channel")
+    parser.add_argument("--channel", default=config.CENTRAL_CASE_CHANNEL_ID, help="Channel ID to backfill")
+    parser.add_argument("--since", help="Only backfill messages newer than this Slack ts")
+    parser.add_argument("--checkpoint", default="backfill_checkpoint.json", help="Checkpoint file used to resume")
+    parser.add_argument("--concurrency", type=int, default=4, help="Messages processed at once")
+    parser.add_argument("--include-handled", action="store_true",
+                        help="Also reprocess messages the bot has already replied to")
+    asyncio.run(backfill(parser.parse_args()))
@@ -0,0 +1,152 @@
+"""Microbenchmark: CaseParser against the previous four-regex parser.
+
+Run from the employee-app directory:
+
+    python benchmarks/bench_case_parser.py [number_of_messages]
+"""
+import logging
+import os
+import random
+import re
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.case_parser import CaseParser
+
+TEAMS = ["Support", "Sales", "Engineering", "IAM team"]
+SUMMARIES = [
+    "Customer is having trouble logging in",
+    "Invoice totals do not match the quote",
+    "API returns 500 errors for bulk uploads",
+    "SSO failure for all users in the EU org",
+]
+
+class LegacyCaseParser:
+    """The previous parser, verbatim: four uncompiled re.search scans per message"""
+
+    def parse_case_text(self, text):
+        """
+        Parse case text with the following format:
+        
+        Case number: 12312
+        Summary: user a is having issues
+        Team: IAM team
+        Confidence: 80%
+        
+        Returns a dictionary with the parsed information or None if parsing fails.
+        """
+        try:
+            case_data = {}
+            
+            # Extract case number
+            case_number_match = re.search(r'Case number:\s*(.*?)(?:\n|$)', text)
+            if case_number_match:
+                case_data['case_number'] = case_number_match.group(1).strip()
+            
+            # Extract summary
+            summary_match = re.search(r'Summary:\s*(.*?)(?:\n|$)', text)
+            if summary_match:
+                case_data['summary'] = summary_match.group(1).strip()
+            
+            # Extract team
+            team_match = re.search(r'Team:\s*(.*?)(?:\n|$)', text)
+            if team_match:
+                case_data['team'] = team_match.group(1).strip().lower()
+            
+            # Extract confidence
+            confidence_match = re.search(r'Confidence:\s*(\d+)%', text)
+            if confidence_match:
+                confidence = int(confidence_match.group(1))
+                case_data['confidence'] = confidence
+            
+            # Check if all required fields are present
+            required_fields = ['case_number', 'summary', 'team', 'confidence']
+            if all(field in case_data for field in required_fields):
+                logger.info(f"Successfully parsed case: {case_data['case_number']} with confidence {case_data['confidence']}%")
+                return case_data
+            else:
+                missing = [field for field in required_fields if field not in case_data]
+                logger.warning(f"Case parsing failed, missing fields: {missing}")
+                return None
+                
+        except Exception as e:
+            logger.exception(f"Error parsing case text: {e}")
+            return None
+
+# Real-world shapes the synthetic corpus does not cover: (label, message, expected case number or None)
+EDGE_CASES = [
+    ("mention prefix", "<@U08N6BDLBKR> Case number: 101\nSummary: SSO down\nTeam: Support\nConfidence: 80%", "101"),
+    ("greeting prefix", "Hi! Case number: 102\nSummary: SSO down\nTeam: Support\nConfidence: 95%", "102"),
+    ("stray earlier Team line", "Team: fyi from the night shift\nCase number: 103\nSummary: SSO down\n"
+                                "Team: Engineering\nConfidence: 70%", "103"),
+    ("quoted bold fields", "> *Case number:* 104\n> *Summary:* SSO down\n> *Team:* Sales\n> *Confidence:* 91%", "104"),
+    ("incomplete block first", "Case number: 105\nSummary: draft\nCase number: 106\nSummary: SSO down\n"
+                               "Team: Sales\nConfidence: 50%", "106"),
+    ("empty case number", "Case number:\n107\nSummary: SSO down\nTeam: Support\nConfidence: 80%", None),
+    ("empty summary", "Case number: 108\nSummary:\nTeam: Support\nConfidence: 80%", None),
+]
+
+def check_edge_cases(parser):
+    """Print each edge case that parses to the wrong case; return how many did"""
+    failures = 0
+    for label, message, expected in EDGE_CASES:
+        case = parser.parse_case_text(message)
+        got = case['case_number'] if case else None
+        if got != expected:
+            failures += 1
+            print(f"FAIL {label}: expected {expected!r}, got {got!r}")
+    print(f"edge cases: {len(EDGE_CASES) - failures}/{len(EDGE_CASES)} parsed as expected")
+    return failures
+
+def make_message(rng, number):
+    if rng.random() < 0.3:
+        # Unstructured message, as in the central case channel
+        return f"Hey team, {rng.choice(SUMMARIES).lower()} since this morning, can someone look?"
+    return (
+        "New cases\n"
+        f"Case number: {number}\n"
+        f"Summary: {rng.choice(SUMMARIES)}\n"
+        f"Team: {rng.choice(TEAMS)}\n"
+        f"Confidence: {rng.randint(40, 99)}%\n"
+    )
+
+def bench(label, fn, messages):
+    started = time.perf_counter()
+    parsed = sum(1 for message in messages if fn(message))
+    elapsed = time.perf_counter() - started
+    print(f"{label:<32} {elapsed * 1000:9.1f} ms  {elapsed / len(messages) * 1e6:6.2f} us/msg  parsed={parsed}")
+    return elapsed
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    # Parsers log every result; keep the benchmark about parsing
+    logging.disable(logging.CRITICAL)
+
+    rng = random.Random(42)
+    messages = [make_message(rng, i) for i in range(count)]
+    legacy = LegacyCaseParser()
+    parser = CaseParser()
+
+    print(f"{count} messages")
+    old = bench("legacy parse_case_text", legacy.parse_case_text, messages)
+    new = bench("CaseParser.parse_case_text", parser.parse_case_text, messages)
+    print(f"speedup: {old / new:.2f}x")
+
+    dump = "\n".join(messages)
+    started = time.perf_counter()
+    cases = sum(1 for _ in parser.parse_many(dump))
+    elapsed = time.perf_counter() - started
+    print(f"{'CaseParser.parse_many (dump)':<32} {elapsed * 1000:9.1f} ms  cases={cases}")
+
+    sample = next(parser.parse_many(dump))
+    print(f"record size: {sys.getsizeof(sample)} bytes (dict: {sys.getsizeof(sample.to_dict())} bytes)")
+
+    if check_edge_cases(parser):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
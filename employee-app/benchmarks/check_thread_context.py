@@ -0,0 +1,71 @@
+"""Check that AgentForce threads keep their context when replies come from the response cache.
+
+Run from the employee-app directory:
+
+    python benchmarks/check_thread_context.py
+
+Two Slack threads ask the same first question. The second gets its reply
+from the response cache, then asks a follow-up. The follow-up must reach
+an AgentForce session that has already seen the first question. Exits 1
+if any check fails.
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_agentforce import FakeAgentForce
+
+QUESTION = "SSO is failing for all users in the EU org"
+FOLLOW_UP = "Which certificate should we rotate?"
+
+async def ask(service, text, conversation_key, stream):
+    if stream:
+        return "".join([chunk async for chunk in service.process_message_stream(text, conversation_key=conversation_key)])
+    return await service.process_message(text, conversation_key=conversation_key)
+
+async def check(service, agentforce, stream):
+    """Return a list of failure messages for one reply mode"""
+    mode = "stream" if stream else "request"
+    first, second = ("C1", f"{mode}-1"), ("C1", f"{mode}-2")
+    await ask(service, QUESTION, first, stream)
+    hits = service.response_cache.hits
+    await ask(service, QUESTION, second, stream)
+    failures = []
+    if service.response_cache.hits != hits + 1:
+        failures.append(f"{mode}: second thread's first message was not served from the cache")
+    await ask(service, FOLLOW_UP, second, stream)
+
+    session = service.session_cache.sessions.get(second)
+    history = agentforce.history.get(session.session_id) if session else None
+    if history != [QUESTION, FOLLOW_UP]:
+        failures.append(f"{mode}: follow-up session saw {history!r}, expected the question then the follow-up")
+    return failures
+
+async def main():
+    agentforce = await FakeAgentForce(latency=0.02, jitter=0.0).start()
+    os.environ.update({
+        "SALESFORCE_DOMAIN_URL": agentforce.url,
+        "AGENTFORCE_API_URL": agentforce.url,
+        "SALESFORCE_CONSUMER_KEY": "check-key",
+        "SALESFORCE_CONSUMER_SECRET": "check-secret",
+        "SALESFORCE_AGENT_ID": "0XxCHECK",
+        "AGENTFORCE_RESPONSE_CACHE_DB": "",
+    })
+    from services.agent_service import AgentForceService
+
+    service = AgentForceService()
+    try:
+        failures = await check(service, agentforce, stream=False) + await check(service, agentforce, stream=True)
+    finally:
+        await service.close()
+        await agentforce.close()
+    for failure in failures:
+        print(f"FAIL {failure}")
+    print(f"thread context: {4 - len(failures)}/4 checks passed")
+    return failures
+
+if __name__ == "__main__":
+    sys.exit(1 if asyncio.run(main()) else 0)
@@ -0,0 +1,129 @@
+"""Local stand-in for Salesforce OAuth and the AgentForce agent API.
+
+Point the bot at it with SALESFORCE_DOMAIN_URL and AGENTFORCE_API_URL set
+to http://127.0.0.1:<port>. Every endpoint waits for a configurable
+latency and fails with a 500 at a configurable rate.
+"""
+import logging
+import asyncio
+import json
+import random
+import uuid
+from collections import Counter, defaultdict
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+REPLY = ("Thanks for the details. This looks like a known issue with single sign-on after the "
+         "certificate rotation. Re-upload the IdP metadata and ask the user to sign in again.")
+
+class FakeAgentForce:
+    """Fake OAuth token endpoint and AgentForce sessions, messages and streaming"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.2, jitter=0.05, error_rate=0.0, chunks=5, token_ttl=3600):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.chunks = chunks
+        self.token_ttl = token_ttl
+        self.runner = None
+        self.calls = Counter()
+        self.errors = Counter()
+        self.sessions = set()
+        # session ID -> texts of the messages it received, in order
+        self.history = defaultdict(list)
+        self.rng = random.Random(7)
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/services/oauth2/token", self.handle_token)
+        app.router.add_post("/einstein/ai-agent/v1/agents/{agent_id}/sessions", self.handle_create_session)
+        app.router.add_post("/einstein/ai-agent/v1/sessions/{session_id}/messages", self.handle_message)
+        app.router.add_post("/einstein/ai-agent/v1/sessions/{session_id}/messages/stream", self.handle_stream)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+    async def simulate(self, operation, latency=None):
+        """Count the call, wait, and return an error response if this call should fail"""
+        self.calls[operation] += 1
+        delay = self.latency if latency is None else latency
+        await asyncio.sleep(max(0.0, delay + self.rng.uniform(-self.jitter, self.jitter)))
+        if self.rng.random() < self.error_rate:
+            self.errors[operation] += 1
+            return web.json_response({"error": "simulated failure"}, status=500)
+        return None
+
+    def authorized(self, request):
+        return request.headers.get("Authorization", "").startswith("Bearer fake-token-")
+
+    async def remember(self, request):
+        payload = await request.json()
+        self.history[request.match_info["session_id"]].append(payload["message"]["text"])
+
+    async def handle_token(self, request):
+        error = await self.simulate("token", self.latency / 2)
+        if error is not None:
+            return error
+        return web.json_response({
+            "access_token": f"fake-token-{uuid.uuid4().hex}",
+            "token_type": "Bearer",
+            "expires_in": self.token_ttl
+        })
+
+    async def handle_create_session(self, request):
+        error = await self.simulate("create_session")
+        if error is not None:
+            return error
+        if not self.authorized(request):
+            return web.json_response({"error": "invalid token"}, status=401)
+        session_id = str(uuid.uuid4())
+        self.sessions.add(session_id)
+        return web.json_response({"sessionId": session_id}, status=201)
+
+    async def handle_message(self, request):
+        error = await self.simulate("send_message")
+        if error is not None:
+            return error
+        if not self.authorized(request):
+            return web.json_response({"error": "invalid token"}, status=401)
+        if request.match_info["session_id"] not in self.sessions:
+            return web.json_response({"error": "session not found"}, status=404)
+        await self.remember(request)
+        return web.json_response({"messages": [{"type": "Inform", "message": REPLY}]})
+
+    async def handle_stream(self, request):
+        # Time to first chunk; the rest of the latency is spread over the chunks
+        error = await self.simulate("stream_message", self.latency / 2)
+        if error is not None:
+            return error
+        if not self.authorized(request):
+            return web.json_response({"error": "invalid token"}, status=401)
+        if request.match_info["session_id"] not in self.sessions:
+            return web.json_response({"error": "session not found"}, status=404)
+        await self.remember(request)
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        words = REPLY.split(" ")
+        step = max(1, len(words) // self.chunks)
+        for i in range(0, len(words), step):
+            chunk = " ".join(words[i:i + step]) + " "
+            await response.write(f"event: TextChunk\ndata: {json.dumps({'message': {'message': chunk}})}\n\n".encode())
+            await asyncio.sleep(self.latency / 2 / self.chunks)
+        await response.write(b"event: EndOfTurn\ndata: {}\n\n")
+        await response.write_eof()
+        return response
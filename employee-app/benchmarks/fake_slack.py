@@ -0,0 +1,206 @@
+"""Local stand-in for the Slack Web API and Socket Mode, used by the load test.
+
+Point the bot at it with SLACK_API_URL=http://127.0.0.1:<port>/api/. The
+server answers the Web API methods the bot uses, records every call, and
+pushes events and button clicks over a Socket Mode websocket.
+"""
+import logging
+import asyncio
+import itertools
+import json
+import time
+import uuid
+from collections import Counter
+from aiohttp import web, WSMsgType
+
+logger = logging.getLogger(__name__)
+
+BOT_USER_ID = "UBOTLOAD01"
+TEAM_ID = "TLOAD00001"
+APP_ID = "ALOAD00001"
+
+class FakeSlack:
+    """Fake Slack Web API plus a Socket Mode websocket endpoint"""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self.runner = None
+        self.calls = Counter()
+        self.messages = {}
+        self.socket = None
+        self.connected = asyncio.Event()
+        self.sent_at = {}
+        self.ack_latencies = []
+        self.waiters = {}
+        self._ts = itertools.count(1)
+        self._ts_base = int(time.time())
+
+    @property
+    def api_url(self):
+        return f"http://{self.host}:{self.port}/api/"
+
+    def next_ts(self):
+        return f"{self._ts_base}.{next(self._ts):06d}"
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_route("*", "/api/{method}", self.handle_api)
+        app.router.add_get("/socket-mode", self.handle_socket)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        # Pick up the port the OS assigned when port=0
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        if self.socket is not None:
+            await self.socket.close()
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+    # Web API
+
+    async def read_args(self, request):
+        args = dict(request.query)
+        if request.can_read_body:
+            if request.content_type == "application/json":
+                args.update(await request.json())
+            else:
+                args.update(await request.post())
+        return args
+
+    async def handle_api(self, request):
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        args = await self.read_args(request)
+        handler = getattr(self, "api_" + method.replace(".", "_"), None)
+        body = handler(args) if handler else {"ok": True}
+        return web.json_response(body)
+
+    def api_auth_test(self, args):
+        return {"ok": True, "user_id": BOT_USER_ID, "bot_id": "BLOAD00001", "team_id": TEAM_ID,
+                "user": "case-bot", "team": "load-test", "url": "https://load-test.slack.com/"}
+
+    def api_apps_connections_open(self, args):
+        return {"ok": True, "url": f"ws://{self.host}:{self.port}/socket-mode"}
+
+    def api_chat_postMessage(self, args):
+        channel = args.get("channel")
+        ts = self.next_ts()
+        message = {"type": "message", "user": BOT_USER_ID, "text": args.get("text", ""), "ts": ts}
+        if args.get("thread_ts"):
+            message["thread_ts"] = args["thread_ts"]
+        if args.get("blocks"):
+            message["blocks"] = args["blocks"] if not isinstance(args["blocks"], str) else json.loads(args["blocks"])
+        self.messages[(channel, ts)] = message
+        self.notify(channel, args.get("thread_ts"), message)
+        return {"ok": True, "channel": channel, "ts": ts, "message": message}
+
+    def api_chat_update(self, args):
+        channel, ts = args.get("channel"), args.get("ts")
+        message = self.messages.get((channel, ts))
+        if message is not None:
+            message["text"] = args.get("text", message["text"])
+        self.notify(channel, ts, message or {"ts": ts})
+        return {"ok": True, "channel": channel, "ts": ts, "text": args.get("text", "")}
+
+    def api_conversations_history(self, args):
+        message = self.messages.get((args.get("channel"), args.get("latest")))
+        return {"ok": True, "messages": [message] if message else [], "has_more": False}
+
+    # Completion tracking
+
+    def expect(self, channel, ts):
+        """Future resolved by the first bot reply in the thread, or update of the message, at (channel, ts)"""
+        future = asyncio.get_running_loop().create_future()
+        self.waiters[(channel, ts)] = future
+        return future
+
+    def notify(self, channel, ts, message):
+        future = self.waiters.pop((channel, ts), None)
+        if future is not None and not future.done():
+            future.set_result(message)
+
+    def add_user_message(self, channel, user, text, ts=None, thread_ts=None):
+        """Store a user message so conversations.history can return it"""
+        ts = ts or self.next_ts()
+        message = {"type": "message", "user": user, "text": text, "ts": ts}
+        if thread_ts:
+            message["thread_ts"] = thread_ts
+        self.messages[(channel, ts)] = message
+        return message
+
+    # Socket Mode
+
+    async def handle_socket(self, request):
+        ws = web.WebSocketResponse(autoping=True)
+        await ws.prepare(request)
+        self.socket = ws
+        await ws.send_json({
+            "type": "hello",
+            "num_connections": 1,
+            "debug_info": {"host": "fake-slack", "build_number": 1, "approximate_connection_time": 18060},
+            "connection_info": {"app_id": APP_ID}
+        })
+        self.connected.set()
+        async for msg in ws:
+            if msg.type == WSMsgType.TEXT:
+                ack = json.loads(msg.data)
+                sent = self.sent_at.pop(ack.get("envelope_id"), None)
+                if sent is not None:
+                    self.ack_latencies.append(time.perf_counter() - sent)
+        self.connected.clear()
+        return ws
+
+    async def wait_for_acks(self, timeout=10):
+        """Wait until the app has acknowledged every envelope sent so far"""
+        deadline = time.monotonic() + timeout
+        while self.sent_at and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+
+    async def send_envelope(self, envelope_type, payload):
+        """Push one Socket Mode envelope to the connected app"""
+        envelope_id = str(uuid.uuid4())
+        self.sent_at[envelope_id] = time.perf_counter()
+        await self.socket.send_json({
+            "envelope_id": envelope_id,
+            "type": envelope_type,
+            "payload": payload,
+            "accepts_response_payload": envelope_type == "interactive"
+        })
+        return envelope_id
+
+    async def send_message_event(self, channel, user, text, ts, thread_ts=None):
+        event = {"type": "message", "channel": channel, "user": user, "text": text, "ts": ts,
+                 "channel_type": "channel", "event_ts": ts}
+        if thread_ts:
+            event["thread_ts"] = thread_ts
+        return await self.send_envelope("events_api", {
+            "token": "verification-token",
+            "team_id": TEAM_ID,
+            "api_app_id": APP_ID,
+            "event": event,
+            "type": "event_callback",
+            "event_id": f"Ev{uuid.uuid4().hex[:10].upper()}",
+            "event_time": int(time.time()),
+            "authorizations": [{"team_id": TEAM_ID, "user_id": BOT_USER_ID, "is_bot": True}]
+        })
+
+    async def send_button_click(self, channel, user, message, action):
+        """Click a button from a bot message, as block_actions"""
+        return await self.send_envelope("interactive", {
+            "type": "block_actions",
+            "team": {"id": TEAM_ID, "domain": "load-test"},
+            "user": {"id": user, "username": user, "team_id": TEAM_ID},
+            "api_app_id": APP_ID,
+            "token": "verification-token",
+            "container": {"type": "message", "message_ts": message["ts"], "channel_id": channel, "is_ephemeral": False},
+            "trigger_id": f"{uuid.uuid4().int % 10**12}.trigger",
+            "channel": {"id": channel, "name": "central-case"},
+            "message": message,
+            "response_url": f"http://{self.host}:{self.port}/api/response_url",
+            "actions": [dict(action, block_id=action.get("block_id", "actions"), action_ts=str(time.time()))]
+        })
@@ -0,0 +1,66 @@
+"""Runs SlackBot in-process against the local Slack and AgentForce stand-ins."""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class BotUnderTest:
+    """Async context manager: start the stand-ins, point the bot at them and run it.
+
+    config is read when app is first imported, so the environment is set
+    before the import. env overrides or adds variables, e.g. channel IDs.
+    """
+
+    def __init__(self, slack, agentforce, env=None, slack_rate_limits=True):
+        self.slack = slack
+        self.agentforce = agentforce
+        self.env = env or {}
+        self.slack_rate_limits = slack_rate_limits
+        self.bot = None
+        self.task = None
+
+    def configure_environment(self):
+        os.environ.update({
+            "SLACK_BOT_TOKEN": "xoxb-load-test",
+            "SLACK_APP_TOKEN": "xapp-load-test",
+            "SLACK_SIGNING_SECRET": "load-test-signing-secret",
+            "SLACK_API_URL": self.slack.api_url,
+            "SALESFORCE_DOMAIN_URL": self.agentforce.url,
+            "AGENTFORCE_API_URL": self.agentforce.url,
+            "SALESFORCE_CONSUMER_KEY": "load-test-key",
+            "SALESFORCE_CONSUMER_SECRET": "load-test-secret",
+            "SALESFORCE_AGENT_ID": "0XxLOADTEST",
+            "METRICS_PORT": "0",
+            "SOCKET_MODE_CAPTURE_PATH": "",
+        })
+        if not self.slack_rate_limits:
+            os.environ["SLACK_SCHEDULER_ENABLED"] = "false"
+        os.environ.update(self.env)
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    async def __aenter__(self):
+        await self.slack.start()
+        await self.agentforce.start()
+        self.configure_environment()
+        from app import SlackBot
+
+        self.bot = SlackBot()
+        self.task = asyncio.create_task(self.bot.start())
+        await asyncio.wait_for(self.slack.connected.wait(), 10)
+        return self
+
+    async def drain(self):
+        """Wait for outstanding Socket Mode acks and the case work they queued"""
+        # Listeners queue their work before acking, so acks come first
+        await self.slack.wait_for_acks()
+        await self.bot.work_queue.queue.join()
+
+    async def __aexit__(self, *exc_info):
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        await self.agentforce.close()
+        await self.slack.close()
@@ -0,0 +1,249 @@
+"""End-to-end load test: drives SlackBot against local Slack and AgentForce stand-ins.
+
+Run from the employee-app directory:
+
+    python benchmarks/load_test.py --cases 500 --rate 50
+
+The bot runs in-process over a real Socket Mode websocket and real HTTP
+connections to fake_slack and fake_agentforce. Structured cases, generic
+messages, AgentForce requests and hand-off button clicks are sent in the
+proportions given, and the run reports throughput, p50/p99 time to first
+reply, and API calls per case. --max-p99-ms and --min-throughput turn the
+report into a pass/fail gate.
+
+The Slack rate-limit scheduler is off by default: every reply goes to one
+central channel, whose chat.postMessage limit is far below the default
+arrival rate, so with it on the run mostly measures time spent waiting
+for rate-limit tokens. Add --slack-rate-limits to include Slack's pacing.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_slack import FakeSlack
+from fake_agentforce import FakeAgentForce
+from harness import BotUnderTest
+
+logger = logging.getLogger(__name__)
+
+CENTRAL_CHANNEL = "CCENTRAL01"
+TEAM_CHANNELS = {
+    "SUPPORT_CHANNEL_ID": "CSUPPORT01",
+    "SALES_CHANNEL_ID": "CSALES0001",
+    "ENGINEERING_CHANNEL_ID": "CENGINEER1",
+    "IAM_CHANNEL_ID": "CIAM000001",
+}
+TEAMS = ["Support", "Sales", "Engineering", "IAM"]
+SUMMARIES = [
+    "Customer is having trouble logging in",
+    "Invoice totals do not match the quote",
+    "API returns 500 errors for bulk uploads",
+    "SSO failure for all users in the EU org",
+    "Password reset emails are not arriving",
+]
+
+# kind -> default share of incoming messages
+DEFAULT_MIX = {"auto_route": 0.4, "handoff": 0.25, "generic": 0.2, "agentforce": 0.15}
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(p * len(ordered)) - 1))]
+
+def parse_mix(text):
+    if not text:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in text.split(","):
+        kind, _, share = part.partition("=")
+        if kind not in DEFAULT_MIX:
+            raise SystemExit(f"Unknown message kind in --mix: {kind}")
+        mix[kind] = float(share)
+    total = sum(mix.values())
+    return {kind: share / total for kind, share in mix.items()}
+
+def build_message(kind, n, rng):
+    """Return the text a user would post for one case of the given kind"""
+    summary = rng.choice(SUMMARIES)
+    team = rng.choice(TEAMS)
+    if kind == "generic":
+        return f"Hi team, {summary.lower()}, can someone take a look?"
+    if kind == "agentforce":
+        return f"agentforce {summary}"
+    confidence = rng.randint(90, 99) if kind == "auto_route" else rng.randint(40, 89)
+    return f"Case number: {100000 + n}\nSummary: {summary}\nTeam: {team}\nConfidence: {confidence}%"
+
+def first_handoff_button(message):
+    for block in message.get("blocks") or []:
+        if block.get("type") == "actions":
+            for element in block.get("elements", []):
+                if element.get("action_id", "").startswith("handoff_"):
+                    return dict(element, block_id=block.get("block_id"))
+    return None
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.mix = parse_mix(args.mix)
+        self.slack = FakeSlack()
+        self.agentforce = FakeAgentForce(
+            latency=args.agentforce_latency,
+            jitter=args.agentforce_jitter,
+            error_rate=args.agentforce_error_rate
+        )
+        self.latencies = defaultdict(list)
+        self.timeouts = defaultdict(int)
+
+    async def send_case(self, n, kind):
+        """Post one message, wait for the bot's first reply, and maybe click a button"""
+        text = build_message(kind, n, self.rng)
+        ts = self.slack.next_ts()
+        self.slack.add_user_message(CENTRAL_CHANNEL, "UREPORTER%02d" % (n % 40), text, ts)
+        reply = self.slack.expect(CENTRAL_CHANNEL, ts)
+        started = time.perf_counter()
+        await self.slack.send_message_event(CENTRAL_CHANNEL, "UREPORTER%02d" % (n % 40), text, ts)
+        try:
+            message = await asyncio.wait_for(reply, self.args.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts[kind] += 1
+            return
+        self.latencies[kind].append(time.perf_counter() - started)
+
+        button = first_handoff_button(message)
+        if button is None or self.rng.random() >= self.args.click_ratio:
+            return
+        await asyncio.sleep(self.rng.uniform(0, self.args.think_time))
+        # The hand-off first updates the message that holds the buttons
+        updated = self.slack.expect(CENTRAL_CHANNEL, message["ts"])
+        started = time.perf_counter()
+        await self.slack.send_button_click(CENTRAL_CHANNEL, "UTRIAGER01", message, button)
+        try:
+            await asyncio.wait_for(updated, self.args.timeout)
+            self.latencies["click"].append(time.perf_counter() - started)
+        except asyncio.TimeoutError:
+            self.timeouts["click"] += 1
+
+    async def run(self):
+        env = dict(TEAM_CHANNELS, CENTRAL_CASE_CHANNEL_ID=CENTRAL_CHANNEL)
+        async with BotUnderTest(self.slack, self.agentforce, env, self.args.slack_rate_limits) as harness:
+            # Let the token and session pool warm up as they would in production
+            await asyncio.sleep(self.args.warmup)
+
+            kinds = list(self.mix)
+            weights = [self.mix[k] for k in kinds]
+            calls_before = sum(self.slack.calls.values())
+            started = time.perf_counter()
+            tasks = []
+            for n in range(self.args.cases):
+                kind = self.rng.choices(kinds, weights)[0]
+                tasks.append(asyncio.create_task(self.send_case(n, kind)))
+                if self.args.rate > 0:
+                    # Poisson arrivals at the requested rate
+                    await asyncio.sleep(self.rng.expovariate(self.args.rate))
+            await asyncio.gather(*tasks)
+            await harness.bot.work_queue.queue.join()
+            elapsed = time.perf_counter() - started
+            await harness.drain()
+            scheduler_wait = harness.bot.slack_scheduler.stats()["wait_seconds"]
+
+        return self.report(elapsed, sum(self.slack.calls.values()) - calls_before, scheduler_wait)
+
+    def report(self, elapsed, slack_calls, scheduler_wait):
+        cases = self.args.cases
+        answered = sum(len(v) for k, v in self.latencies.items() if k != "click")
+        all_latencies = [v for k, values in self.latencies.items() if k != "click" for v in values]
+        setup_methods = {"auth.test", "apps.connections.open"}
+        return {
+            "cases": cases,
+            "answered": answered,
+            "timed_out": dict(self.timeouts),
+            "elapsed_seconds": round(elapsed, 3),
+            "throughput_cases_per_second": round(cases / elapsed, 2) if elapsed else 0.0,
+            "latency_ms": {
+                kind: {
+                    "count": len(values),
+                    "p50": round(percentile(values, 0.5) * 1000, 1),
+                    "p99": round(percentile(values, 0.99) * 1000, 1)
+                }
+                for kind, values in sorted(self.latencies.items())
+            },
+            "p50_ms": round(percentile(all_latencies, 0.5) * 1000, 1),
+            "p99_ms": round(percentile(all_latencies, 0.99) * 1000, 1),
+            "socket_ack_p99_ms": round(percentile(self.slack.ack_latencies, 0.99) * 1000, 1),
+            "slack_calls_per_case": round(slack_calls / cases, 2),
+            "slack_calls_by_method": {
+                method: round(count / cases, 2)
+                for method, count in sorted(self.slack.calls.items()) if method not in setup_methods
+            },
+            "agentforce_calls_by_operation": {op: round(count / cases, 2) for op, count in sorted(self.agentforce.calls.items())},
+            "agentforce_errors": dict(self.agentforce.errors),
+            # Time calls spent waiting for rate-limit tokens; large values mean Slack's limits, not the bot, set the pace
+            "slack_scheduler_wait_seconds": {method: round(seconds, 2) for method, seconds in sorted(scheduler_wait.items())}
+        }
+
+def print_report(result):
+    print(f"Cases: {result['cases']} sent, {result['answered']} answered in {result['elapsed_seconds']}s "
+          f"({result['throughput_cases_per_second']} cases/s)")
+    if result["timed_out"]:
+        print(f"Timed out: {result['timed_out']}")
+    print(f"{'first reply':<12} {'count':>6} {'p50 ms':>9} {'p99 ms':>9}")
+    for kind, stats in result["latency_ms"].items():
+        print(f"{kind:<12} {stats['count']:>6} {stats['p50']:>9} {stats['p99']:>9}")
+    print(f"{'all cases':<12} {result['answered']:>6} {result['p50_ms']:>9} {result['p99_ms']:>9}")
+    print(f"Socket Mode ack p99: {result['socket_ack_p99_ms']} ms")
+    print(f"Slack API calls per case: {result['slack_calls_per_case']} {result['slack_calls_by_method']}")
+    print(f"AgentForce calls per case: {result['agentforce_calls_by_operation']}")
+    if any(result["slack_scheduler_wait_seconds"].values()):
+        print(f"Slack rate-limit wait (s): {result['slack_scheduler_wait_seconds']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the bot against local Slack and AgentForce stand-ins")
+    parser.add_argument("--cases", type=int, default=200, help="Messages to post to the central channel")
+    parser.add_argument("--rate", type=float, default=20, help="Arrival rate in messages per second, 0 for all at once")
+    parser.add_argument("--mix", help="Message shares, e.g. auto_route=0.4,handoff=0.25,generic=0.2,agentforce=0.15")
+    parser.add_argument("--click-ratio", type=float, default=0.6, help="Share of hand-off prompts that get a button click")
+    parser.add_argument("--think-time", type=float, default=0.5, help="Maximum delay before a button click, in seconds")
+    parser.add_argument("--agentforce-latency", type=float, default=0.2, help="Mean AgentForce response time in seconds")
+    parser.add_argument("--agentforce-jitter", type=float, default=0.05, help="AgentForce latency jitter in seconds")
+    parser.add_argument("--agentforce-error-rate", type=float, default=0.0, help="Share of AgentForce calls that fail")
+    parser.add_argument("--slack-rate-limits", action="store_true",
+                        help="Turn on the Slack rate-limit scheduler, as in production; replies then wait for the channel limit")
+    parser.add_argument("--warmup", type=float, default=1.0, help="Seconds to wait after connecting")
+    parser.add_argument("--timeout", type=float, default=30, help="Seconds to wait for each reply")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="Also write the report to this file")
+    parser.add_argument("--max-p99-ms", type=float, help="Fail if p99 time to first reply is above this")
+    parser.add_argument("--min-throughput", type=float, help="Fail if throughput in cases/s is below this")
+    args = parser.parse_args()
+
+    result = asyncio.run(LoadTest(args).run())
+    print_report(result)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+    failed = False
+    if args.max_p99_ms is not None and result["p99_ms"] > args.max_p99_ms:
+        print(f"FAIL: p99 {result['p99_ms']} ms is above {args.max_p99_ms} ms")
+        failed = True
+    if args.min_throughput is not None and result["throughput_cases_per_second"] < args.min_throughput:
+        print(f"FAIL: throughput {result['throughput_cases_per_second']} cases/s is below {args.min_throughput}")
+        failed = True
+    if result["timed_out"] and (args.max_p99_ms is not None or args.min_throughput is not None):
+        print(f"FAIL: {sum(result['timed_out'].values())} replies timed out")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Replay captured Socket Mode traffic through the bot against local stand-ins.
+
+Capture traffic by running the app with SOCKET_MODE_CAPTURE_PATH set,
+then, from the employee-app directory:
+
+    python benchmarks/replay.py capture.jsonl.gz --speed 1     # original timing
+    python benchmarks/replay.py capture.jsonl.gz --speed 10    # 10x faster
+    python benchmarks/replay.py capture.jsonl.gz --speed max   # as fast as possible
+
+Channel IDs come from the environment (or .env) as usual, so they match
+the capture. Add --profile to write cProfile stats for the replay, and
+--json to save the report for comparing builds on the same input.
+"""
+import argparse
+import asyncio
+import cProfile
+import json
+import math
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_slack import FakeSlack
+from fake_agentforce import FakeAgentForce
+from harness import BotUnderTest
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(p * len(ordered)) - 1))]
+
+def parse_speed(text):
+    """Return the replay speed multiplier, or None for as fast as possible"""
+    text = text.lower()
+    if text == "max":
+        return None
+    speed = float(text[:-1] if text.endswith("x") else text)
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be positive")
+    return speed
+
+def seed_messages(slack, records):
+    """Store captured messages so conversations.history lookups find them"""
+    for _, envelope in records:
+        event = (envelope.get("payload") or {}).get("event") or {}
+        if event.get("type") == "message" and event.get("channel") and event.get("ts"):
+            slack.add_user_message(event["channel"], event.get("user"), event.get("text", ""),
+                                   event["ts"], event.get("thread_ts"))
+
+async def replay(args):
+    from services.traffic_capture import read_capture
+
+    records = list(read_capture(args.capture))
+    if not records:
+        raise SystemExit(f"No envelopes in {args.capture}")
+    speed = args.speed
+
+    slack = FakeSlack()
+    agentforce = FakeAgentForce(latency=args.agentforce_latency, error_rate=args.agentforce_error_rate)
+    seed_messages(slack, records)
+    env = {"CENTRAL_CASE_CHANNEL_ID": args.central_channel} if args.central_channel else {}
+
+    profiler = cProfile.Profile() if args.profile else None
+    types = Counter()
+    lags = []
+    async with BotUnderTest(slack, agentforce, env, args.slack_rate_limits) as harness:
+        first = records[0][0]
+        started = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        for received_at, envelope in records:
+            if speed is not None:
+                due = (received_at - first) / speed
+                delay = due - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    lags.append(-delay)
+            types[envelope.get("type")] += 1
+            await slack.send_envelope(envelope.get("type"), envelope.get("payload"))
+        await harness.drain()
+        elapsed = time.perf_counter() - started
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+        queue_stats = harness.bot.work_queue.stats()
+
+    return {
+        "capture": args.capture,
+        "speed": "max" if speed is None else speed,
+        "envelopes": dict(types),
+        "captured_seconds": round(records[-1][0] - first, 3),
+        "elapsed_seconds": round(elapsed, 3),
+        "envelopes_per_second": round(len(records) / elapsed, 2) if elapsed else 0.0,
+        "dispatch_lag_p99_ms": round(percentile(lags, 0.99) * 1000, 1),
+        "ack_p50_ms": round(percentile(slack.ack_latencies, 0.5) * 1000, 1),
+        "ack_p99_ms": round(percentile(slack.ack_latencies, 0.99) * 1000, 1),
+        "slack_calls": dict(sorted(slack.calls.items())),
+        "agentforce_calls": dict(sorted(agentforce.calls.items())),
+        "queue_wait": queue_stats["queue_wait"],
+        "processing": queue_stats["processing"],
+        "failed_jobs": queue_stats["failed"]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured Socket Mode traffic against local stand-ins")
+    parser.add_argument("capture", help="Capture file written with SOCKET_MODE_CAPTURE_PATH")
+    parser.add_argument("--speed", type=parse_speed, default=1.0, help="1 for real time, N for N times faster, max")
+    parser.add_argument("--central-channel", help="Override CENTRAL_CASE_CHANNEL_ID for the replay")
+    parser.add_argument("--agentforce-latency", type=float, default=0.2, help="Mean AgentForce response time in seconds")
+    parser.add_argument("--agentforce-error-rate", type=float, default=0.0, help="Share of AgentForce calls that fail")
+    parser.add_argument("--no-slack-rate-limits", dest="slack_rate_limits", action="store_false",
+                        help="Turn the Slack rate-limit scheduler off, which production keeps on")
+    parser.add_argument("--profile", help="Write cProfile stats for the replay to this file")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    result = asyncio.run(replay(args))
+    print(json.dumps(result, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ load_dotenv()
 # Slack API tokens
 SLACK_BOT_TOKEN = os.environ.get("SLACK_BOT_TOKEN")
 SLACK_APP_TOKEN = os.environ.get("SLACK_APP_TOKEN")
+SLACK_API_URL = os.environ.get("SLACK_API_URL", "https://slack.com/api/")
 
 # Channel IDs
 CENTRAL_CASE_CHANNEL_ID = os.environ.get("CENTRAL_CASE_CHANNEL_ID")
@@ -14,6 +15,116 @@ SUPPORT_CHANNEL_ID = os.environ.get("SUPPORT_CHANNEL_ID")
 SALES_CHANNEL_ID = os.environ.get("SALES_CHANNEL_ID")
 ENGINEERING_CHANNEL_ID = os.environ.get("ENGINEERING_CHANNEL_ID")
 IAM_CHANNEL_ID = os.environ.get("IAM_CHANNEL_ID")
+
+# Team routing table (JSON); empty uses the four channel IDs above
+TEAMS_FILE = os.environ.get("TEAMS_FILE", "")
+TEAMS_RELOAD_INTERVAL = float(os.environ.get("TEAMS_RELOAD_INTERVAL", "5"))
 # App configuration
 DEBUG = os.environ.get("DEBUG", "False").lower() == "true"
-LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO") 
\ No newline at end of file
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+
+# AgentForce API base URL
+AGENTFORCE_API_URL = os.environ.get("AGENTFORCE_API_URL", "https://api.salesforce.com")
+
+# AgentForce HTTP connection pool
+AGENTFORCE_POOL_SIZE = int(os.environ.get("AGENTFORCE_POOL_SIZE", "100"))
+AGENTFORCE_POOL_PER_HOST = int(os.environ.get("AGENTFORCE_POOL_PER_HOST", "20"))
+AGENTFORCE_KEEPALIVE_SECONDS = float(os.environ.get("AGENTFORCE_KEEPALIVE_SECONDS", "60"))
+AGENTFORCE_CONNECT_TIMEOUT = float(os.environ.get("AGENTFORCE_CONNECT_TIMEOUT", "5"))
+AGENTFORCE_READ_TIMEOUT = float(os.environ.get("AGENTFORCE_READ_TIMEOUT", "60"))
+
+# AgentForce OAuth token lifetime (used when the token response has no expires_in)
+AGENTFORCE_TOKEN_TTL_SECONDS = float(os.environ.get("AGENTFORCE_TOKEN_TTL_SECONDS", "3600"))
+AGENTFORCE_TOKEN_REFRESH_MARGIN = float(os.environ.get("AGENTFORCE_TOKEN_REFRESH_MARGIN", "300"))
+
+# AgentForce conversation sessions cached per Slack thread; a session expires after TTL seconds without use
+AGENTFORCE_SESSION_CACHE_SIZE = int(os.environ.get("AGENTFORCE_SESSION_CACHE_SIZE", "500"))
+AGENTFORCE_SESSION_TTL_SECONDS = float(os.environ.get("AGENTFORCE_SESSION_TTL_SECONDS", "1800"))
+
+# Pre-warmed AgentForce sessions for SALESFORCE_AGENT_ID (0 disables the pool)
+AGENTFORCE_SESSION_POOL_SIZE = int(os.environ.get("AGENTFORCE_SESSION_POOL_SIZE", "2"))
+AGENTFORCE_SESSION_POOL_MAX_AGE = float(os.environ.get("AGENTFORCE_SESSION_POOL_MAX_AGE", "600"))
+
+# AgentForce replies shared by identical queries, keyed by agent and normalized text
+# (set AGENTFORCE_RESPONSE_CACHE_DB to keep them across restarts)
+AGENTFORCE_RESPONSE_CACHE_SIZE = int(os.environ.get("AGENTFORCE_RESPONSE_CACHE_SIZE", "1000"))
+AGENTFORCE_RESPONSE_CACHE_TTL = float(os.environ.get("AGENTFORCE_RESPONSE_CACHE_TTL", "600"))
+AGENTFORCE_RESPONSE_CACHE_DB = os.environ.get("AGENTFORCE_RESPONSE_CACHE_DB", "")
+
+# Stream AgentForce replies into Slack as they are generated
+AGENTFORCE_STREAMING = os.environ.get("AGENTFORCE_STREAMING", "True").lower() == "true"
+AGENTFORCE_STREAM_UPDATE_INTERVAL = float(os.environ.get("AGENTFORCE_STREAM_UPDATE_INTERVAL", "1.0"))
+
+# Cache of original case messages read back by button handlers
+MESSAGE_CACHE_SIZE = int(os.environ.get("MESSAGE_CACHE_SIZE", "5000"))
+MESSAGE_CACHE_TTL_SECONDS = float(os.environ.get("MESSAGE_CACHE_TTL_SECONDS", "86400"))
+
+# Outbound Slack Web API scheduling
+SLACK_SCHEDULER_ENABLED = os.environ.get("SLACK_SCHEDULER_ENABLED", "True").lower() == "true"
+SLACK_CHANNEL_RATE_PER_SECOND = float(os.environ.get("SLACK_CHANNEL_RATE_PER_SECOND", "1.0"))
+# chat.postMessage calls one channel can take at once before the per-channel rate applies
+SLACK_CHANNEL_BURST = float(os.environ.get("SLACK_CHANNEL_BURST", "60"))
+SLACK_MAX_RETRIES = int(os.environ.get("SLACK_MAX_RETRIES", "3"))
+
+# Background work queue for case processing (overflow: reject, drop_lower or block;
+# drop_lower sheds a queued job of the same or lower priority, else rejects)
+WORK_QUEUE_WORKERS = int(os.environ.get("WORK_QUEUE_WORKERS", "8"))
+WORK_QUEUE_SIZE = int(os.environ.get("WORK_QUEUE_SIZE", "1000"))
+WORK_QUEUE_OVERFLOW = os.environ.get("WORK_QUEUE_OVERFLOW", "reject")
+
+# Duplicate event filtering (set DEDUP_DB_PATH to keep it across restarts)
+DEDUP_WINDOW_SECONDS = float(os.environ.get("DEDUP_WINDOW_SECONDS", "3600"))
+DEDUP_CACHE_SIZE = int(os.environ.get("DEDUP_CACHE_SIZE", "50000"))
+DEDUP_DB_PATH = os.environ.get("DEDUP_DB_PATH", "")
+
+# Prometheus metrics endpoint (port 0 disables it)
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9102"))
+
+# Per-case tracing (exporter: none, jsonl or otlp)
+TRACING_EXPORTER = os.environ.get("TRACING_EXPORTER", "none").lower()
+TRACING_JSONL_PATH = os.environ.get("TRACING_JSONL_PATH", "traces.jsonl")
+TRACING_OTLP_ENDPOINT = os.environ.get("TRACING_OTLP_ENDPOINT", "http://127.0.0.1:4318/v1/traces")
+
+# Record incoming Socket Mode envelopes to a gzip JSONL file for replay (empty disables)
+SOCKET_MODE_CAPTURE_PATH = os.environ.get("SOCKET_MODE_CAPTURE_PATH", "")
+SOCKET_MODE_CAPTURE_REDACT = os.environ.get("SOCKET_MODE_CAPTURE_REDACT", "True").lower() == "true"
+
+# Event loop lag watchdog: log a stack snapshot when the loop is blocked this long
+LOOP_LAG_THRESHOLD = float(os.environ.get("LOOP_LAG_THRESHOLD", "0.25"))
+LOOP_LAG_INTERVAL = float(os.environ.get("LOOP_LAG_INTERVAL", "0.1"))
+
+# Runbook search: Markdown/YAML runbooks in RUNBOOK_DIR, BM25 index kept in RUNBOOK_INDEX_PATH
+RUNBOOK_DIR = os.environ.get("RUNBOOK_DIR", "runbooks")
+RUNBOOK_INDEX_PATH = os.environ.get("RUNBOOK_INDEX_PATH", "runbooks.idx")
+RUNBOOK_TOP_K = int(os.environ.get("RUNBOOK_TOP_K", "3"))
+RUNBOOK_RELOAD_INTERVAL = float(os.environ.get("RUNBOOK_RELOAD_INTERVAL", "30"))
+
+# Semantic runbook matching with hashed n-gram embeddings (needs NumPy), blended with keyword scores
+RUNBOOK_SEMANTIC_ENABLED = os.environ.get("RUNBOOK_SEMANTIC_ENABLED", "True").lower() == "true"
+RUNBOOK_EMBEDDINGS_PATH = os.environ.get("RUNBOOK_EMBEDDINGS_PATH", "runbooks.emb.npy")
+RUNBOOK_EMBEDDING_DIM = int(os.environ.get("RUNBOOK_EMBEDDING_DIM", "256"))
+RUNBOOK_SEMANTIC_WEIGHT = float(os.environ.get("RUNBOOK_SEMANTIC_WEIGHT", "0.5"))
+
+# Runbook step execution: steps with a command run on the bot host when enabled
+RUNBOOK_EXECUTION_ENABLED = os.environ.get("RUNBOOK_EXECUTION_ENABLED", "False").lower() == "true"
+RUNBOOK_EXECUTOR_WORKERS = int(os.environ.get("RUNBOOK_EXECUTOR_WORKERS", "4"))
+RUNBOOK_STEP_TIMEOUT = float(os.environ.get("RUNBOOK_STEP_TIMEOUT", "30"))
+RUNBOOK_OUTPUT_LIMIT = int(os.environ.get("RUNBOOK_OUTPUT_LIMIT", "1000"))
+RUNBOOK_PROGRESS_INTERVAL = float(os.environ.get("RUNBOOK_PROGRESS_INTERVAL", "1.0"))
+
+# Team classifier for free-form cases, trained offline by train_classifier.py from
+# the hand-off log; predictions below the minimum confidence get the generic buttons
+CLASSIFIER_MODEL_PATH = os.environ.get("CLASSIFIER_MODEL_PATH", "team_classifier.npz")
+CLASSIFIER_MIN_CONFIDENCE = int(os.environ.get("CLASSIFIER_MIN_CONFIDENCE", "50"))
+HANDOFF_LOG_PATH = os.environ.get("HANDOFF_LOG_PATH", "handoff_decisions.jsonl")
+
+# Log output: json or text, records queued for the writer thread, and
+# per-logger sample rates for records below WARNING, e.g. "services.dedup_service=0.1"
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text").lower()
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+LOG_SAMPLING = os.environ.get("LOG_SAMPLING", "")
+
+# On-demand profiles from http://METRICS_HOST:METRICS_PORT/debug/profile
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_MAX_SECONDS = float(os.environ.get("PROFILE_MAX_SECONDS", "120"))
@@ -2,63 +2,58 @@ import logging
 import re
 from slack_bolt.app.async_app import AsyncApp
 import config
+from services.metrics import LISTENER_DURATION, timed
+from services.log_pipeline import log_context
+from services.tracing import tracer
+from services.work_queue import overloaded_notice
 
 logger = logging.getLogger(__name__)
 
 class ActionHandlers:
-    def __init__(self, app: AsyncApp, handoff_processor, case_processor):
+    def __init__(self, app: AsyncApp, handoff_processor, case_processor, message_cache, work_queue):
         self.app = app
         self.handoff_processor = handoff_processor
         self.case_processor = case_processor
+        self.message_cache = message_cache
+        self.work_queue = work_queue
         self.register_handlers()
 
     def register_handlers(self):
-        # Register standard team handoff actions
-        @self.app.action("handoff_support")
-        @self.app.action("handoff_sales")
-        @self.app.action("handoff_engineering")
-        async def handle_standard_handoff_action(ack, body, client):
-            await ack()
-            logger.info(f"Received standard button click: {body['actions'][0]['action_id']}")
-            
-            # Extract information
-            user_id = body["user"]["id"]
-            action_id = body["actions"][0]["action_id"]
-            value = body["actions"][0]["value"]
-            
-            # Get original message timestamp
-            timestamp = value.split("_")[1]
-            
-            # Process the hand-off
-            await self.handoff_processor.process_handoff(action_id, user_id, timestamp, body, client)
-        
-        # Register dynamic team handoff action pattern
+        # Register the team handoff actions; teams come from the registry, so one pattern covers them all
         @self.app.action(re.compile("handoff_.*"))
-        async def handle_dynamic_handoff_action(ack, body, client):
+        @timed(LISTENER_DURATION, listener="handle_handoff_action")
+        async def handle_handoff_action(ack, body, client):
             await ack()
             action_id = body["actions"][0]["action_id"]
-            
-            # Skip the standard teams which are handled by the specific handlers
-            if action_id in ["handoff_support", "handoff_sales", "handoff_engineering"]:
-                return
-                
-            logger.info(f"Received dynamic team button click: {action_id}")
+            logger.info("Received hand-off button click: %s", action_id)
             
             # Extract information
             user_id = body["user"]["id"]
             value = body["actions"][0]["value"]
             
-            # Get original message timestamp
-            timestamp = value.split("_")[1]
+            # Get original message timestamp; team keys may contain underscores
+            timestamp = value.rsplit("_", 1)[1]
             
-            # Process the hand-off
-            await self.handoff_processor.process_handoff(action_id, user_id, timestamp, body, client)
+            # Process the hand-off, in the same trace as the case thread
+            with log_context(channel=config.CENTRAL_CASE_CHANNEL_ID, thread_ts=timestamp), \
+                    tracer.span("handoff_click", trace_key=(config.CENTRAL_CASE_CHANNEL_ID, timestamp), action_id=action_id):
+                overloaded = overloaded_notice(client, config.CENTRAL_CASE_CHANNEL_ID, timestamp)
+                if not await self.work_queue.submit(
+                    "handoff",
+                    lambda: self.handoff_processor.process_handoff(action_id, user_id, timestamp, body, client),
+                    priority="handoff",
+                    team=action_id.replace("handoff_", ""),
+                    user=user_id,
+                    on_drop=overloaded
+                ):
+                    await overloaded()
             
         # Register AgentForce processing action
         @self.app.action("process_agentforce")
+        @timed(LISTENER_DURATION, listener="handle_agentforce_action")
         async def handle_agentforce_action(ack, body, client):
             await ack()
-            logger.info(f"Received AgentForce processing request")
+            logger.info("Received AgentForce processing request")
             
             # Extract information
             user_id = body["user"]["id"]
@@ -67,92 +62,101 @@ class ActionHandlers:
             # Get original message timestamp
             timestamp = value.split("_")[1]
             
-            # Update the message to show processing status
-            try:
-                # First, get the original message
-                original_msg_result = await client.conversations_history(
-                    channel=config.CENTRAL_CASE_CHANNEL_ID,
-                    inclusive=True,
-                    latest=timestamp,
-                    limit=1
-                )
+            async def run_agentforce():
+                # Update the message to show processing status
+                try:
+                    # First, get the original message
+                    original_msg = await self.message_cache.get_message(client, config.CENTRAL_CASE_CHANNEL_ID, timestamp)
                 
-                if original_msg_result["ok"] and original_msg_result["messages"]:
-                    original_message = original_msg_result["messages"][0]["text"]
-                    original_user = original_msg_result["messages"][0].get("user", "Unknown")
+                    if original_msg:
+                        original_message = original_msg["text"]
+                        original_user = original_msg.get("user") or "Unknown"
                     
-                    # Update the UI to show processing
-                    await client.chat_update(
-                        channel=config.CENTRAL_CASE_CHANNEL_ID,
-                        ts=body["message"]["ts"],
-                        text=f"Processing with AgentForce...",
-                        blocks=[
-                            {
-                                "type": "section",
-                                "text": {
-                                    "type": "mrkdwn",
-                                    "text": f":hourglass: Processing case with AgentForce..."
+                        # Update the UI to show processing
+                        await client.chat_update(
+                            channel=config.CENTRAL_CASE_CHANNEL_ID,
+                            ts=body["message"]["ts"],
+                            text=f"Processing with AgentForce...",
+                            blocks=[
+                                {
+                                    "type": "section",
+                                    "text": {
+                                        "type": "mrkdwn",
+                                        "text": f":hourglass: Processing case with AgentForce..."
+                                    }
                                 }
-                            }
-                        ]
-                    )
+                            ]
+                        )
                     
-                    # Create a synthetic case data object for AgentForce
-                    # (For cases where the original message wasn't in the structured format)
-                    case_data = {
-                        'case_number': 'AUTO-' + timestamp.replace('.', ''),
-                        'summary': original_message[:100] + ('...' if len(original_message) > 100 else ''),
-                        'team': 'Support',  # Default to Support team
-                        'confidence': 50,   # Default confidence level
-                        'bot': 'agentforce'
-                    }
+                        # Create a synthetic case data object for AgentForce
+                        # (For cases where the original message wasn't in the structured format)
+                        case_data = {
+                            'case_number': 'AUTO-' + timestamp.replace('.', ''),
+                            'summary': original_message[:100] + ('...' if len(original_message) > 100 else ''),
+                            'team': 'Support',  # Default to Support team
+                            'confidence': 50,   # Default confidence level
+                            'bot': 'agentforce'
+                        }
                     
-                    # Process through AgentForce
-                    await self.case_processor.process_agentforce_case(
-                        case_data, 
-                        original_message, 
-                        user_id, 
-                        timestamp, 
-                        lambda **kwargs: client.chat_postMessage(
-                            channel=config.CENTRAL_CASE_CHANNEL_ID, 
-                            **kwargs
-                        ),
-                        client
-                    )
+                        # Process through AgentForce
+                        await self.case_processor.process_agentforce_case(
+                            case_data, 
+                            original_message, 
+                            user_id, 
+                            timestamp, 
+                            lambda **kwargs: client.chat_postMessage(
+                                channel=config.CENTRAL_CASE_CHANNEL_ID, 
+                                **kwargs
+                            ),
+                            client
+                        )
                     
-                    # Update the original UI to show completion
+                        # Update the original UI to show completion
+                        await client.chat_update(
+                            channel=config.CENTRAL_CASE_CHANNEL_ID,
+                            ts=body["message"]["ts"],
+                            text=f"Case processed with AgentForce",
+                            blocks=[
+                                {
+                                    "type": "section",
+                                    "text": {
+                                        "type": "mrkdwn",
+                                        "text": f":white_check_mark: Case has been processed with AgentForce"
+                                    }
+                                }
+                            ]
+                        )
+                except Exception as e:
+                    logger.exception("Error processing with AgentForce: %s", e)
+                    # Update UI to show error
                     await client.chat_update(
                         channel=config.CENTRAL_CASE_CHANNEL_ID,
                         ts=body["message"]["ts"],
-                        text=f"Case processed with AgentForce",
+                        text=f"Error processing with AgentForce",
                         blocks=[
                             {
                                 "type": "section",
                                 "text": {
                                     "type": "mrkdwn",
-                                    "text": f":white_check_mark: Case has been processed with AgentForce"
+                                    "text": f":x: Error processing with AgentForce: {str(e)}"
                                 }
                             }
                         ]
                     )
-            except Exception as e:
-                logger.exception(f"Error processing with AgentForce: {e}")
-                # Update UI to show error
-                await client.chat_update(
-                    channel=config.CENTRAL_CASE_CHANNEL_ID,
-                    ts=body["message"]["ts"],
-                    text=f"Error processing with AgentForce",
-                    blocks=[
-                        {
-                            "type": "section",
-                            "text": {
-                                "type": "mrkdwn",
-                                "text": f":x: Error processing with AgentForce: {str(e)}"
-                            }
-                        }
-                    ]
-                )
+
+            # Run on the worker pool behind auto-routed cases and handoffs
+            with log_context(channel=config.CENTRAL_CASE_CHANNEL_ID, thread_ts=timestamp), \
+                    tracer.span("agentforce_click", trace_key=(config.CENTRAL_CASE_CHANNEL_ID, timestamp)):
+                overloaded = overloaded_notice(client, config.CENTRAL_CASE_CHANNEL_ID, timestamp)
+                if not await self.work_queue.submit(
+                    "process_agentforce",
+                    run_agentforce,
+                    priority="agentforce",
+                    user=user_id,
+                    on_drop=overloaded
+                ):
+                    await overloaded()
 
         @self.app.error
         async def handle_errors(error):
-            logger.error(f"Error: {error}") 
\ No newline at end of file
+            logger.error("Error: %s", error) 
\ No newline at end of file
@@ -1,12 +1,157 @@
 import logging
 import asyncio
+import config
 from ..base_handler import BaseHandler
+from services.metrics import LISTENER_DURATION, timed
+from services.runbook_executor import format_progress
+from services.work_queue import overloaded_notice
 
 logger = logging.getLogger(__name__)
 
+# Slack rejects section text over 3000 characters
+MAX_SECTION_TEXT = 3000
+
+# Other matches are listed only if they score at least this share of the best one
+RELATED_SCORE_RATIO = 0.3
+
 class RunbookActions(BaseHandler):
+    def __init__(self, app, case_processor, agent_service, message_cache, work_queue, runbook_index,
+                 runbook_executor=None):
+        super().__init__(app, case_processor, agent_service, message_cache, work_queue)
+        self.runbook_index = runbook_index
+        self.runbook_executor = runbook_executor
+
+    def runbook_blocks(self, matches, timestamp):
+        """The best runbook's steps, followed by the other matches"""
+        if not matches:
+            return [
+                {
+                    "type": "section",
+                    "text": {
+                        "type": "mrkdwn",
+                        "text": ":mag: *No matching runbook found*"
+                    }
+                }
+            ]
+        
+        best_score, best = matches[0]
+        related = [doc for score, doc in matches[1:] if score >= best_score * RELATED_SCORE_RATIO]
+        steps_text = "\n".join(f"{i}. {step['text']}" for i, step in enumerate(best["steps"], 1)) or "_No steps listed_"
+        text = f"*:white_check_mark: Runbook: {best['title']}*\n\n{steps_text}"
+        if len(text) > MAX_SECTION_TEXT:
+            text = text[:MAX_SECTION_TEXT - 1] + "…"
+        context = f":information_source: Found {len(best['steps'])} steps in `{best['path']}`"
+        if related:
+            context += " · Also relevant: " + ", ".join(f"{doc['title']} (`{doc['path']}`)" for doc in related)
+        blocks = [
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": text
+                }
+            },
+            {
+                "type": "context",
+                "elements": [
+                    {
+                        "type": "mrkdwn",
+                        "text": context
+                    }
+                ]
+            }
+        ]
+        automatable = sum(1 for step in best["steps"] if step.get("run"))
+        if self.runbook_executor and automatable:
+            blocks.append({
+                "type": "actions",
+                "block_id": f"runbook_run_{timestamp}",
+                "elements": [
+                    {
+                        "type": "button",
+                        "text": {"type": "plain_text", "text": f"Run {automatable} automated steps"},
+                        "value": f"{timestamp}|{best['path']}",
+                        "action_id": "run_runbook_steps"
+                    }
+                ]
+            })
+        return blocks
+
+    def progress_blocks(self, header, runs):
+        return [
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": f"{header}\n\n{format_progress(runs, MAX_SECTION_TEXT - len(header) - 2)}"
+                }
+            }
+        ]
+
+    async def run_runbook_steps(self, client, channel, thread_ts, doc, user_id):
+        """Run a runbook's automated steps and keep one thread message up to date with their progress"""
+        runs = self.runbook_executor.plan(doc["steps"])
+        header = f"*:gear: Running {len(runs)} steps from {doc['title']}* for <@{user_id}>"
+        message = await client.chat_postMessage(
+            channel=channel,
+            thread_ts=thread_ts,
+            text=f"Running {len(runs)} runbook steps",
+            blocks=self.progress_blocks(header, runs)
+        )
+        
+        # Output arrives far more often than Slack allows updates, so publish at most once per interval
+        changed = asyncio.Event()
+        async def publish():
+            while True:
+                await changed.wait()
+                changed.clear()
+                await client.chat_update(channel=channel, ts=message["ts"], text=f"Running {len(runs)} runbook steps",
+                                         blocks=self.progress_blocks(header, runs))
+                await asyncio.sleep(config.RUNBOOK_PROGRESS_INTERVAL)
+        
+        publisher = asyncio.ensure_future(publish())
+        try:
+            await self.runbook_executor.run(runs, changed.set)
+        finally:
+            publisher.cancel()
+            await asyncio.gather(publisher, return_exceptions=True)
+        
+        passed = sum(1 for run in runs if run.status == "ok")
+        header = f"*:clipboard: {passed}/{len(runs)} steps passed: {doc['title']}* for <@{user_id}>"
+        await client.chat_update(channel=channel, ts=message["ts"], text=f"{passed}/{len(runs)} runbook steps passed",
+                                 blocks=self.progress_blocks(header, runs))
+
     def register_handlers(self):
+        @self.app.action("run_runbook_steps")
+        @timed(LISTENER_DURATION, listener="run_runbook_steps")
+        async def handle_run_runbook_steps(ack, body, client):
+            await ack()
+            user_id = body["user"]["id"]
+            channel = body["channel"]["id"]
+            timestamp, path = body["actions"][0]["value"].split("|", 1)
+            
+            snapshot = self.runbook_index.snapshot
+            doc_id = snapshot.by_path.get(path)
+            if self.runbook_executor is None or doc_id is None:
+                await client.chat_postMessage(
+                    channel=channel,
+                    thread_ts=timestamp,
+                    text=f":warning: Runbook `{path}` can no longer be run here."
+                )
+                return
+            
+            logger.info("Running runbook %s for <@%s>", path, user_id)
+            overloaded = overloaded_notice(client, channel, timestamp)
+            if not await self.work_queue.submit(
+                "run_runbook",
+                lambda: self.run_runbook_steps(client, channel, timestamp, snapshot.docs[doc_id], user_id),
+                user=user_id,
+                on_drop=overloaded
+            ):
+                await overloaded()
+
         @self.app.action("fetch_runbook")
+        @timed(LISTENER_DURATION, listener="fetch_runbook")
         async def handle_runbook_execution(ack, body, client):
             await ack()
             logger.info("Received runbook fetch request")
@@ -18,99 +163,21 @@ class RunbookActions(BaseHandler):
             
             try:
                 # First, get the original message
-                original_msg_result = await client.conversations_history(
-                    channel=body["channel"]["id"],
-                    inclusive=True,
-                    latest=timestamp,
-                    limit=1
-                )
+                original_msg = await self.message_cache.get_message(client, body["channel"]["id"], timestamp)
                 
-                if original_msg_result["ok"] and original_msg_result["messages"]:
-                    original_message = original_msg_result["messages"][0]["text"]
-                    
-                    # Initial loading state
-                    loading_states = [
-                        ":hourglass_flowing_sand: Analyzing case details...",
-                        ":mag: Searching for relevant runbooks...",
-                        ":file_folder: Fetching runbook steps...",
-                        ":sparkles: Preparing steps for display..."
-                    ]
+                if original_msg:
+                    matches = self.runbook_index.search(original_msg["text"])
+                    logger.info("Found %d runbooks for case %s", len(matches), timestamp)
                     
-                    # Create initial loading message
-                    loading_message = await client.chat_postMessage(
+                    await client.chat_postMessage(
                         channel=body["channel"]["id"],
                         thread_ts=timestamp,
-                        text="Fetching runbook steps...",
-                        blocks=[
-                            {
-                                "type": "section",
-                                "text": {
-                                    "type": "mrkdwn",
-                                    "text": loading_states[0]
-                                }
-                            }
-                        ]
-                    )
-                    
-                    # Animate loading states
-                    for i, state in enumerate(loading_states[1:], 1):
-                        await asyncio.sleep(1)  # Simulate processing time
-                        await client.chat_update(
-                            channel=body["channel"]["id"],
-                            ts=loading_message["ts"],
-                            text=f"Fetching runbook steps... ({i+1}/{len(loading_states)})",
-                            blocks=[
-                                {
-                                    "type": "section",
-                                    "text": {
-                                        "type": "mrkdwn",
-                                        "text": state
-                                    }
-                                }
-                            ]
-                        )
-                    
-                    # Mock runbook steps
-                    runbook_steps = [
-                        "1. Check system logs for errors",
-                        "2. Verify database connection",
-                        "3. Restart application service",
-                        "4. Clear cache",
-                        "5. Run system diagnostics"
-                    ]
-                    
-                    # Create the runbook steps message with better formatting
-                    steps_text = "\n".join([
-                        f"• {step}" for step in runbook_steps
-                    ])
-                    
-                    # Final message with steps
-                    await client.chat_update(
-                        channel=body["channel"]["id"],
-                        ts=loading_message["ts"],
-                        text=".",
-                        blocks=[
-                            {
-                                "type": "section",
-                                "text": {
-                                    "type": "mrkdwn",
-                                    "text": f"*:white_check_mark: Runbook Steps Found*\n\n{steps_text}"
-                                }
-                            },
-                            {
-                                "type": "context",
-                                "elements": [
-                                    {
-                                        "type": "mrkdwn",
-                                        "text": ":information_source: Found 5 steps in the runbook"
-                                    }
-                                ]
-                            }
-                        ]
+                        text=f"Runbook: {matches[0][1]['title']}" if matches else "No matching runbook found",
+                        blocks=self.runbook_blocks(matches, timestamp)
                     )
     
             except Exception as e:
-                logger.exception(f"Error fetching runbook steps: {e}")
+                logger.exception("Error fetching runbook steps: %s", e)
                 # Update UI to show error with better formatting
                 await client.chat_update(
                     channel=body["channel"]["id"],
@@ -4,7 +4,9 @@ from slack_bolt.app.async_app import AsyncApp
 logger = logging.getLogger(__name__)
 
 class BaseHandler:
-    def __init__(self, app: AsyncApp, case_processor, agent_service):
+    def __init__(self, app: AsyncApp, case_processor, agent_service, message_cache, work_queue):
         self.app = app
         self.case_processor = case_processor
-        self.agent_service = agent_service 
\ No newline at end of file
+        self.agent_service = agent_service
+        self.message_cache = message_cache
+        self.work_queue = work_queue 
\ No newline at end of file
@@ -1,6 +1,10 @@
 import logging
 import config
 from ..base_handler import BaseHandler
+from services.metrics import LISTENER_DURATION, timed
+from services.log_pipeline import add_log_context, log_context
+from services.tracing import tracer
+from services.work_queue import overloaded_notice
 
 logger = logging.getLogger(__name__)
 
@@ -8,15 +12,15 @@ class MessageEvents(BaseHandler):
     def register_handlers(self):
         @self.app.event("app_mention")
         async def app_mentioned(event, say, client):
-            print("app mentioned")
+            logger.debug("App mentioned in channel %s", event.get("channel"))
             
         @self.app.event("channel_created")
-        async def handle_channel_created_events(body, logger):
-            print("channel created")
+        async def handle_channel_created_events(body):
+            logger.debug("Channel created: %s", body.get("event", {}).get("channel", {}).get("id"))
         
         @self.app.event("message")
+        @timed(LISTENER_DURATION, listener="handle_message")
         async def handle_message(event, say, client):
-            print("entered handle message")
             # Skip bot messages and message subtypes
             if event.get("subtype") == "bot_message" or event.get("subtype") is not None:
                 return
@@ -27,22 +31,45 @@ class MessageEvents(BaseHandler):
             timestamp = event.get("ts")
             thread_ts = event.get("thread_ts", timestamp)  # Use parent thread ts if it exists
             
-            logger.info(f"Received message in channel {channel_id} from user {user_id}")
+            logger.info("Received message in channel %s from user %s", channel_id, user_id)
+            
+            # Remember the message so button handlers do not have to re-read it from Slack
+            self.message_cache.add(channel_id, timestamp, text, user_id)
             
             # Handle messages that start with "agentforce"
-            print("text",text)
             if text.startswith("<@U08N6BDLBKR>"):
                 logger.info("Message starts with 'agentforce', forwarding to AgentForce API")
                 return
-            print("channel_id",channel_id)
             # Handle messages in central_case channel
             if channel_id == config.CENTRAL_CASE_CHANNEL_ID:
-                logger.info(f"Processing message in central_case channel: {text[:20]}...")
-                await self.case_processor.handle_case(text, user_id, timestamp, thread_ts, say, client)
+                logger.info("Processing message in central_case channel: %s...", text[:20])
+                # One trace per case thread; later button clicks join it
+                with log_context(channel=channel_id, thread_ts=thread_ts), tracer.span(
+                    "receive_case",
+                    trace_key=(channel_id, thread_ts),
+                    **{"slack.channel": channel_id, "slack.thread_ts": thread_ts}
+                ) as span:
+                    # Hand the case to the worker pool so the event callback returns at once
+                    priority, team, case_data = self.case_processor.classify_case(text, timestamp)
+                    span.set_attribute("case.priority", priority)
+                    if case_data:
+                        span.set_attribute("case.number", case_data['case_number'])
+                        add_log_context(case_number=case_data['case_number'])
+                    # Dedup blocks Slack's redelivery, so a shed case must be reported here
+                    overloaded = overloaded_notice(client, channel_id, thread_ts)
+                    if not await self.work_queue.submit(
+                        "handle_case",
+                        lambda: self.case_processor.handle_case(text, user_id, timestamp, thread_ts, say, client, case_data),
+                        priority=priority,
+                        team=team,
+                        user=user_id,
+                        on_drop=overloaded
+                    ):
+                        await overloaded()
                 return
             
-            elif channel_id in [config.SUPPORT_CHANNEL_ID, config.SALES_CHANNEL_ID, config.ENGINEERING_CHANNEL_ID, config.IAM_CHANNEL_ID]:
-                logger.info(f"Processing message in team channel: {text[:20]}...")
+            elif self.case_processor.team_registry.is_team_channel(channel_id):
+                logger.info("Processing message in team channel: %s...", text[:20])
                 # Add runbook button for team channels
                 await say(
                     text="Would you like to fetch  a runbook for this case?",
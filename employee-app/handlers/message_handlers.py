@@ -6,14 +6,17 @@ from .actions.runbook_actions import RunbookActions
 logger = logging.getLogger(__name__)
 
 class MessageHandlers:
-    def __init__(self, app: AsyncApp, case_processor, agent_service):
+    def __init__(self, app: AsyncApp, case_processor, agent_service, message_cache, work_queue, runbook_index, runbook_executor=None):
         self.app = app
         self.case_processor = case_processor
         self.agent_service = agent_service
+        self.message_cache = message_cache
+        self.work_queue = work_queue
         
         # Initialize all handler classes
-        self.message_events = MessageEvents(app, case_processor, agent_service)
-        self.runbook_actions = RunbookActions(app, case_processor, agent_service)
+        self.message_events = MessageEvents(app, case_processor, agent_service, message_cache, work_queue)
+        self.runbook_actions = RunbookActions(app, case_processor, agent_service, message_cache, work_queue, runbook_index,
+                                              runbook_executor)
         
         self.register_handlers()
 
@@ -3,7 +3,15 @@ import os
 import json
 import aiohttp
 import uuid
+import time
+from contextlib import asynccontextmanager
 import config
+from .token_manager import TokenManager
+from .session_cache import AgentSession, SessionCache
+from .session_pool import SessionPool
+from .response_cache import ResponseCache, ResponseUnavailable
+from .metrics import AGENTFORCE_DURATION, timed
+from .tracing import traced, tracer
 
 logger = logging.getLogger(__name__)
 
@@ -12,168 +20,428 @@ class AgentForceService:
     
     def __init__(self):
         self.domain_url = os.environ.get("SALESFORCE_DOMAIN_URL")
+        # The domain may carry its own scheme, e.g. a local stand-in on http://
+        self.instance_url = self.domain_url if self.domain_url and "://" in self.domain_url else f"https://{self.domain_url}"
+        self.api_url = config.AGENTFORCE_API_URL.rstrip("/")
         self.consumer_key = os.environ.get("SALESFORCE_CONSUMER_KEY")
         self.consumer_secret = os.environ.get("SALESFORCE_CONSUMER_SECRET")
-        self.access_token = None
-        self.sequence_id = 0
+        self.http_session = None
+        self.token_manager = TokenManager(
+            self.fetch_access_token,
+            default_ttl=config.AGENTFORCE_TOKEN_TTL_SECONDS,
+            refresh_margin=config.AGENTFORCE_TOKEN_REFRESH_MARGIN
+        )
+        self.session_cache = SessionCache(
+            maxsize=config.AGENTFORCE_SESSION_CACHE_SIZE,
+            ttl=config.AGENTFORCE_SESSION_TTL_SECONDS
+        )
+        self.session_pool = None
+        self.response_cache = ResponseCache()
         
         # Validate required environment variables
         if not self.domain_url or not self.consumer_key or not self.consumer_secret:
             logger.warning("Missing AgentForce API credentials. Integration will not work.")
         else:
-            logger.info(f"AgentForce service initialized with domain: {self.domain_url}")
+            logger.info("AgentForce service initialized with domain: %s", self.domain_url)
+    
+    async def start(self):
+        """Open the shared HTTP connection pool used for all AgentForce calls"""
+        if self.http_session is not None and not self.http_session.closed:
+            return self.http_session
+        
+        connector = aiohttp.TCPConnector(
+            limit=config.AGENTFORCE_POOL_SIZE,
+            limit_per_host=config.AGENTFORCE_POOL_PER_HOST,
+            keepalive_timeout=config.AGENTFORCE_KEEPALIVE_SECONDS,
+            ttl_dns_cache=300
+        )
+        timeout = aiohttp.ClientTimeout(
+            connect=config.AGENTFORCE_CONNECT_TIMEOUT,
+            sock_read=config.AGENTFORCE_READ_TIMEOUT
+        )
+        self.http_session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        logger.info("AgentForce HTTP connection pool started")
+        
+        # Keep a few sessions ready for the default agent
+        agent_id = os.environ.get("SALESFORCE_AGENT_ID")
+        if agent_id and config.AGENTFORCE_SESSION_POOL_SIZE > 0 and self.session_pool is None:
+            self.session_pool = SessionPool(
+                self.new_session,
+                agent_id,
+                size=config.AGENTFORCE_SESSION_POOL_SIZE,
+                max_idle_age=config.AGENTFORCE_SESSION_POOL_MAX_AGE
+            )
+            await self.session_pool.start()
+        return self.http_session
+    
+    async def close(self):
+        """Close the shared HTTP connection pool"""
+        if self.session_pool is not None:
+            await self.session_pool.close()
+            self.session_pool = None
+        await self.token_manager.close()
+        self.response_cache.close()
+        if self.http_session is not None and not self.http_session.closed:
+            await self.http_session.close()
+            logger.info("AgentForce HTTP connection pool closed")
+        self.http_session = None
+    
+    async def get_http_session(self):
+        """Return the shared HTTP session, opening it on first use"""
+        if self.http_session is None or self.http_session.closed:
+            await self.start()
+        return self.http_session
+    
+    @property
+    def access_token(self):
+        """The currently cached access token, if any"""
+        return self.token_manager.token
     
     async def get_access_token(self):
-        """Get access token from Salesforce OAuth"""
+        """Get a valid access token, refreshing it only when needed"""
+        return await self.token_manager.get_token()
+    
+    @timed(AGENTFORCE_DURATION, operation="get_access_token")
+    @traced("agentforce.get_access_token")
+    async def fetch_access_token(self):
+        """Fetch a new access token from Salesforce OAuth.
+
+        Returns (token, ttl_seconds) or None. ttl_seconds is None when the
+        response carries no expires_in, in which case the configured default
+        lifetime is used.
+        """
         logger.info("Getting access token from Salesforce")
         
         try:
-            async with aiohttp.ClientSession() as session:
-                payload = {
-                    'grant_type': 'client_credentials',
-                    'client_id': self.consumer_key,
-                    'client_secret': self.consumer_secret
-                }
+            session = await self.get_http_session()
+            payload = {
+                'grant_type': 'client_credentials',
+                'client_id': self.consumer_key,
+                'client_secret': self.consumer_secret
+            }
                 
-                headers = {
-                    'Content-Type': 'application/x-www-form-urlencoded'
-                }
+            headers = {
+                'Content-Type': 'application/x-www-form-urlencoded'
+            }
                 
-                async with session.post(
-                    f"https://{self.domain_url}/services/oauth2/token",
-                    data=payload,
-                    headers=headers
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        self.access_token = data.get('access_token')
-                        logger.info("Successfully retrieved access token")
-                        return self.access_token
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Failed to get access token: {response.status} - {error_text}")
-                        return None
+            async with session.post(
+                f"{self.instance_url}/services/oauth2/token",
+                data=payload,
+                headers=headers
+            ) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    logger.info("Successfully retrieved access token")
+                    expires_in = data.get('expires_in')
+                    return data.get('access_token'), float(expires_in) if expires_in else None
+                else:
+                    error_text = await response.text()
+                    logger.error("Failed to get access token: %s - %s", response.status, error_text)
+                    return None
                         
         except Exception as e:
-            logger.exception(f"Error getting access token: {e}")
+            logger.exception("Error getting access token: %s", e)
             return None
     
+    @asynccontextmanager
+    async def authorized_post(self, url, token, headers=None, **kwargs):
+        """POST with a bearer token, refreshing the token and retrying once on 401"""
+        session = await self.get_http_session()
+        headers = dict(headers or {})
+        headers['Authorization'] = f'Bearer {token}'
+        
+        response = await session.post(url, headers=headers, **kwargs)
+        if response.status == 401:
+            logger.warning("AgentForce returned 401, refreshing access token and retrying")
+            token = await self.token_manager.refresh(stale_token=token)
+            if token:
+                # Only drop the 401 once there is a retry; otherwise the caller reads its error details
+                response.release()
+                headers['Authorization'] = f'Bearer {token}'
+                response = await session.post(url, headers=headers, **kwargs)
+            else:
+                logger.error("Could not refresh the AgentForce access token after a 401")
+        
+        try:
+            yield response
+        finally:
+            response.release()
+    
+    @timed(AGENTFORCE_DURATION, operation="create_session")
+    @traced("agentforce.create_session")
     async def create_session(self, agent_id):
         """Create a new session with the specified agent"""
-        logger.info(f"Creating session for agent: {agent_id}")
+        logger.info("Creating session for agent: %s", agent_id)
         
-        if not self.access_token:
-            await self.get_access_token()
-            if not self.access_token:
-                return None
+        token = await self.get_access_token()
+        if not token:
+            return None
         
         session_key = str(uuid.uuid4())
         
         try:
-            async with aiohttp.ClientSession() as session:
-                payload = {
-                    "externalSessionKey": session_key,
-                    "instanceConfig": {
-                        "endpoint": f"https://{self.domain_url}"
-                    },
-                    "streamingCapabilities": {
-                        "chunkTypes": ["Text"]
-                    },
-                    "bypassUser": True
-                }
+            payload = {
+                "externalSessionKey": session_key,
+                "instanceConfig": {
+                    "endpoint": self.instance_url
+                },
+                "streamingCapabilities": {
+                    "chunkTypes": ["Text"]
+                },
+                "bypassUser": True
+            }
                 
-                headers = {
-                    'Content-Type': 'application/json',
-                    'Authorization': f'Bearer {self.access_token}'
-                }
+            headers = {
+                'Content-Type': 'application/json'
+            }
                 
-                async with session.post(
-                    f"https://api.salesforce.com/einstein/ai-agent/v1/agents/{agent_id}/sessions",
-                    json=payload,
-                    headers=headers
-                ) as response:
-                    if response.status == 200 or response.status == 201:
-                        data = await response.json()
-                        logger.info(f"Successfully created session {data.get('sessionId')}")
-                        return data
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Failed to create session: {response.status} - {error_text}")
-                        return None
+            async with self.authorized_post(
+                f"{self.api_url}/einstein/ai-agent/v1/agents/{agent_id}/sessions",
+                token,
+                json=payload,
+                headers=headers
+            ) as response:
+                if response.status == 200 or response.status == 201:
+                    data = await response.json()
+                    logger.info("Successfully created session %s", data.get('sessionId'))
+                    return data
+                else:
+                    error_text = await response.text()
+                    logger.error("Failed to create session: %s - %s", response.status, error_text)
+                    return None
                         
         except Exception as e:
-            logger.exception(f"Error creating session: {e}")
+            logger.exception("Error creating session: %s", e)
             return None
     
-    async def send_message(self, session_id, message_text):
+    @timed(AGENTFORCE_DURATION, operation="send_message")
+    @traced("agentforce.send_message")
+    async def send_message(self, session_id, message_text, sequence_id=1):
         """Send a message to an existing session"""
-        logger.info(f"Sending message to session: {session_id}")
+        logger.info("Sending message %s to session: %s", sequence_id, session_id)
         
-        if not self.access_token:
-            await self.get_access_token()
-            if not self.access_token:
-                return None
-        
-        self.sequence_id += 1
+        token = await self.get_access_token()
+        if not token:
+            return None
         
         try:
-            async with aiohttp.ClientSession() as session:
-                payload = {
-                    "message": {
-                        "sequenceId": self.sequence_id,
-                        "type": "Text",
-                        "text": message_text
-                    }
+            payload = {
+                "message": {
+                    "sequenceId": sequence_id,
+                    "type": "Text",
+                    "text": message_text
                 }
+            }
                 
-                headers = {
-                    'Accept': 'application/json',
-                    'Content-Type': 'application/json',
-                    'Authorization': f'Bearer {self.access_token}'
-                }
+            headers = {
+                'Accept': 'application/json',
+                'Content-Type': 'application/json'
+            }
                 
-                async with session.post(
-                    f"https://api.salesforce.com/einstein/ai-agent/v1/sessions/{session_id}/messages",
+            async with self.authorized_post(
+                f"{self.api_url}/einstein/ai-agent/v1/sessions/{session_id}/messages",
+                token,
+                json=payload,
+                headers=headers
+            ) as response:
+                if response.status == 200 or response.status == 201:
+                    data = await response.json()
+                    logger.info("Successfully sent message to session %s", session_id)
+                    return data
+                else:
+                    error_text = await response.text()
+                    logger.error("Failed to send message: %s - %s", response.status, error_text)
+                    return None
+                        
+        except Exception as e:
+            logger.exception("Error sending message: %s", e)
+            return None
+    
+    async def stream_message(self, session_id, message_text, sequence_id=1):
+        """Send a message and yield the agent's reply text as it streams in"""
+        logger.info("Streaming message %s to session: %s", sequence_id, session_id)
+        
+        token = await self.get_access_token()
+        if not token:
+            return
+        
+        payload = {
+            "message": {
+                "sequenceId": sequence_id,
+                "type": "Text",
+                "text": message_text
+            }
+        }
+        
+        headers = {
+            'Accept': 'text/event-stream',
+            'Content-Type': 'application/json'
+        }
+        
+        started = time.perf_counter()
+        received_chunks = False
+        # Not activated: the caller keeps running between chunks
+        with tracer.span("agentforce.stream_message", activate=False) as span:
+            try:
+                async with self.authorized_post(
+                    f"{self.api_url}/einstein/ai-agent/v1/sessions/{session_id}/messages/stream",
+                    token,
                     json=payload,
                     headers=headers
                 ) as response:
-                    if response.status == 200 or response.status == 201:
-                        data = await response.json()
-                        logger.info(f"Successfully sent message to session {session_id}")
-                        return data
-                    else:
+                    span.set_attribute("http.status_code", response.status)
+                    if response.status != 200:
                         error_text = await response.text()
-                        logger.error(f"Failed to send message: {response.status} - {error_text}")
-                        return None
+                        logger.error("Failed to stream message: %s - %s", response.status, error_text)
+                        return
+                
+                    async for event, data in self.iter_sse_events(response):
+                        message = data.get('message', {}) if isinstance(data, dict) else {}
+                        if event == 'TextChunk':
+                            received_chunks = True
+                            yield message.get('message', "")
+                        elif event == 'Inform' and not received_chunks:
+                            # Servers that do not chunk send the whole reply at once
+                            yield message.get('message', "")
+                        elif event == 'EndOfTurn':
+                            break
                         
-        except Exception as e:
-            logger.exception(f"Error sending message: {e}")
+            except Exception as e:
+                span.error = f"{type(e).__name__}: {e}"
+                logger.exception("Error streaming message: %s", e)
+                if received_chunks:
+                    # Keep a partial reply out of the response cache
+                    raise ResponseUnavailable("\n\n_The AgentForce reply was cut off. Please try again later._")
+            finally:
+                AGENTFORCE_DURATION.observe(time.perf_counter() - started, operation="stream_message")
+    
+    async def iter_sse_events(self, response):
+        """Yield (event, data) pairs from a server-sent-event response"""
+        event = None
+        data_lines = []
+        async for raw_line in response.content:
+            line = raw_line.decode('utf-8').rstrip('\r\n')
+            if not line:
+                # A blank line terminates the current event
+                if data_lines:
+                    try:
+                        data = json.loads("\n".join(data_lines))
+                    except ValueError:
+                        data = "\n".join(data_lines)
+                    yield event, data
+                event = None
+                data_lines = []
+            elif line.startswith('event:'):
+                event = line[6:].strip()
+            elif line.startswith('data:'):
+                data_lines.append(line[5:].lstrip())
+    
+    async def open_session(self, agent_id):
+        """Get a session for agent_id, taking a pre-warmed one when available"""
+        if self.session_pool is not None:
+            agent_session = self.session_pool.acquire(agent_id)
+            if agent_session is not None:
+                logger.info("Using pre-warmed AgentForce session %s", agent_session.session_id)
+                return agent_session
+        return await self.new_session(agent_id)
+    
+    async def new_session(self, agent_id):
+        """Create a new AgentForce session and wrap it for reuse"""
+        session_data = await self.create_session(agent_id)
+        if not session_data or not session_data.get('sessionId'):
             return None
+        return AgentSession(session_data['sessionId'], agent_id)
+    
+    def resolve_agent_id(self, agent_id=None):
+        """Return agent_id, falling back to the configured default agent"""
+        return agent_id or os.environ.get("SALESFORCE_AGENT_ID")
+    
+    async def get_session(self, agent_id, conversation_key=None):
+        """Get a session for a conversation, reusing the cached one if any"""
+        if conversation_key is None:
+            return await self.open_session(agent_id)
+        return await self.session_cache.get_or_create(
+            conversation_key, agent_id, lambda: self.open_session(agent_id)
+        )
+    
+    def response_key(self, agent_id, text, conversation_key):
+        """Response cache key, or None for a follow-up whose reply depends on its conversation"""
+        if conversation_key is not None and conversation_key in self.session_cache:
+            return None
+        return self.response_cache.key(agent_id, text)
+    
+    def seed_session(self, agent_id, text, conversation_key):
+        """Open the conversation's session in the background and send it the first message.
+
+        A reply served from the response cache never reached AgentForce in
+        this conversation, so without the seed a follow-up would go to a
+        session that has not seen the question. Follow-ups wait for it.
+        """
+        async def create():
+            agent_session = await self.open_session(agent_id)
+            if agent_session is None:
+                return None
+            if not await self.send_message(agent_session.session_id, text, agent_session.next_sequence_id()):
+                logger.warning("Could not give session %s the conversation's first message", agent_session.session_id)
+                return None
+            return agent_session
+        self.session_cache.prepare(conversation_key, agent_id, create)
     
-    async def process_message(self, text, agent_id=None):
-        """Process a message through AgentForce and return the response"""
+    async def process_message(self, text, agent_id=None, conversation_key=None):
+        """Process a message through AgentForce and return the response.
+
+        When conversation_key (e.g. (channel, thread_ts)) is given, the
+        AgentForce session is cached and reused for later messages with the
+        same key, so follow-ups cost a single API call and keep context.
+        Identical first messages share one reply through the response cache;
+        the conversation's session still gets the message (see seed_session).
+        """
+        agent_id = self.resolve_agent_id(agent_id)
         if not agent_id:
-            # Default agent ID if not specified
-            agent_id = os.environ.get("SALESFORCE_AGENT_ID")
-            if not agent_id:
-                logger.error("No agent ID provided and no default agent ID configured")
-                return "Error: AgentForce agent ID not configured"
+            logger.error("No agent ID provided and no default agent ID configured")
+            return "Error: AgentForce agent ID not configured"
         
-        # Step 1: Create a session
-        session_data = await self.create_session(agent_id)
-        if not session_data:
-            logger.error("Failed to create session with AgentForce")
-            return "Failed to connect to AgentForce. Please try again later."
+        requested = False
+        def request():
+            nonlocal requested
+            requested = True
+            return self.request_reply(text, agent_id, conversation_key)
         
-        session_id = session_data.get('sessionId')
+        try:
+            reply = await self.response_cache.fetch(self.response_key(agent_id, text, conversation_key), request)
+        except ResponseUnavailable as e:
+            return str(e)
+        if conversation_key is not None and not requested:
+            self.seed_session(agent_id, text, conversation_key)
+        return reply
+    
+    async def request_reply(self, text, agent_id, conversation_key=None):
+        """Ask AgentForce and return the reply text; raises ResponseUnavailable on failure"""
+        # Step 1: Get a session, reusing the conversation's one if cached
+        reused = conversation_key is not None and conversation_key in self.session_cache
+        agent_session = await self.get_session(agent_id, conversation_key)
+        if not agent_session:
+            logger.error("Failed to create session with AgentForce")
+            raise ResponseUnavailable("Failed to connect to AgentForce. Please try again later.")
         
         # Step 2: Send the message
-        response_data = await self.send_message(session_id, text)
+        response_data = await self.send_message(
+            agent_session.session_id, text, agent_session.next_sequence_id()
+        )
+        if not response_data and reused:
+            # The cached session may have expired on the server; start over once
+            logger.info("Cached session %s failed, opening a new one", agent_session.session_id)
+            self.session_cache.invalidate(conversation_key)
+            agent_session = await self.get_session(agent_id, conversation_key)
+            if agent_session:
+                response_data = await self.send_message(
+                    agent_session.session_id, text, agent_session.next_sequence_id()
+                )
         if not response_data:
             logger.error("Failed to send message to AgentForce")
-            return "Failed to communicate with AgentForce. Please try again later."
-        
-        logger.info(f"AgentForce response: {response_data}")
+            raise ResponseUnavailable("Failed to communicate with AgentForce. Please try again later.")
+        if conversation_key is not None:
+            self.session_cache.touch(conversation_key, agent_session)
         
         # Extract the AI response
         # Check if response_data is a list or has a 'messages' field
@@ -182,8 +450,9 @@ class AgentForceService:
         else:
             messages = response_data.get('messages', [])
             
+        logger.debug("AgentForce replied with %d messages", len(messages))
         if not messages:
-            return "No response received from AgentForce."
+            raise ResponseUnavailable("No response received from AgentForce.")
         
         # Compile all message content
         final_message = ""
@@ -194,6 +463,58 @@ class AgentForceService:
                 final_message += message.get('text', "")
         
         if not final_message:
-            return "No response content found in the conversation."
+            raise ResponseUnavailable("No response content found in the conversation.")
             
-        return final_message
\ No newline at end of file
+        return final_message
+    
+    async def process_message_stream(self, text, agent_id=None, conversation_key=None):
+        """Process a message through AgentForce, yielding reply text as it arrives"""
+        agent_id = self.resolve_agent_id(agent_id)
+        if not agent_id:
+            logger.error("No agent ID provided and no default agent ID configured")
+            yield "Error: AgentForce agent ID not configured"
+            return
+        
+        requested = False
+        def request():
+            nonlocal requested
+            requested = True
+            return self.stream_reply(text, agent_id, conversation_key)
+        
+        try:
+            async for chunk in self.response_cache.stream(self.response_key(agent_id, text, conversation_key), request):
+                yield chunk
+        except ResponseUnavailable as e:
+            yield str(e)
+            return
+        if conversation_key is not None and not requested:
+            self.seed_session(agent_id, text, conversation_key)
+    
+    async def stream_reply(self, text, agent_id, conversation_key=None):
+        """Ask AgentForce and yield the reply as it streams in; raises ResponseUnavailable on failure"""
+        reused = conversation_key is not None and conversation_key in self.session_cache
+        agent_session = await self.get_session(agent_id, conversation_key)
+        if not agent_session:
+            logger.error("Failed to create session with AgentForce")
+            raise ResponseUnavailable("Failed to connect to AgentForce. Please try again later.")
+        
+        received = False
+        async for chunk in self.stream_message(agent_session.session_id, text, agent_session.next_sequence_id()):
+            received = True
+            yield chunk
+        
+        if not received and reused:
+            # The cached session may have expired on the server; start over once
+            logger.info("Cached session %s failed, opening a new one", agent_session.session_id)
+            self.session_cache.invalidate(conversation_key)
+            agent_session = await self.get_session(agent_id, conversation_key)
+            if agent_session:
+                async for chunk in self.stream_message(agent_session.session_id, text, agent_session.next_sequence_id()):
+                    received = True
+                    yield chunk
+        
+        if not received:
+            logger.error("No streamed response received from AgentForce")
+            raise ResponseUnavailable("Failed to communicate with AgentForce. Please try again later.")
+        if conversation_key is not None:
+            self.session_cache.touch(conversation_key, agent_session)
@@ -0,0 +1,137 @@
+import logging
+import asyncio
+import json
+import os
+import time
+import config
+from .tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+class BackfillCheckpoint:
+    """Backfill progress per channel, saved as JSON so a run can resume"""
+
+    def __init__(self, path):
+        self.path = path
+        self.channels = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.channels = json.load(f)
+
+    def get(self, channel):
+        return self.channels.setdefault(channel, {})
+
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.channels, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+class BackfillService:
+    """Replays missed central_case messages through the case routing logic"""
+
+    def __init__(self, client, case_service, checkpoint, concurrency=4, page_size=200, include_handled=False):
+        self.client = client
+        self.case_service = case_service
+        self.checkpoint = checkpoint
+        self.concurrency = concurrency
+        self.page_size = page_size
+        self.include_handled = include_handled
+        self.bot_user_id = None
+        self.seen = 0
+        self.processed = 0
+        self.skipped = 0
+        self.failed = 0
+
+    async def iter_history(self, channel, oldest=None, latest=None):
+        """Yield pages of channel history, newest first, following cursors"""
+        cursor = None
+        while True:
+            kwargs = {"channel": channel, "limit": self.page_size}
+            if oldest:
+                kwargs["oldest"] = oldest
+            if latest:
+                kwargs["latest"] = latest
+            if cursor:
+                kwargs["cursor"] = cursor
+            result = await self.client.conversations_history(**kwargs)
+            messages = result.get("messages", [])
+            if messages:
+                yield messages
+            cursor = (result.get("response_metadata") or {}).get("next_cursor")
+            if not result.get("has_more") or not cursor:
+                return
+
+    def should_process(self, message):
+        """Skip bot posts, message subtypes and cases the bot already answered"""
+        if message.get("subtype") is not None or message.get("bot_id"):
+            return False
+        if not self.include_handled and self.bot_user_id in message.get("reply_users", []):
+            return False
+        return True
+
+    async def process_message(self, channel, message, semaphore):
+        async with semaphore:
+            timestamp = message["ts"]
+            text = message.get("text", "")
+            user_id = message.get("user")
+
+            async def say(**kwargs):
+                return await self.client.chat_postMessage(channel=channel, **kwargs)
+
+            try:
+                self.case_service.message_cache.add(channel, timestamp, text, user_id)
+                with tracer.span("backfill_case", trace_key=(channel, timestamp), **{"slack.thread_ts": timestamp}):
+                    await self.case_service.handle_case(text, user_id, timestamp, timestamp, say, self.client)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.exception("Error backfilling message %s: %s", timestamp, e)
+
+    async def run(self, channel=None, since=None):
+        """Backfill one channel, resuming from the checkpoint when there is one"""
+        channel = channel or config.CENTRAL_CASE_CHANNEL_ID
+        state = self.checkpoint.get(channel)
+        auth = await self.client.auth_test()
+        self.bot_user_id = auth.get("user_id")
+
+        # Only look at messages newer than the last completed run
+        oldest = state.get("completed_until") or since
+        latest = state.get("resume_before")
+        newest_seen = state.get("newest_seen")
+        if latest:
+            logger.info("Resuming backfill of %s before %s", channel, latest)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        started = time.monotonic()
+        async for page in self.iter_history(channel, oldest=oldest, latest=latest):
+            if newest_seen is None:
+                newest_seen = page[0]["ts"]
+                state["newest_seen"] = newest_seen
+
+            # Oldest first within a page so threads are answered in order
+            candidates = [m for m in reversed(page) if self.should_process(m)]
+            self.seen += len(page)
+            self.skipped += len(page) - len(candidates)
+            await asyncio.gather(*(self.process_message(channel, m, semaphore) for m in candidates))
+
+            # The page is done; a restart can continue below it
+            state["resume_before"] = page[-1]["ts"]
+            self.checkpoint.save()
+
+            elapsed = time.monotonic() - started
+            logger.info(
+                "Backfill progress: %d seen, %d processed, %d skipped, %d failed (%.1f msg/s)",
+                self.seen, self.processed, self.skipped, self.failed, self.seen / max(elapsed, 1e-9)
+            )
+
+        # Finished: the next run only needs messages after what we saw
+        if newest_seen:
+            state["completed_until"] = newest_seen
+        state.pop("resume_before", None)
+        state.pop("newest_seen", None)
+        self.checkpoint.save()
+        logger.info("Backfill of %s complete: %d processed, %d skipped, %d failed", channel, self.processed, self.skipped, self.failed)
+        return self.processed
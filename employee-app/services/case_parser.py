@@ -3,55 +3,150 @@ import re
 
 logger = logging.getLogger(__name__)
 
+FIELD_LABEL = r'([Cc]ase [Nn]umber|[Ss]ummary|[Tt]eam|[Cc]onfidence|[Bb]ot)[ \t]*:[*_ \t]*(.*)'
+# One pattern for every field, matched at the start of a line (quote and bold markup allowed)
+FIELD_RE = re.compile(r'^[ \t>*_]*' + FIELD_LABEL, re.MULTILINE)
+# The first line may lead with a mention or greeting, e.g. "<@U123> Case number: 1"
+LEADING_FIELD_RE = re.compile(r'.*?(?<!\w)' + FIELD_LABEL)
+CONFIDENCE_RE = re.compile(r'(\d+)[ \t]*%')
+
+# Field label as matched (either capitalisation) -> record attribute
+FIELD_NAMES = {}
+for _label, _name in (('case', 'case_number'), ('summary', 'summary'), ('team', 'team'),
+                      ('confidence', 'confidence'), ('bot', 'bot')):
+    for _first in (_label, _label.capitalize()):
+        if _name == 'case_number':
+            FIELD_NAMES[_first + ' number'] = _name
+            FIELD_NAMES[_first + ' Number'] = _name
+        else:
+            FIELD_NAMES[_first] = _name
+REQUIRED_FIELDS = ('case_number', 'summary', 'team', 'confidence')
+REQUIRED_SET = frozenset(REQUIRED_FIELDS)
+
+class ParsedCase:
+    """Compact record for a parsed case; also readable like the old dict"""
+
+    __slots__ = ('case_number', 'summary', 'team', 'confidence', 'bot')
+
+    def __init__(self, case_number, summary, team, confidence, bot=None):
+        self.case_number = case_number
+        self.summary = summary
+        self.team = team
+        self.confidence = confidence
+        self.bot = bot
+
+    def __getitem__(self, key):
+        try:
+            value = getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return key in self.__slots__ and getattr(self, key) is not None
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.__slots__ if getattr(self, key) is not None}
+
+    def __repr__(self):
+        return f"ParsedCase({self.to_dict()})"
+
 class CaseParser:
     def __init__(self):
         pass
-    
+
     def parse_case_text(self, text):
         """
         Parse case text with the following format:
-        
+
         Case number: 12312
         Summary: user a is having issues
         Team: IAM team
         Confidence: 80%
-        
-        Returns a dictionary with the parsed information or None if parsing fails.
+        Bot: agentforce   (optional)
+
+        Returns a ParsedCase for the first case in the text or None if parsing fails.
         """
         try:
-            case_data = {}
-            
-            # Extract case number
-            case_number_match = re.search(r'Case number:\s*(.*?)(?:\n|$)', text)
-            if case_number_match:
-                case_data['case_number'] = case_number_match.group(1).strip()
-            
-            # Extract summary
-            summary_match = re.search(r'Summary:\s*(.*?)(?:\n|$)', text)
-            if summary_match:
-                case_data['summary'] = summary_match.group(1).strip()
-            
-            # Extract team
-            team_match = re.search(r'Team:\s*(.*?)(?:\n|$)', text)
-            if team_match:
-                case_data['team'] = team_match.group(1).strip().lower()
-            
-            # Extract confidence
-            confidence_match = re.search(r'Confidence:\s*(\d+)%', text)
-            if confidence_match:
-                confidence = int(confidence_match.group(1))
-                case_data['confidence'] = confidence
-            
-            # Check if all required fields are present
-            required_fields = ['case_number', 'summary', 'team', 'confidence']
-            if all(field in case_data for field in required_fields):
-                logger.info(f"Successfully parsed case: {case_data['case_number']} with confidence {case_data['confidence']}%")
-                return case_data
-            else:
-                missing = [field for field in required_fields if field not in case_data]
-                logger.warning(f"Case parsing failed, missing fields: {missing}")
-                return None
-                
+            missing = list(REQUIRED_FIELDS)
+            for fields in self._blocks(text):
+                if fields.keys() >= REQUIRED_SET:
+                    case = ParsedCase(**fields)
+                    logger.info("Successfully parsed case: %s with confidence %s%%", case.case_number, case.confidence)
+                    return case
+                missing = min(missing, [field for field in REQUIRED_FIELDS if field not in fields], key=len)
+
+            logger.warning("Case parsing failed, missing fields: %s", missing)
+            return None
+
         except Exception as e:
-            logger.exception(f"Error parsing case text: {e}")
-            return None 
\ No newline at end of file
+            logger.exception("Error parsing case text: %s", e)
+            return None
+
+    def parse_many(self, source):
+        """Yield a ParsedCase for every complete case block in source.
+
+        source may be a single string (one message or a whole backlog dump)
+        or any iterable of lines, such as an open file, so large dumps are
+        parsed without loading them into memory. Incomplete blocks are skipped.
+        """
+        for fields in self._blocks(source):
+            if fields.keys() >= REQUIRED_SET:
+                yield ParsedCase(**fields)
+
+    def _fields(self, source):
+        """Return (field, value) pairs in the order they appear"""
+        if isinstance(source, str):
+            # Messages without a colon cannot hold any field
+            if ':' not in source:
+                return []
+            first_line, _, rest = source.partition('\n')
+            leading = LEADING_FIELD_RE.match(first_line)
+            return ([leading.groups()] if leading else []) + FIELD_RE.findall(rest)
+        return self._line_fields(iter(source))
+
+    def _line_fields(self, lines):
+        first_line = next(lines, None)
+        leading = LEADING_FIELD_RE.match(first_line) if first_line is not None else None
+        if leading:
+            yield leading.groups()
+        for match in map(FIELD_RE.match, lines):
+            if match:
+                yield match.groups()
+
+    def _blocks(self, source):
+        """Group fields into case blocks.
+
+        A new case number starts a new block, as does any repeated field
+        once the block is complete. Otherwise a repeated field replaces the
+        earlier value, so a stray line such as "Team: fyi" above the case
+        does not split it. Fields with empty values are ignored.
+        """
+        fields = {}
+        for name, value in self._fields(source):
+            name = FIELD_NAMES[name]
+            value = value.strip()
+            if not value:
+                continue
+            if name == 'confidence':
+                confidence_match = CONFIDENCE_RE.match(value)
+                if not confidence_match:
+                    continue
+                value = int(confidence_match.group(1))
+            elif name == 'team':
+                value = value.lower()
+
+            if name in fields and (name == 'case_number' or fields.keys() >= REQUIRED_SET):
+                yield fields
+                fields = {}
+            fields[name] = value
+        if fields:
+            yield fields
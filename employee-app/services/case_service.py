@@ -1,18 +1,67 @@
 import logging
+import time
 import config
-from .case_parser import CaseParser
+from .case_parser import CaseParser, ParsedCase
 from .agent_service import AgentForceService
 from .team_service import TeamService
+from .message_cache import MessageCache
+from .log_pipeline import add_log_context
+from .tracing import traced, tracer
 
 logger = logging.getLogger(__name__)
 
+# handle_case's default: the caller has not parsed the text. None means it did and found no case.
+NOT_PARSED = object()
+
 class CaseService:
-    def __init__(self):
+    def __init__(self, agent_service=None, message_cache=None, team_registry=None, team_classifier=None):
         self.case_parser = CaseParser()
-        self.agent_service = AgentForceService()
-        self.team_service = TeamService()
-        
-    async def handle_case(self, text, user_id, timestamp, thread_ts, say, client=None):
+        self.agent_service = agent_service or AgentForceService()
+        self.message_cache = message_cache or MessageCache()
+        self.team_service = TeamService(self.message_cache, team_registry)
+        self.team_registry = self.team_service.team_registry
+        self.team_classifier = team_classifier
+        self.predictions = 0
+
+    def predict_case(self, text, timestamp):
+        """Case data for an unstructured message from the team classifier, or None"""
+        if self.team_classifier is None:
+            return None
+        prediction = self.team_classifier.predict(text)
+        if not prediction:
+            return None
+        team_name, confidence = prediction
+        team = self.team_registry.get(team_name)
+        if team is None or confidence < config.CLASSIFIER_MIN_CONFIDENCE:
+            return None
+        self.predictions += 1
+        return ParsedCase(
+            case_number=f"SL-{timestamp.replace('.', '')}",
+            summary=" ".join(text.split())[:300],
+            team=team.name,
+            confidence=confidence
+        )
+
+    def parse_case(self, text, timestamp):
+        """Parse the case fields, falling back to a predicted team for free-form messages"""
+        return self.case_parser.parse_case_text(text) or self.predict_case(text, timestamp)
+
+    def classify_case(self, text, timestamp):
+        """Return (priority class, team, parsed case data) used to schedule a case"""
+        if text.lower().strip().startswith("agentforce"):
+            return "agentforce", None, None
+
+        case_data = self.parse_case(text, timestamp)
+        if not case_data:
+            return "generic", None, None
+        if case_data.get('bot', '').lower() == 'agentforce':
+            return "agentforce", case_data['team'], case_data
+        if case_data['confidence'] >= 90:
+            return "auto_route", case_data['team'], case_data
+        return "generic", case_data['team'], case_data
+
+    @traced("handle_case")
+    async def handle_case(self, text, user_id, timestamp, thread_ts, say, client=None, case_data=NOT_PARSED):
         """Handle messages in the central_case channel"""
         try:
             # Check message prefixes first
@@ -31,9 +80,16 @@ class CaseService:
                 }
                 return await self.process_agentforce_case(case_data, text, user_id, thread_ts, say, client)
 
-            # Parse the case text
-            case_data = self.case_parser.parse_case_text(text)
+            # Parse the case text unless the caller already did
+            if case_data is NOT_PARSED:
+                case_data = self.parse_case(text, timestamp)
             
+            if case_data:
+                add_log_context(case_number=case_data['case_number'])
+                tracer.set_attribute("case.number", case_data['case_number'])
+                tracer.set_attribute("case.team", case_data['team'])
+                tracer.set_attribute("case.confidence", case_data['confidence'])
+
             if not case_data:
                 # If parsing failed, use the original handler
                 logger.info("Text does not match case format, using default response")
@@ -47,26 +103,95 @@ class CaseService:
             # Check confidence threshold
             if case_data['confidence'] >= 90:
                 # High confidence, auto-route to team
-                logger.info(f"High confidence case ({case_data['confidence']}%), auto-routing to {case_data['team']}")
+                logger.info("High confidence case (%s%%), auto-routing to %s", case_data['confidence'], case_data['team'])
                 await self.team_service.route_to_team(case_data, user_id, thread_ts, say, client)
             else:
                 # Lower confidence, show handoff buttons
-                logger.info(f"Lower confidence case ({case_data['confidence']}%), showing handoff buttons")
+                logger.info("Lower confidence case (%s%%), showing handoff buttons", case_data['confidence'])
                 await self.show_handoff_options(case_data, text, user_id, timestamp, thread_ts, say)
                 
             return True
             
         except Exception as e:
-            logger.exception(f"Error handling case: {e}")
+            logger.exception("Error handling case: %s", e)
             # Fallback to generic handler on error
             return await self.handle_generic_case(text, user_id, timestamp, thread_ts, say)
-    
 
+    @traced("process_agentforce_case")
+    async def process_agentforce_case(self, case_data, text, user_id, thread_ts, say, client=None):
+        """Send a case to AgentForce and share the response in the case thread"""
+        # Reuse one AgentForce conversation per Slack thread
+        conversation_key = (config.CENTRAL_CASE_CHANNEL_ID, thread_ts)
+        query = case_data.get('summary') or text
+        header = f"*AgentForce response for case #{case_data['case_number']}*"
+        tracer.set_attribute("case.number", case_data['case_number'])
+        add_log_context(case_number=case_data['case_number'])
+
+        logger.info("Processing case %s with AgentForce", case_data['case_number'])
+        if config.AGENTFORCE_STREAMING and client:
+            response = await self.stream_agentforce_response(query, conversation_key, header, thread_ts, say, client)
+        else:
+            response = await self.agent_service.process_message(query, conversation_key=conversation_key)
+            await say(text=f"{header}\n\n{response}", thread_ts=thread_ts)
+
+        # Share the response with the assigned team as well
+        target_channel = self.team_service.get_team_channel(case_data['team'])
+        if client and target_channel:
+            await client.chat_postMessage(
+                channel=target_channel,
+                text=f"*Case #{case_data['case_number']} from <@{user_id}>*\n\n"
+                     f"*Summary:* {case_data['summary']}\n\n"
+                     f"*AgentForce response:*\n{response}"
+            )
+
+        return True
+
+    async def stream_agentforce_response(self, query, conversation_key, header, thread_ts, say, client):
+        """Post a placeholder and fill it in as the AgentForce reply streams in"""
+        placeholder = await say(text=f"{header}\n\n:hourglass: Waiting for AgentForce...", thread_ts=thread_ts)
+        channel = placeholder.get("channel", config.CENTRAL_CASE_CHANNEL_ID)
+        ts = placeholder["ts"]
+
+        response = ""
+        last_update = 0.0
+        async for chunk in self.agent_service.process_message_stream(query, conversation_key=conversation_key):
+            response += chunk
+            # Throttle chat_update so long replies stay within Slack rate limits
+            now = time.monotonic()
+            if now - last_update >= config.AGENTFORCE_STREAM_UPDATE_INTERVAL:
+                last_update = now
+                await client.chat_update(channel=channel, ts=ts, text=f"{header}\n\n{response} :writing_hand:")
+
+        if not response:
+            response = "No response received from AgentForce."
+        await client.chat_update(channel=channel, ts=ts, text=f"{header}\n\n{response}")
+        return response
+
+    @traced("show_handoff_options")
     async def show_handoff_options(self, case_data, text, user_id, timestamp, thread_ts, say):
         """Show handoff buttons for a case with team recommendation"""
         team_name = case_data['team']
+        suggested, _ = self.team_service.resolve_teams(team_name)
+        
+        # The suggested teams first and highlighted, then the other teams marked for buttons
+        buttons = []
+        for team in suggested:
+            buttons.append({
+                "type": "button",
+                "text": {"type": "plain_text", "text": f"Hand-off to {team.name}"},
+                "style": "primary",
+                "value": f"{team.key}_{timestamp}",
+                "action_id": team.action_id
+            })
+        for team in self.team_registry.button_teams:
+            if team not in suggested:
+                buttons.append({
+                    "type": "button",
+                    "text": {"type": "plain_text", "text": f"Hand-off to {team.name}"},
+                    "value": f"{team.key}_{timestamp}",
+                    "action_id": team.action_id
+                })
         
-        # Create interactive buttons for team hand-off with the suggested team highlighted
         blocks = [
             {
                 "type": "section",
@@ -85,48 +210,21 @@ class CaseService:
             {
                 "type": "actions",
                 "block_id": f"handoff_buttons_{timestamp}",
-                "elements": [
-                    {
-                        "type": "button",
-                        "text": {
-                            "type": "plain_text", 
-                            "text": f"Hand-off to {team_name}"
-                        },
-                        "style": "primary",  # Highlight the suggested team
-                        "value": f"{self.team_service.normalize_team_name(team_name)}_{timestamp}",
-                        "action_id": f"handoff_{self.team_service.normalize_team_name(team_name)}"
-                    },
-                    {
-                        "type": "button",
-                        "text": {"type": "plain_text", "text": "Hand-off to Support"},
-                        "value": f"support_{timestamp}",
-                        "action_id": "handoff_support"
-                    },
-                    {
-                        "type": "button",
-                        "text": {"type": "plain_text", "text": "Hand-off to Sales"},
-                        "value": f"sales_{timestamp}",
-                        "action_id": "handoff_sales"
-                    },
-                    {
-                        "type": "button",
-                        "text": {"type": "plain_text", "text": "Hand-off to Engineering"},
-                        "value": f"engineering_{timestamp}",
-                        "action_id": "handoff_engineering"
-                    }
-                ]
+                # Slack allows 25 elements in an actions block
+                "elements": buttons[:25]
             }
         ]
 
         # Send response as a thread to the original message
-        logger.info(f"Sending case blocks with suggested team {team_name} in thread {thread_ts}")
+        logger.info("Sending case blocks with suggested team %s in thread %s", team_name, thread_ts)
         await say(blocks=blocks, thread_ts=thread_ts)
         logger.info("Case response sent successfully")
     
+    @traced("handle_generic_case")
     async def handle_generic_case(self, text, user_id, timestamp, thread_ts, say):
         """Handle generic (non-structured) case messages"""
         try:
-            # Create standard interactive buttons for team hand-off
+            # Hand-off buttons for the teams in the registry
             blocks = [
                 {
                     "type": "section",
@@ -138,25 +236,16 @@ class CaseService:
                 {
                     "type": "actions",
                     "block_id": f"handoff_buttons_{timestamp}",
+                    # Slack allows 25 elements in an actions block, one is the AgentForce button
                     "elements": [
                         {
                             "type": "button",
-                            "text": {"type": "plain_text", "text": "Hand-off to Support"},
-                            "value": f"support_{timestamp}",
-                            "action_id": "handoff_support"
-                        },
-                        {
-                            "type": "button",
-                            "text": {"type": "plain_text", "text": "Hand-off to Sales"},
-                            "value": f"sales_{timestamp}",
-                            "action_id": "handoff_sales"
-                        },
-                        {
-                            "type": "button",
-                            "text": {"type": "plain_text", "text": "Hand-off to Engineering"},
-                            "value": f"engineering_{timestamp}",
-                            "action_id": "handoff_engineering"
-                        },
+                            "text": {"type": "plain_text", "text": f"Hand-off to {team.name}"},
+                            "value": f"{team.key}_{timestamp}",
+                            "action_id": team.action_id
+                        }
+                        for team in self.team_registry.button_teams[:24]
+                    ] + [
                         {
                             "type": "button",
                             "text": {"type": "plain_text", "text": "Process with AgentForce"},
@@ -168,10 +257,10 @@ class CaseService:
             ]
             
             # Send response as a thread to the original message
-            logger.info(f"Sending standard case response blocks in thread {thread_ts}")
+            logger.info("Sending standard case response blocks in thread %s", thread_ts)
             await say(blocks=blocks, thread_ts=thread_ts)
             logger.info("Standard case response sent successfully")
             return True
         except Exception as e:
-            logger.exception(f"Error sending standard case response: {e}")
+            logger.exception("Error sending standard case response: %s", e)
             return False 
\ No newline at end of file
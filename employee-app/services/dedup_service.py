@@ -0,0 +1,92 @@
+import logging
+import asyncio
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+import config
+from .ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+class EventDeduplicator:
+    """Drops Slack events that were already delivered within a time window.
+
+    Keys are remembered in a bounded in-memory window. When db_path is
+    set they are also written to SQLite so redeliveries after a restart
+    are caught too.
+    """
+
+    def __init__(self, window_seconds=None, maxsize=None, db_path=None):
+        self.window_seconds = window_seconds or config.DEDUP_WINDOW_SECONDS
+        self.recent = TTLCache(maxsize=maxsize or config.DEDUP_CACHE_SIZE, ttl=self.window_seconds)
+        self.db_path = db_path if db_path is not None else config.DEDUP_DB_PATH
+        self.hits = 0
+        self.checked = 0
+        self._db = None
+        # SQLite work runs on one background thread so the event loop never blocks on disk
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dedup") if self.db_path else None
+        self._last_prune = 0.0
+
+    def event_keys(self, body):
+        """Return the keys identifying an events API payload"""
+        keys = []
+        if body.get("event_id"):
+            keys.append(f"id:{body['event_id']}")
+        event = body.get("event") or {}
+        if event.get("channel") and event.get("ts"):
+            # Include the type: a mention also arrives as a message with the same ts
+            keys.append(f"msg:{event.get('type')}:{event['channel']}:{event['ts']}")
+        return keys
+
+    async def is_duplicate(self, body):
+        """Record the event and return True if it has been seen before"""
+        keys = self.event_keys(body)
+        if not keys:
+            return False
+        self.checked += 1
+
+        duplicate = any(self.recent.peek(key) for key in keys)
+        if not duplicate and self._executor is not None:
+            loop = asyncio.get_running_loop()
+            duplicate = await loop.run_in_executor(self._executor, self._check_and_store, keys)
+        for key in keys:
+            self.recent.set(key, True)
+
+        if duplicate:
+            self.hits += 1
+            logger.info("Skipping duplicate event delivery %s", keys[0])
+        return duplicate
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.db_path)
+            self._db.execute("CREATE TABLE IF NOT EXISTS seen_events (key TEXT PRIMARY KEY, seen_at REAL NOT NULL)")
+            self._db.commit()
+        return self._db
+
+    def _check_and_store(self, keys):
+        db = self._connect()
+        now = time.time()
+        cutoff = now - self.window_seconds
+        placeholders = ",".join("?" for _ in keys)
+        row = db.execute(
+            f"SELECT 1 FROM seen_events WHERE key IN ({placeholders}) AND seen_at >= ? LIMIT 1",
+            (*keys, cutoff)
+        ).fetchone()
+        db.executemany("INSERT OR REPLACE INTO seen_events (key, seen_at) VALUES (?, ?)", [(key, now) for key in keys])
+        if now - self._last_prune > self.window_seconds / 10:
+            db.execute("DELETE FROM seen_events WHERE seen_at < ?", (cutoff,))
+            self._last_prune = now
+        db.commit()
+        return row is not None
+
+    def close(self):
+        if self._executor is not None:
+            if self._db is not None:
+                self._executor.submit(self._db.close).result()
+                self._db = None
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self):
+        return {"checked": self.checked, "duplicates": self.hits, "window_size": len(self.recent)}
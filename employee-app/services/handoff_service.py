@@ -1,38 +1,26 @@
 import logging
 import config
 from .team_service import TeamService
+from .message_cache import MessageCache
+from .tracing import traced
 
 logger = logging.getLogger(__name__)
 
 class HandoffService:
-    def __init__(self):
-        self.team_service = TeamService()
+    def __init__(self, message_cache=None, team_registry=None, handoff_log=None):
+        self.message_cache = message_cache or MessageCache()
+        self.team_service = TeamService(self.message_cache, team_registry, handoff_log)
+        self.team_registry = self.team_service.team_registry
 
+    @traced("process_handoff")
     async def process_handoff(self, action_id, user_id, timestamp, body, client):
         """Process the hand-off action from button click"""
         try:
-            # Determine target channel based on action
-            team_name = ""
+            # Each team's button carries its own action ID
+            team = self.team_registry.for_action(action_id)
             
-            # Check if this is a standard team or dynamic team
-            if action_id.startswith("handoff_"):
-                team_id = action_id.replace("handoff_", "")
-                
-                # Handle standard teams
-                if team_id == "support":
-                    team_name = "Support"
-                elif team_id == "sales":
-                    team_name = "Sales"
-                elif team_id == "engineering":
-                    team_name = "Engineering"
-                else:
-                    # This is a dynamic team, try to extract the team name from the button text
-                    button_text = body["actions"][0].get("text", {}).get("text", "")
-                    if button_text.startswith("Hand-off to "):
-                        team_name = button_text.replace("Hand-off to ", "")
-  
-            if not team_name:
-                logger.error(f"No team name found for action {action_id}")
+            if not team:
+                logger.error("No team found for action %s", action_id)
                 await client.chat_postMessage(
                     channel=config.CENTRAL_CASE_CHANNEL_ID,
                     thread_ts=timestamp,
@@ -40,10 +28,10 @@ class HandoffService:
                 )
                 return
             
-            logger.info(f"Handling hand-off to {team_name}")
+            logger.info("Handling hand-off to %s", team.name)
             
             # Use TeamService to handle the handoff
-            await self.team_service.update_handoff_status(team_name, user_id, timestamp, body, client)
+            await self.team_service.update_handoff_status(team.name, user_id, timestamp, body, client)
             
         except Exception as e:
-            logger.exception(f"Error during hand-off process: {e}") 
\ No newline at end of file
+            logger.exception("Error during hand-off process: %s", e) 
\ No newline at end of file
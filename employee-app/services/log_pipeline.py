@@ -0,0 +1,188 @@
+import logging
+import logging.handlers
+import atexit
+import contextvars
+import json
+import queue
+import random
+import sys
+import time
+from contextlib import contextmanager
+import config
+from .tracing import tracer
+
+_log_context = contextvars.ContextVar("log_context", default={})
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+@contextmanager
+def log_context(**fields):
+    """Attach fields such as case_number or thread_ts to every record logged inside the block"""
+    token = _log_context.set({**_log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+def add_log_context(**fields):
+    """Add fields for the rest of the current task, e.g. once a case number is known"""
+    _log_context.set({**_log_context.get(), **fields})
+
+def current_log_context():
+    return _log_context.get()
+
+def parse_sampling(text):
+    """Parse "logger.prefix=rate,..." into {prefix: rate}"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        prefix, _, rate = item.partition("=")
+        rate = float(rate)
+        if not 0 <= rate <= 1:
+            raise ValueError(f"Log sample rate for {prefix} must be between 0 and 1")
+        rates[prefix.strip()] = rate
+    return rates
+
+class ContextFilter(logging.Filter):
+    """Copies the log context and trace id onto the record in the thread that logs"""
+
+    def filter(self, record):
+        record.context = _log_context.get()
+        span = tracer.current_span()
+        record.trace_id = span.trace_id if span is not None else None
+        return True
+
+class SamplingFilter(logging.Filter):
+    """Keeps a share of records below WARNING for noisy loggers.
+
+    Rates come from LOG_SAMPLING by logger name prefix; the longest
+    matching prefix wins. A call can pass extra={"sample_rate": 0.01}
+    to override it. Warnings and errors are never sampled.
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = rates or {}
+        self.sampled_out = 0
+        self._by_logger = {}
+
+    def rate_for(self, name):
+        rate = self._by_logger.get(name)
+        if rate is None:
+            matches = [p for p in self.rates if name == p or name.startswith(p + ".")]
+            rate = self.rates[max(matches, key=len)] if matches else 1.0
+            self._by_logger[name] = rate
+        return rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = getattr(record, "sample_rate", None)
+        if rate is None:
+            rate = self.rate_for(record.name)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the log context as top-level fields"""
+
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        entry.update(getattr(record, "context", None) or {})
+        if getattr(record, "trace_id", None):
+            entry["trace_id"] = record.trace_id
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, default=str)
+
+class TextFormatter(logging.Formatter):
+    """The classic text format, with the log context appended"""
+
+    def format(self, record):
+        line = super().format(record)
+        context = getattr(record, "context", None)
+        if context:
+            line += " [" + " ".join(f"{key}={value}" for key, value in context.items()) + "]"
+        return line
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the writer thread without formatting or blocking.
+
+    The message is rendered on the writer thread, so disabled or sampled
+    records cost no string building. When the queue is full the record
+    is dropped and counted rather than stalling the event loop.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        if record.exc_info:
+            # Tracebacks reference live frames, so render them here
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class LogListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # Wait for room so the sentinel is not lost on a full queue
+        self.queue.put(self._sentinel)
+
+class LogPipeline:
+    """Root logger setup: filters and queue in the caller, formatting and I/O on a writer thread"""
+
+    def __init__(self, level=None, fmt=None, queue_size=None, sampling=None, stream=None):
+        self.queue = queue.Queue(maxsize=queue_size or config.LOG_QUEUE_SIZE)
+        self.handler = NonBlockingQueueHandler(self.queue)
+        self.sampler = SamplingFilter(parse_sampling(config.LOG_SAMPLING if sampling is None else sampling))
+        self.handler.addFilter(self.sampler)
+        self.handler.addFilter(ContextFilter())
+
+        output = logging.StreamHandler(stream or sys.stderr)
+        fmt = fmt or config.LOG_FORMAT
+        output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter(TEXT_FORMAT))
+        self.listener = LogListener(self.queue, output)
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(self.handler)
+        root.setLevel(getattr(logging, level or config.LOG_LEVEL))
+        self.listener.start()
+        self.started = True
+        atexit.register(self.close)
+
+    @property
+    def dropped(self):
+        return self.handler.dropped
+
+    @property
+    def sampled_out(self):
+        return self.sampler.sampled_out
+
+    def close(self):
+        """Write out queued records and stop the writer thread"""
+        if self.started:
+            self.started = False
+            self.listener.stop()
+
+def configure_logging(**kwargs):
+    """Install the log pipeline on the root logger and return it"""
+    return LogPipeline(**kwargs)
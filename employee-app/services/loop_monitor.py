@@ -0,0 +1,94 @@
+import logging
+import asyncio
+import sys
+import threading
+import time
+import traceback
+import config
+from .metrics import EVENT_LOOP_LAG
+
+logger = logging.getLogger(__name__)
+
+class LoopLagMonitor:
+    """Measures event loop scheduling lag and reports where the loop is stuck.
+
+    A heartbeat task sleeps for a short interval and records how late it
+    wakes up. A watchdog thread notices when the heartbeat stops and logs
+    the loop thread's stack while it is still blocked, so the log names
+    the code doing the blocking rather than whatever runs after it.
+    """
+
+    def __init__(self, threshold=None, interval=None):
+        self.threshold = threshold or config.LOOP_LAG_THRESHOLD
+        self.interval = interval or config.LOOP_LAG_INTERVAL
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.loop = None
+        self.loop_thread_id = None
+        self.last_beat = None
+        self._task = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.ensure_future(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info("Event loop lag monitor started (threshold %.0f ms)", self.threshold * 1000)
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self.last_beat = now
+            EVENT_LOOP_LAG.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= self.threshold:
+                self.stalls += 1
+                logger.warning("Event loop lagged %.0f ms", lag * 1000)
+
+    def _watch(self):
+        reported = None
+        while not self._stop.wait(self.threshold / 2):
+            beat = self.last_beat
+            blocked_for = time.monotonic() - beat - self.interval
+            if blocked_for >= self.threshold and reported != beat:
+                # Report each stall once, while the loop thread is still inside it
+                reported = beat
+                logger.warning(
+                    "Event loop blocked for %.0f ms in %s:\n%s",
+                    blocked_for * 1000, self.current_task_name(), self.stack_snapshot()
+                )
+
+    def current_task_name(self):
+        task = asyncio.current_task(self.loop)
+        if task is None:
+            return "<no task>"
+        coro = task.get_coro()
+        return f"{task.get_name()} ({getattr(coro, '__qualname__', coro)})"
+
+    def stack_snapshot(self):
+        frame = sys._current_frames().get(self.loop_thread_id)
+        if frame is None:
+            return "<no frame>"
+        return "".join(traceback.format_stack(frame))
+
+    def close(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        return {"max_lag": self.max_lag, "stalls": self.stalls}
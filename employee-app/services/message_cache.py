@@ -0,0 +1,41 @@
+import logging
+import config
+from .ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+class MessageCache:
+    """Recently seen Slack messages keyed by (channel, ts)"""
+
+    def __init__(self, maxsize=None, ttl=None):
+        self.messages = TTLCache(
+            maxsize=maxsize or config.MESSAGE_CACHE_SIZE,
+            ttl=ttl or config.MESSAGE_CACHE_TTL_SECONDS
+        )
+
+    def add(self, channel, ts, text, user=None):
+        """Remember a message as it arrives"""
+        self.messages.set((channel, ts), {"ts": ts, "text": text, "user": user})
+
+    async def get_message(self, client, channel, ts):
+        """Return the message at (channel, ts), asking Slack only on a cache miss"""
+        message = self.messages.get((channel, ts))
+        if message is not None:
+            return message
+
+        logger.info("Message cache miss for %s/%s, fetching from Slack", channel, ts)
+        result = await client.conversations_history(
+            channel=channel,
+            inclusive=True,
+            latest=ts,
+            limit=1
+        )
+        if result["ok"] and result["messages"]:
+            original = result["messages"][0]
+            message = {"ts": original.get("ts", ts), "text": original["text"], "user": original.get("user")}
+            self.messages.set((channel, ts), message)
+            return message
+        return None
+
+    def stats(self):
+        return self.messages.stats()
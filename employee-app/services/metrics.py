@@ -0,0 +1,196 @@
+import logging
+import functools
+import time
+from aiohttp import web
+import config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+def _format_labels(label_names, label_values, extra=None):
+    pairs = list(zip(label_names, label_values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+class Metric:
+    """Base class: a named metric with a fixed set of label names"""
+
+    type_name = "untyped"
+
+    def __init__(self, name, help_text, label_names=(), function=None):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.values = {}
+        # Optional callable returning the current value, read at scrape time
+        self.function = function
+
+    def _key(self, labels):
+        return tuple(labels.get(name, "") for name in self.label_names)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.type_name}"]
+
+    def render(self):
+        if self.function is not None:
+            self.values[()] = self.function()
+        lines = self.header()
+        for key, value in self.values.items():
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value}")
+        return lines
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+class Gauge(Metric):
+    type_name = "gauge"
+
+    def set(self, value, **labels):
+        self.values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        state = self.values.get(key)
+        if state is None:
+            # Per-bucket counts plus sum and count
+            state = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+        counts = state[0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        state[1] += value
+        state[2] += 1
+
+    def render(self):
+        lines = self.header()
+        for key, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, ('le', bound))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, ('le', '+Inf'))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+class Registry:
+    """Holds every metric and renders them in Prometheus text format"""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def _register(self, metric):
+        existing = self.metrics.get(metric.name)
+        if existing is not None:
+            if metric.function is not None:
+                existing.function = metric.function
+            return existing
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, label_names=(), function=None):
+        return self._register(Counter(name, help_text, label_names, function))
+
+    def gauge(self, name, help_text, label_names=(), function=None):
+        return self._register(Gauge(name, help_text, label_names, function))
+
+    def histogram(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, label_names, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+# Process-wide registry, like the logging module's root logger
+registry = Registry()
+
+LISTENER_DURATION = registry.histogram(
+    "slack_listener_duration_seconds", "Time spent in Bolt listeners", ("listener",)
+)
+AGENTFORCE_DURATION = registry.histogram(
+    "agentforce_request_duration_seconds", "AgentForce API call latency", ("operation",)
+)
+SLACK_API_CALLS = registry.counter("slack_api_calls_total", "Slack Web API calls", ("method",))
+SLACK_API_ERRORS = registry.counter("slack_api_errors_total", "Slack Web API calls that failed", ("method",))
+SLACK_API_RATE_LIMITED = registry.counter("slack_api_rate_limited_total", "Slack Web API 429 responses", ("method",))
+SLACK_API_DURATION = registry.histogram("slack_api_duration_seconds", "Slack Web API call latency", ("method",))
+WORK_QUEUE_WAIT = registry.histogram("work_queue_wait_seconds", "Time jobs wait in the work queue", ("job", "priority"))
+WORK_QUEUE_PROCESSING = registry.histogram("work_queue_processing_seconds", "Time spent running queued jobs", ("job",))
+WORK_QUEUE_SHED = registry.counter("work_queue_shed_total", "Jobs rejected or dropped because the work queue was full",
+                                   ("job", "reason"))
+EVENT_LOOP_LAG = registry.histogram(
+    "event_loop_lag_seconds", "How late the event loop runs scheduled callbacks",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+
+def timed(histogram, **labels):
+    """Decorator recording how long an async function takes"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started, **labels)
+        return wrapper
+    return decorator
+
+class MetricsServer:
+    """Serves the registry on a local HTTP /metrics endpoint"""
+
+    def __init__(self, host=None, port=None, metrics_registry=None):
+        self.host = host or config.METRICS_HOST
+        self.port = port if port is not None else config.METRICS_PORT
+        self.registry = metrics_registry or registry
+        self.runner = None
+        self.routes = [("/metrics", self.handle_metrics)]
+
+    async def handle_metrics(self, request):
+        return web.Response(text=self.registry.render(), content_type="text/plain", charset="utf-8")
+
+    def add_get(self, path, handler):
+        """Serve another local-only endpoint, e.g. debug tools; call before start()"""
+        self.routes.append((path, handler))
+
+    async def start(self):
+        if not self.port:
+            return
+        app = web.Application()
+        for path, handler in self.routes:
+            app.router.add_get(path, handler)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        logger.info("Metrics available at http://%s:%d/metrics", self.host, self.port)
+
+    async def close(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
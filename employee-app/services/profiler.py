@@ -0,0 +1,112 @@
+import logging
+import asyncio
+import cProfile
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from aiohttp import web
+import config
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("sample", "cprofile")
+
+def folded_stack(frame):
+    """Render a frame and its callers as root;...;leaf, the flamegraph collapsed format"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+class Profiler:
+    """Profiles the event loop thread on demand for a fixed number of seconds.
+
+    "sample" reads the loop thread's stack from a background thread at a
+    fixed interval and writes collapsed stacks (flamegraph.pl, speedscope).
+    "cprofile" runs cProfile on the loop thread and writes a .prof file
+    (snakeviz, flameprof).
+    """
+
+    def __init__(self, output_dir=None, max_seconds=None, sample_interval=0.005):
+        self.output_dir = output_dir or config.PROFILE_DIR
+        self.max_seconds = max_seconds or config.PROFILE_MAX_SECONDS
+        self.sample_interval = sample_interval
+        self.running = False
+
+    def _output_path(self, mode):
+        os.makedirs(self.output_dir, exist_ok=True)
+        suffix = "prof" if mode == "cprofile" else "folded"
+        now = time.time()
+        stamp = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}-{int(now * 1000) % 1000:03d}"
+        return os.path.join(self.output_dir, f"profile-{stamp}.{suffix}")
+
+    async def profile(self, seconds, mode="sample"):
+        """Profile for the given time and return the path of the written profile"""
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+        if self.running:
+            raise RuntimeError("A profile is already running")
+        self.running = True
+        try:
+            path = self._output_path(mode)
+            logger.info("Profiling the event loop for %ss (%s)", seconds, mode)
+            if mode == "cprofile":
+                await self._run_cprofile(seconds, path)
+            else:
+                await self._run_sampler(seconds, path)
+            logger.info("Profile written to %s", path)
+            return path
+        finally:
+            self.running = False
+
+    async def _run_cprofile(self, seconds, path):
+        # cProfile hooks the thread that enables it, which is the loop thread here
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profile.disable()
+        profile.dump_stats(path)
+
+    async def _run_sampler(self, seconds, path):
+        loop_thread_id = threading.get_ident()
+        stacks = Counter()
+        stop = threading.Event()
+
+        def sample():
+            while not stop.wait(self.sample_interval):
+                frame = sys._current_frames().get(loop_thread_id)
+                if frame is not None:
+                    stacks[folded_stack(frame)] += 1
+
+        sampler = threading.Thread(target=sample, name="loop-sampler", daemon=True)
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            stop.set()
+            await asyncio.get_running_loop().run_in_executor(None, sampler.join)
+        with open(path, "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    async def handle_profile(self, request):
+        """GET /debug/profile?seconds=10&mode=sample|cprofile"""
+        try:
+            seconds = float(request.query.get("seconds", "10"))
+        except ValueError:
+            return web.json_response({"error": "seconds must be a number"}, status=400)
+        mode = request.query.get("mode", "sample")
+        if not 0 < seconds <= self.max_seconds:
+            return web.json_response({"error": f"seconds must be between 0 and {self.max_seconds}"}, status=400)
+        if mode not in PROFILE_MODES:
+            return web.json_response({"error": f"mode must be one of {', '.join(PROFILE_MODES)}"}, status=400)
+        if self.running:
+            return web.json_response({"error": "a profile is already running"}, status=409)
+        path = await self.profile(seconds, mode)
+        return web.json_response({"path": os.path.abspath(path), "mode": mode, "seconds": seconds})
@@ -0,0 +1,210 @@
+import logging
+import asyncio
+import hashlib
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+import config
+from .ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# User, channel and broadcast mentions differ between reports of the same problem
+MENTION_RE = re.compile(r"<[@#!][^>]*>")
+WORD_RE = re.compile(r"\w+")
+
+def normalize_query(text):
+    """Lower-cased words of the text without mentions, punctuation or extra spaces"""
+    return " ".join(WORD_RE.findall(MENTION_RE.sub(" ", text).lower()))
+
+class ResponseUnavailable(Exception):
+    """AgentForce gave no usable reply; the message is shown to users and never cached"""
+
+class Flight:
+    """One upstream AgentForce call that identical queries wait on or stream from"""
+
+    def __init__(self):
+        self.text = ""
+        self.error = None
+        self.done = False
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def append(self, chunk):
+        self.text += chunk
+        self._notify()
+
+    def finish(self, error=None):
+        self.error = error
+        self.done = True
+        self._notify()
+
+    async def follow(self):
+        """Yield the reply as it arrives, from the start"""
+        sent = 0
+        while True:
+            changed = self._changed
+            if len(self.text) > sent:
+                chunk = self.text[sent:]
+                sent += len(chunk)
+                yield chunk
+            if self.done:
+                if self.error is not None:
+                    raise ResponseUnavailable(str(self.error))
+                return
+            await changed.wait()
+
+    async def result(self):
+        async for _ in self.follow():
+            pass
+        return self.text
+
+class ResponseCache:
+    """AgentForce replies keyed by agent ID and normalized query text.
+
+    When many people report the same incident, the first query calls
+    AgentForce and the others wait for that call (or stream it as it
+    arrives) instead of making their own. Replies are kept in an LRU
+    cache for ttl seconds and, when db_path is set, in SQLite so they
+    survive a restart. Failed replies are never cached.
+    """
+
+    def __init__(self, maxsize=None, ttl=None, db_path=None):
+        self.ttl = ttl or config.AGENTFORCE_RESPONSE_CACHE_TTL
+        maxsize = config.AGENTFORCE_RESPONSE_CACHE_SIZE if maxsize is None else maxsize
+        self.responses = TTLCache(maxsize=maxsize, ttl=self.ttl, sizeof=lambda text: len(text.encode()))
+        self.db_path = db_path if db_path is not None else config.AGENTFORCE_RESPONSE_CACHE_DB
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._flights = {}
+        self._db = None
+        # SQLite work runs on one background thread so the event loop never blocks on disk
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="response-cache") if self.db_path else None
+        self._last_prune = 0.0
+
+    @property
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    @property
+    def bytes(self):
+        return self.responses.bytes
+
+    def key(self, agent_id, text):
+        normalized = normalize_query(text)
+        if not normalized:
+            return None
+        return f"{agent_id}:{hashlib.sha256(normalized.encode()).hexdigest()}"
+
+    async def stream(self, key, request):
+        """Yield the reply for key from the cache, a call in flight, or request() (an async generator)"""
+        if key is None:
+            async for chunk in request():
+                yield chunk
+            return
+
+        cached = await self._lookup(key)
+        if cached is not None:
+            self.hits += 1
+            logger.info("Serving AgentForce reply from cache")
+            yield cached
+            return
+
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.hits += 1
+            self.coalesced += 1
+            logger.info("Waiting for the AgentForce call already running for this query")
+            async for chunk in flight.follow():
+                yield chunk
+            return
+
+        self.misses += 1
+        flight = self._flights[key] = Flight()
+        try:
+            async for chunk in request():
+                flight.append(chunk)
+                yield chunk
+            flight.finish()
+        except ResponseUnavailable as e:
+            flight.finish(e)
+            raise
+        finally:
+            del self._flights[key]
+            if not flight.done:
+                # The caller stopped reading; the followers must not wait forever
+                flight.finish(ResponseUnavailable("Failed to communicate with AgentForce. Please try again later."))
+        if flight.text:
+            await self._store(key, flight.text)
+
+    async def fetch(self, key, request):
+        """The whole reply for key, calling request() (a coroutine) at most once for concurrent callers"""
+        async def as_stream():
+            yield await request()
+        reply = ""
+        async for chunk in self.stream(key, as_stream):
+            reply += chunk
+        return reply
+
+    async def _lookup(self, key):
+        cached = self.responses.get(key)
+        if cached is None and self._executor is not None:
+            loop = asyncio.get_running_loop()
+            row = await loop.run_in_executor(self._executor, self._load, key)
+            if row is not None:
+                cached, age = row
+                self.responses.set(key, cached, age=age)
+        return cached
+
+    async def _store(self, key, reply):
+        self.responses.set(key, reply)
+        if self._executor is not None:
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(self._executor, self._save, key, reply)
+            except sqlite3.Error as e:
+                logger.error("Could not save AgentForce reply to %s: %s", self.db_path, e)
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.db_path)
+            self._db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, reply TEXT NOT NULL, stored_at REAL NOT NULL)")
+            self._db.commit()
+        return self._db
+
+    def _load(self, key):
+        try:
+            row = self._connect().execute(
+                "SELECT reply, stored_at FROM responses WHERE key = ? AND stored_at >= ?", (key, time.time() - self.ttl)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.error("Could not read AgentForce reply from %s: %s", self.db_path, e)
+            return None
+        return None if row is None else (row[0], time.time() - row[1])
+
+    def _save(self, key, reply):
+        db = self._connect()
+        now = time.time()
+        db.execute("INSERT OR REPLACE INTO responses (key, reply, stored_at) VALUES (?, ?, ?)", (key, reply, now))
+        if now - self._last_prune > self.ttl / 10:
+            db.execute("DELETE FROM responses WHERE stored_at < ?", (now - self.ttl,))
+            self._last_prune = now
+        db.commit()
+
+    def close(self):
+        if self._executor is not None:
+            if self._db is not None:
+                self._executor.submit(self._db.close).result()
+                self._db = None
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self):
+        return {"size": len(self.responses), "bytes": self.bytes, "hits": self.hits, "misses": self.misses,
+                "coalesced": self.coalesced, "hit_ratio": self.hit_ratio}
@@ -0,0 +1,190 @@
+import logging
+import asyncio
+import os
+import signal
+import time
+import config
+
+logger = logging.getLogger(__name__)
+
+# Only these variables reach step commands, so bot credentials stay out of their environment
+STEP_ENV_KEYS = ("PATH", "HOME", "LANG", "LC_ALL", "TZ")
+
+STATUS_EMOJI = {
+    "pending": ":white_circle:",
+    "running": ":hourglass_flowing_sand:",
+    "ok": ":white_check_mark:",
+    "failed": ":x:",
+    "timeout": ":alarm_clock:",
+    "skipped": ":fast_forward:"
+}
+
+class StepRun:
+    """Status and output of one runbook step"""
+
+    def __init__(self, step, output_limit):
+        self.name = step["text"]
+        self.command = step["run"]
+        self.needs = list(step.get("needs") or [])
+        self.output_limit = output_limit
+        self.status = "pending"
+        self.output = ""
+        self.returncode = None
+        self.started = None
+        self.finished = None
+        self.done = asyncio.Event()
+
+    @property
+    def duration(self):
+        if self.started is None:
+            return None
+        return (self.finished or time.monotonic()) - self.started
+
+    def append_output(self, text):
+        # Keep the tail: the end of a diagnostic's output is usually the useful part
+        self.output = (self.output + text)[-self.output_limit:]
+
+class RunbookExecutor:
+    """Runs the automatable steps of a runbook as subprocesses.
+
+    Steps without unmet "needs" start at once, so a diagnostic takes as
+    long as its slowest chain of steps rather than the sum of all of
+    them. A semaphore shared by every run bounds how many processes the
+    bot starts at a time. A step that passes its timeout has its whole
+    process group killed.
+    """
+
+    def __init__(self, max_workers=None, timeout=None, output_limit=None, cwd=None):
+        self.max_workers = max_workers or config.RUNBOOK_EXECUTOR_WORKERS
+        self.timeout = timeout or config.RUNBOOK_STEP_TIMEOUT
+        self.output_limit = output_limit or config.RUNBOOK_OUTPUT_LIMIT
+        self.cwd = cwd or config.RUNBOOK_DIR
+        self.running = 0
+        self.timeouts = 0
+        self._slots = asyncio.Semaphore(self.max_workers)
+
+    def plan(self, steps):
+        """StepRuns for the steps that have a command.
+
+        Steps that need an unknown step or sit on a dependency cycle are
+        marked failed here, since waiting for them would never end.
+        """
+        runs = [StepRun(step, self.output_limit) for step in steps if step.get("run")]
+        by_name = {run.name: run for run in runs}
+        for run in runs:
+            unknown = [name for name in run.needs if name not in by_name]
+            if unknown:
+                run.status = "failed"
+                run.output = f"Needs unknown or manual step: {', '.join(unknown)}"
+
+        visited = set()
+        def visit(run, path):
+            visited.add(run.name)
+            path.append(run)
+            for name in run.needs:
+                needed = by_name.get(name)
+                if needed in path:
+                    cycle = path[path.index(needed):]
+                    for member in cycle:
+                        member.status = "failed"
+                        member.output = "Dependency cycle: " + " -> ".join(r.name for r in cycle + [needed])
+                elif needed is not None and name not in visited:
+                    visit(needed, path)
+            path.pop()
+        for run in runs:
+            if run.name not in visited:
+                visit(run, [])
+        return runs
+
+    async def run(self, runs, on_progress=None):
+        """Run every step, calling on_progress() whenever a status or output changes"""
+        by_name = {run.name: run for run in runs}
+        notify = on_progress or (lambda: None)
+        await asyncio.gather(*(self._run_step(run, by_name, notify) for run in runs))
+        return runs
+
+    async def _run_step(self, run, by_name, notify):
+        try:
+            if run.status != "pending":
+                # Failed in plan()
+                return
+            for name in run.needs:
+                needed = by_name.get(name)
+                if needed is None:
+                    continue
+                await needed.done.wait()
+                if needed.status != "ok":
+                    run.status = "skipped"
+                    run.output = f"{name} did not succeed"
+                    return
+            async with self._slots:
+                await self._execute(run, notify)
+        finally:
+            run.done.set()
+            notify()
+
+    async def _execute(self, run, notify):
+        run.status = "running"
+        run.started = time.monotonic()
+        notify()
+        try:
+            process = await asyncio.create_subprocess_shell(
+                run.command,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                stdin=asyncio.subprocess.DEVNULL,
+                cwd=self.cwd if os.path.isdir(self.cwd) else None,
+                env={key: os.environ[key] for key in STEP_ENV_KEYS if key in os.environ},
+                # Its own process group, so a timeout also stops anything it started
+                start_new_session=True
+            )
+        except OSError as e:
+            run.status = "failed"
+            run.output = f"Could not start: {e}"
+            run.finished = time.monotonic()
+            return
+        self.running += 1
+        try:
+            run.returncode = await asyncio.wait_for(self._communicate(process, run, notify), self.timeout)
+            run.status = "ok" if run.returncode == 0 else "failed"
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            run.status = "timeout"
+            run.append_output(f"\n[stopped after {self.timeout:g}s]")
+            self._kill(process)
+            await process.wait()
+        except asyncio.CancelledError:
+            self._kill(process)
+            raise
+        finally:
+            run.finished = time.monotonic()
+            self.running -= 1
+        logger.info("Runbook step %r finished with %s in %.1fs", run.name, run.status, run.duration)
+
+    async def _communicate(self, process, run, notify):
+        while True:
+            chunk = await process.stdout.read(4096)
+            if not chunk:
+                break
+            run.append_output(chunk.decode(errors="replace"))
+            notify()
+        return await process.wait()
+
+    def _kill(self, process):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+def format_progress(runs, max_length):
+    """One line per step with its status and duration, then the tail of its output"""
+    lines = []
+    # Share the message length between steps so one noisy step cannot push out the others
+    per_step = max(100, max_length // max(1, len(runs)) - 100)
+    for run in runs:
+        duration = f" ({run.duration:.1f}s)" if run.duration is not None else ""
+        lines.append(f"{STATUS_EMOJI[run.status]} *{run.name}*{duration}")
+        output = run.output.strip().replace("```", "'''")
+        if output:
+            lines.append(f"```{output[-per_step:]}```")
+    return "\n".join(lines)[:max_length]
@@ -0,0 +1,353 @@
+import logging
+import asyncio
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import time
+from array import array
+from collections import Counter
+import config
+
+try:
+    import yaml
+except ImportError:
+    # YAML runbooks need PyYAML; Markdown runbooks work without it
+    yaml = None
+
+YAML_ERRORS = (yaml.YAMLError,) if yaml else ()
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"RBIX"
+VERSION = 3
+HEADER = struct.Struct("<4sII")
+
+MARKDOWN_SUFFIXES = (".md", ".markdown")
+YAML_SUFFIXES = (".yaml", ".yml")
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by can for from has have how i in is it its of on or our please "
+    "someone that the this to was we were when with you your".split()
+)
+
+HEADING_RE = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+LIST_ITEM_RE = re.compile(r"^\s*(?:\d+[.)]|[-*+])\s+(.*)$")
+NUMBERED_ITEM_RE = re.compile(r"^\s*\d+[.)]\s+(.*)$")
+# A Markdown step ending in `$ command` can be run by the runbook executor
+STEP_COMMAND_RE = re.compile(r"^(.*?)[\s:]*`\$\s+([^`]+)`\s*$")
+
+def tokenize(text):
+    """Lower-case word tokens without stopwords, with plurals folded onto the singular"""
+    tokens = []
+    for word in TOKEN_RE.findall(text.lower()):
+        if len(word) < 2 or word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+def parse_markdown(text, fallback_title):
+    """Title from the first heading, summary from the first paragraph, steps from a "Steps"
+    section or else from numbered lists"""
+    title = None
+    summary, summary_done = [], False
+    section_steps, numbered_steps = [], []
+    in_steps = False
+    for line in text.splitlines():
+        heading = HEADING_RE.match(line)
+        if heading:
+            if title is None and len(heading.group(1)) == 1:
+                title = heading.group(2)
+            in_steps = "step" in heading.group(2).lower()
+            continue
+        item = LIST_ITEM_RE.match(line)
+        if not summary_done and not item:
+            if line.strip():
+                summary.append(line.strip())
+            elif summary:
+                summary_done = True
+        if item and in_steps:
+            section_steps.append(item.group(1).strip())
+        numbered = NUMBERED_ITEM_RE.match(line)
+        if numbered:
+            numbered_steps.append(numbered.group(1).strip())
+    steps = section_steps or numbered_steps
+    return {"title": title or fallback_title, "summary": " ".join(summary), "steps": [markdown_step(step) for step in steps],
+            "text": text}
+
+def markdown_step(text):
+    command = STEP_COMMAND_RE.match(text)
+    if command and command.group(1):
+        return {"text": command.group(1), "run": command.group(2).strip()}
+    return {"text": text}
+
+def parse_yaml(text, fallback_title):
+    """title, description, tags and steps (strings or {name, run, needs} mappings)"""
+    data = yaml.safe_load(text) or {}
+    if not isinstance(data, dict):
+        raise ValueError("a YAML runbook must be a mapping")
+    steps = []
+    for step in data.get("steps") or []:
+        if isinstance(step, dict):
+            entry = {"text": str(step.get("name") or step.get("text") or step.get("run", ""))}
+            if step.get("run"):
+                entry["run"] = str(step["run"])
+            if step.get("needs"):
+                needs = step["needs"]
+                entry["needs"] = [str(name) for name in (needs if isinstance(needs, list) else [needs])]
+            steps.append(entry)
+        else:
+            steps.append({"text": str(step)})
+    tags = data.get("tags") or []
+    summary = " ".join(filter(None, [str(data.get("description") or "").strip(), " ".join(map(str, tags))]))
+    searchable = [summary] + [f"{step['text']} {step.get('run', '')}" for step in steps]
+    return {"title": str(data.get("title") or fallback_title), "summary": summary, "steps": steps,
+            "text": "\n".join(searchable)}
+
+def load_runbook(path):
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    fallback_title = os.path.splitext(os.path.basename(path))[0].replace("_", " ").replace("-", " ")
+    if path.endswith(YAML_SUFFIXES):
+        return parse_yaml(text, fallback_title)
+    return parse_markdown(text, fallback_title)
+
+class IndexSnapshot:
+    """A loaded index file: metadata in memory, postings read through mmap"""
+
+    def __init__(self, docs, terms, postings, avgdl):
+        self.docs = docs
+        self.terms = terms
+        self.postings = postings
+        self.avgdl = avgdl
+        self.by_path = {doc["path"]: doc_id for doc_id, doc in enumerate(docs)}
+
+    @classmethod
+    def empty(cls):
+        return cls([], {}, memoryview(array("I")), 0.0)
+
+    @classmethod
+    def open(cls, path):
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, meta_len = HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} runbook index")
+        meta = json.loads(mapped[HEADER.size:HEADER.size + meta_len])
+        start = HEADER.size + meta_len
+        start += -start % 4
+        postings = memoryview(mapped)[start:].cast("I")
+        return cls(meta["docs"], meta["terms"], postings, meta["avgdl"])
+
+    def term_postings(self, term):
+        """(doc_id, tf) pairs for a term, read straight from the mapped file"""
+        entry = self.terms.get(term)
+        if entry is None:
+            return ()
+        offset, df = entry
+        pairs = self.postings[offset * 2:(offset + df) * 2]
+        return zip(pairs[0::2], pairs[1::2])
+
+    def doc_terms(self):
+        """Invert the postings back into {doc_id: Counter(term: tf)} for incremental rebuilds"""
+        terms = {}
+        for term in self.terms:
+            for doc_id, tf in self.term_postings(term):
+                terms.setdefault(doc_id, Counter())[term] = tf
+        return terms
+
+def write_index(path, docs, doc_terms):
+    """Write docs and their term counts as one file: header, JSON metadata, uint32 postings"""
+    postings = {}
+    for doc_id, counts in enumerate(doc_terms):
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append((doc_id, tf))
+
+    flat = array("I")
+    terms = {}
+    for term in sorted(postings):
+        terms[term] = [len(flat) // 2, len(postings[term])]
+        for doc_id, tf in postings[term]:
+            flat.extend((doc_id, tf))
+
+    avgdl = sum(doc["length"] for doc in docs) / len(docs) if docs else 0.0
+    meta = json.dumps({"docs": docs, "terms": terms, "avgdl": avgdl}, separators=(",", ":")).encode()
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(meta)))
+        f.write(meta)
+        f.write(b"\0" * (-(HEADER.size + len(meta)) % 4))
+        flat.tofile(f)
+    # Readers see the old file or the new one, never a partial write
+    os.replace(tmp_path, path)
+
+class RunbookIndex:
+    """BM25 search over a directory of Markdown and YAML runbooks.
+
+    The index lives in a single file (RUNBOOK_INDEX_PATH) that is
+    memory-mapped on load, so a restart does not re-read the runbooks.
+    refresh() compares each file's size and mtime with the index and
+    only re-parses runbooks that were added or changed; the term counts
+    of unchanged runbooks are read back from the existing postings.
+    """
+
+    def __init__(self, directory=None, index_path=None, reload_interval=None, matcher=None, k1=1.2, b=0.75):
+        self.directory = directory or config.RUNBOOK_DIR
+        self.index_path = index_path or config.RUNBOOK_INDEX_PATH
+        self.reload_interval = reload_interval or config.RUNBOOK_RELOAD_INTERVAL
+        self.matcher = matcher
+        self.k1 = k1
+        self.b = b
+        self.rebuilds = 0
+        self.snapshot = IndexSnapshot.empty()
+        self._task = None
+        self._skipped = set()
+        # Runbooks that failed to parse, kept out until the file changes again
+        self._failed = {}
+
+    def scan(self):
+        """Map each runbook path under the directory to (mtime_ns, size)"""
+        files = {}
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if not name.endswith(MARKDOWN_SUFFIXES + YAML_SUFFIXES):
+                    continue
+                path = os.path.join(root, name)
+                if name.endswith(YAML_SUFFIXES) and yaml is None:
+                    if path not in self._skipped:
+                        self._skipped.add(path)
+                        logger.warning("Skipping %s, install PyYAML to index YAML runbooks", path)
+                    continue
+                stat = os.stat(path)
+                files[os.path.relpath(path, self.directory)] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def load(self):
+        """Open the saved index, if there is a readable one"""
+        try:
+            self.snapshot = IndexSnapshot.open(self.index_path)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, struct.error) as e:
+            logger.warning("Ignoring unreadable runbook index %s: %s", self.index_path, e)
+        if self.matcher is not None:
+            self.matcher.load()
+
+    def refresh(self):
+        """Re-index added, changed and removed runbooks; return True if the index changed"""
+        changed = self._refresh_keywords()
+        if self.matcher is not None:
+            # Also catches up when the semantic matcher was just enabled for an existing index
+            self.matcher.refresh(self.snapshot.docs)
+        return changed
+
+    def _refresh_keywords(self):
+        files = {path: stat for path, stat in self.scan().items() if self._failed.get(path) != stat}
+        current = self.snapshot
+        known = {doc["path"]: (doc_id, doc) for doc_id, doc in enumerate(current.docs)}
+        unchanged = {
+            path for path, (doc_id, doc) in known.items()
+            if files.get(path) == (doc["mtime_ns"], doc["size"])
+        }
+        if len(unchanged) == len(files) == len(known):
+            return False
+
+        started = time.monotonic()
+        old_terms = current.doc_terms() if unchanged else {}
+        docs, doc_terms = [], []
+        for path in sorted(files):
+            if path in unchanged:
+                doc_id, doc = known[path]
+                docs.append(doc)
+                doc_terms.append(old_terms.get(doc_id, Counter()))
+                continue
+            try:
+                runbook = load_runbook(os.path.join(self.directory, path))
+            except (OSError, ValueError, *YAML_ERRORS) as e:
+                logger.error("Skipping runbook %s: %s", path, e)
+                self._failed[path] = files[path]
+                continue
+            # Title words count twice so a runbook's subject outranks passing mentions
+            tokens = tokenize(runbook["title"]) * 2 + tokenize(runbook["text"])
+            mtime_ns, size = files[path]
+            docs.append({"path": path, "mtime_ns": mtime_ns, "size": size, "title": runbook["title"],
+                         "summary": runbook["summary"], "steps": runbook["steps"], "length": len(tokens)})
+            doc_terms.append(Counter(tokens))
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+        write_index(self.index_path, docs, doc_terms)
+        self.snapshot = IndexSnapshot.open(self.index_path)
+        self.rebuilds += 1
+        logger.info("Indexed %d runbooks (%d re-read) in %.0f ms", len(docs), len(files) - len(unchanged),
+                    (time.monotonic() - started) * 1000)
+        return True
+
+    def search(self, text, k=None):
+        """Return up to k (score, runbook) pairs for the case text, best first.
+
+        With a semantic matcher, each runbook scores a weighted sum of its
+        BM25 score (scaled so the best keyword match is 1) and its cosine
+        similarity, so paraphrases can rank without shared keywords.
+        """
+        k = k or config.RUNBOOK_TOP_K
+        keyword = self.keyword_search(text, k)
+        if self.matcher is None:
+            return keyword
+        snapshot = self.snapshot
+        weight = config.RUNBOOK_SEMANTIC_WEIGHT
+        scores = {}
+        for score, doc in keyword:
+            scores[doc["path"]] = (1 - weight) * score / keyword[0][0]
+        for similarity, path in self.matcher.search(text, k):
+            if path in snapshot.by_path:
+                scores[path] = scores.get(path, 0.0) + weight * similarity
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(score, snapshot.docs[snapshot.by_path[path]]) for path, score in best]
+
+    def keyword_search(self, text, k=None):
+        """BM25 only: up to k (score, runbook) pairs, best first"""
+        snapshot = self.snapshot
+        n = len(snapshot.docs)
+        if not n:
+            return []
+        scores = {}
+        for term in set(tokenize(text)):
+            entry = snapshot.terms.get(term)
+            if entry is None:
+                continue
+            idf = math.log(1 + (n - entry[1] + 0.5) / (entry[1] + 0.5))
+            for doc_id, tf in snapshot.term_postings(term):
+                norm = self.k1 * (1 - self.b + self.b * snapshot.docs[doc_id]["length"] / snapshot.avgdl)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        best = heapq.nlargest(k or config.RUNBOOK_TOP_K, scores.items(), key=lambda item: item[1])
+        return [(score, snapshot.docs[doc_id]) for doc_id, score in best]
+
+    async def start(self):
+        """Load the saved index, bring it up to date and watch RUNBOOK_DIR for changes"""
+        if self._task is not None:
+            return
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.load)
+        self._task = asyncio.ensure_future(self._watch())
+
+    async def _watch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                # Parsing and writing happen off the event loop; the new snapshot is swapped in whole
+                await loop.run_in_executor(None, self.refresh)
+            except Exception:
+                # A bad runbook file must not stop the watcher; the current index stays in use
+                logger.exception("Could not refresh the runbook index")
+            await asyncio.sleep(self.reload_interval)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -0,0 +1,165 @@
+import logging
+import json
+import os
+import re
+import time
+import zlib
+import config
+
+try:
+    import numpy as np
+except ImportError:
+    # Semantic matching is skipped without NumPy; keyword search still works
+    np = None
+
+logger = logging.getLogger(__name__)
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+def ngram_features(text):
+    """Words, word pairs and character trigrams, so "log in", "login" and "logins" overlap"""
+    words = WORD_RE.findall(text.lower())
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"<{word}>"
+        features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return features
+
+def runbook_sections(doc):
+    """Text of each searchable section: the overview, then one per step, all prefixed with the title"""
+    sections = [f"{doc['title']}. {doc.get('summary', '')}"]
+    sections.extend(f"{doc['title']}. {step['text']}" for step in doc["steps"])
+    return sections
+
+class HashedEmbedder:
+    """Projects n-gram features into a fixed number of dimensions with signed feature hashing.
+
+    crc32 keeps the projection stable across processes, unlike hash().
+    A local model can replace this: anything with dim and embed(texts)
+    returning L2-normalized float32 rows works.
+    """
+
+    def __init__(self, dim=None):
+        self.dim = dim or config.RUNBOOK_EMBEDDING_DIM
+
+    def embed(self, texts):
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.fromiter((zlib.crc32(f.encode()) for f in ngram_features(text)), dtype=np.uint32)
+            if not hashes.size:
+                continue
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(matrix[row], hashes % self.dim, signs)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+class SemanticMatcher:
+    """Cosine search over runbook sections held in one float32 matrix.
+
+    The matrix is saved with np.save and opened with mmap_mode="r", so
+    it is paged in from disk rather than copied. A query is one
+    matrix-vector product followed by argpartition; search_batch()
+    scores many cases with one matrix-matrix product. Rows of runbooks
+    that did not change are copied over on refresh instead of being
+    embedded again.
+    """
+
+    def __init__(self, path=None, embedder=None):
+        self.path = path or config.RUNBOOK_EMBEDDINGS_PATH
+        self.rows_path = f"{self.path}.rows.json"
+        self.embedder = embedder or HashedEmbedder()
+        # (matrix, row -> doc id, doc stamps), replaced as one value so searches never mix versions
+        self.state = (np.zeros((0, self.embedder.dim), dtype=np.float32), np.zeros(0, dtype=np.int32), [])
+
+    def load(self):
+        """Open the saved matrix, if it matches the embedder"""
+        try:
+            with open(self.rows_path) as f:
+                rows = json.load(f)
+            matrix = np.load(self.path, mmap_mode="r")
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable runbook embeddings %s: %s", self.path, e)
+            return
+        if matrix.shape != (len(rows["row_docs"]), self.embedder.dim) or rows.get("dim") != self.embedder.dim:
+            logger.info("Runbook embeddings %s were built with other settings, rebuilding", self.path)
+            return
+        self.state = (matrix, np.asarray(rows["row_docs"], dtype=np.int32), rows["docs"])
+
+    def refresh(self, docs):
+        """Embed the sections of added or changed runbooks; return True if the matrix changed"""
+        stamp = lambda doc: [doc["path"], doc["mtime_ns"], doc["size"]]
+        old_matrix, old_row_docs, old_docs = self.state
+        if [stamp(doc) for doc in docs] == old_docs:
+            return False
+
+        started = time.monotonic()
+        # Each runbook's rows are contiguous, in doc order
+        bounds = np.searchsorted(old_row_docs, np.arange(len(old_docs) + 1))
+        old_rows = {tuple(doc): (bounds[i], bounds[i + 1]) for i, doc in enumerate(old_docs)}
+        blocks, row_docs, embedded = [], [], 0
+        for doc_id, doc in enumerate(docs):
+            start, end = old_rows.get(tuple(stamp(doc)), (0, 0))
+            if end > start:
+                block = np.asarray(old_matrix[start:end])
+            else:
+                block = self.embedder.embed(runbook_sections(doc))
+                embedded += len(block)
+            blocks.append(block)
+            row_docs.extend([doc_id] * len(block))
+        matrix = np.vstack(blocks) if blocks else np.zeros((0, self.embedder.dim), dtype=np.float32)
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # np.save adds .npy to names without it, so the temporary name keeps the suffix
+        tmp_path = f"{self.path}.tmp.npy"
+        np.save(tmp_path, np.ascontiguousarray(matrix, dtype=np.float32))
+        with open(f"{self.rows_path}.tmp", "w") as f:
+            json.dump({"dim": self.embedder.dim, "docs": [stamp(doc) for doc in docs], "row_docs": row_docs}, f)
+        os.replace(tmp_path, self.path)
+        os.replace(f"{self.rows_path}.tmp", self.rows_path)
+
+        self.load()
+        logger.info("Embedded %d runbook sections (%d new) in %.0f ms", len(row_docs), embedded,
+                    (time.monotonic() - started) * 1000)
+        return True
+
+    def search(self, text, k=None):
+        """Return up to k (cosine, runbook path) pairs, best first"""
+        return self.search_batch([text], k)[0]
+
+    def search_batch(self, texts, k=None):
+        """search() for many texts with a single matrix product"""
+        k = k or config.RUNBOOK_TOP_K
+        matrix, row_docs, docs = self.state
+        if not len(row_docs):
+            return [[] for _ in texts]
+        queries = self.embedder.embed(texts)
+        scores = queries @ matrix.T if len(texts) > 1 else (matrix @ queries[0])[np.newaxis]
+        # Several sections can belong to one runbook, so take extra rows before de-duplicating
+        candidates = min(len(row_docs), k * 4)
+        results = []
+        for row_scores in scores:
+            top = np.argpartition(row_scores, -candidates)[-candidates:]
+            top = top[np.argsort(-row_scores[top])]
+            matches, seen = [], set()
+            for row in top:
+                doc_id = int(row_docs[row])
+                if doc_id in seen or row_scores[row] <= 0:
+                    continue
+                seen.add(doc_id)
+                matches.append((float(row_scores[row]), docs[doc_id][0]))
+                if len(matches) == k:
+                    break
+            results.append(matches)
+        return results
+
+def build_matcher():
+    """SemanticMatcher when enabled and NumPy is installed, else None"""
+    if not config.RUNBOOK_SEMANTIC_ENABLED:
+        return None
+    if np is None:
+        logger.warning("NumPy is not installed, runbook search is keyword only")
+        return None
+    return SemanticMatcher()
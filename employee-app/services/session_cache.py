@@ -0,0 +1,70 @@
+import logging
+import asyncio
+import time
+from .ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+class AgentSession:
+    """An AgentForce conversation session and its message sequence counter"""
+
+    def __init__(self, session_id, agent_id):
+        self.session_id = session_id
+        self.agent_id = agent_id
+        self.sequence_id = 0
+        self.created_at = time.monotonic()
+
+    def next_sequence_id(self):
+        self.sequence_id += 1
+        return self.sequence_id
+
+class SessionCache:
+    """AgentForce sessions keyed by Slack conversation, e.g. (channel, thread_ts)"""
+
+    def __init__(self, maxsize=500, ttl=1800):
+        self.sessions = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._pending = {}
+
+    def __contains__(self, key):
+        """True if key has a live session or one is being created"""
+        return key in self.sessions or key in self._pending
+
+    async def get_or_create(self, key, agent_id, create):
+        """Return the cached session for key, creating it with create() on a miss.
+
+        Concurrent callers for the same key share one create() call, so two
+        quick replies in a new thread still end up in the same session.
+        """
+        session = self.sessions.get(key)
+        if session is not None and session.agent_id == agent_id:
+            return session
+
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(self._create(key, agent_id, create))
+            self._pending[key] = pending
+        return await asyncio.shield(pending)
+
+    def prepare(self, key, agent_id, create):
+        """Start creating the session for key in the background; later get_or_create() calls wait for it"""
+        if key not in self:
+            self._pending[key] = asyncio.ensure_future(self._create(key, agent_id, create))
+
+    async def _create(self, key, agent_id, create):
+        try:
+            session = await create()
+            if session is not None:
+                self.sessions.set(key, session)
+                logger.info("Cached AgentForce session %s for %s", session.session_id, key)
+            return session
+        finally:
+            self._pending.pop(key, None)
+
+    def touch(self, key, session):
+        """Restart the idle timer for key after its session was used, so only idle threads expire"""
+        if self.sessions.peek(key) is session:
+            self.sessions.set(key, session)
+
+    def invalidate(self, key):
+        """Forget the session for key, e.g. after the server rejected it"""
+        self.sessions.pop(key)
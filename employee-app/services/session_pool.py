@@ -0,0 +1,86 @@
+import logging
+import asyncio
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+class SessionPool:
+    """Keeps a few idle AgentForce sessions ready for a single agent"""
+
+    def __init__(self, create_session, agent_id, size=2, max_idle_age=600, retry_delay=5):
+        # create_session is an async callable returning an AgentSession or None
+        self.create_session = create_session
+        self.agent_id = agent_id
+        self.size = size
+        self.max_idle_age = max_idle_age
+        self.retry_delay = retry_delay
+        self.hits = 0
+        self.misses = 0
+        self._idle = deque()
+        self._wakeup = asyncio.Event()
+        self._refill_task = None
+
+    def __len__(self):
+        return len(self._idle)
+
+    async def start(self):
+        """Start filling the pool in the background"""
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.ensure_future(self._refill_loop())
+            logger.info("AgentForce session pool started with target size %s", self.size)
+
+    async def close(self):
+        """Stop refilling and drop the idle sessions"""
+        if self._refill_task is not None and not self._refill_task.done():
+            self._refill_task.cancel()
+            try:
+                await self._refill_task
+            except asyncio.CancelledError:
+                pass
+        self._refill_task = None
+        self._idle.clear()
+
+    def acquire(self, agent_id):
+        """Take a ready session for agent_id, or None if the pool has none"""
+        if agent_id != self.agent_id:
+            return None
+
+        self._discard_stale()
+        session = self._idle.popleft() if self._idle else None
+        if session is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        # Top the pool back up without making the caller wait
+        self._wakeup.set()
+        return session
+
+    def _discard_stale(self):
+        """Drop sessions that are close to being expired by the server"""
+        now = time.monotonic()
+        while self._idle and now - self._idle[0].created_at > self.max_idle_age:
+            stale = self._idle.popleft()
+            logger.info("Discarding idle AgentForce session %s", stale.session_id)
+
+    async def _refill_loop(self):
+        while True:
+            self._discard_stale()
+            while len(self._idle) < self.size:
+                try:
+                    session = await self.create_session(self.agent_id)
+                except Exception as e:
+                    logger.exception("Error pre-warming AgentForce session: %s", e)
+                    session = None
+                if session is None:
+                    # Back off instead of hammering a failing endpoint
+                    await asyncio.sleep(self.retry_delay)
+                    break
+                self._idle.append(session)
+
+            # Sleep until a session is taken or the oldest one needs replacing
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.max_idle_age / 2)
+            except asyncio.TimeoutError:
+                pass
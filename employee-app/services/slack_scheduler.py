@@ -0,0 +1,218 @@
+import logging
+import asyncio
+import time
+from slack_sdk.errors import SlackApiError
+from slack_sdk.web.async_client import AsyncWebClient
+import config
+from .metrics import SLACK_API_CALLS, SLACK_API_DURATION, SLACK_API_ERRORS, SLACK_API_RATE_LIMITED
+from .tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Requests per second allowed for each Web API method across the workspace (Slack rate limit tiers)
+METHOD_RATES = {
+    "chat.postMessage": 600 / 60,  # Special: several hundred a minute per workspace, ~1/s per channel below
+    "chat.update": 50 / 60,        # Tier 3
+    "conversations.history": 50 / 60,
+    "conversations.replies": 50 / 60,
+    "reactions.add": 50 / 60,
+}
+DEFAULT_METHOD_RATE = 20 / 60      # Tier 2 for anything not listed
+
+# Slack counts tier limits per minute, so a method may use a minute's allowance in a burst
+METHOD_BURST_SECONDS = 60
+
+# Methods that are also limited per channel
+CHANNEL_LIMITED_METHODS = {"chat.postMessage"}
+
+class SlackSchedulerError(Exception):
+    """A scheduled Slack call was abandoned before it was sent"""
+
+class TokenBucket:
+    """Async token bucket; acquire() waits until a token is available"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+
+    def pause(self, seconds):
+        """Stop handing out tokens for a while, e.g. after a 429"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class PendingUpdate:
+    """A queued chat.update; later updates to the same message replace its payload"""
+
+    def __init__(self, send):
+        self.send = send
+        self.future = asyncio.get_running_loop().create_future()
+
+    def fail(self, error):
+        if not self.future.done():
+            self.future.set_exception(error)
+
+class SlackScheduler:
+    """Paces outbound Slack Web API calls to stay within rate limits"""
+
+    def __init__(self, channel_rate=None, channel_burst=None, max_retries=None):
+        self.channel_rate = channel_rate or config.SLACK_CHANNEL_RATE_PER_SECOND
+        self.channel_burst = channel_burst or config.SLACK_CHANNEL_BURST
+        self.max_retries = max_retries if max_retries is not None else config.SLACK_MAX_RETRIES
+        self.method_buckets = {}
+        self.channel_buckets = {}
+        self.pending_updates = {}
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.calls = {}
+        self.wait_seconds = {}
+        self.rate_limited = {}
+        self.coalesced = 0
+
+    def method_bucket(self, api_method):
+        bucket = self.method_buckets.get(api_method)
+        if bucket is None:
+            rate = METHOD_RATES.get(api_method, DEFAULT_METHOD_RATE)
+            bucket = TokenBucket(rate, capacity=max(1.0, rate * METHOD_BURST_SECONDS))
+            self.method_buckets[api_method] = bucket
+        return bucket
+
+    def channel_bucket(self, channel):
+        bucket = self.channel_buckets.get(channel)
+        if bucket is None:
+            bucket = TokenBucket(self.channel_rate, capacity=max(1.0, self.channel_burst))
+            self.channel_buckets[channel] = bucket
+        return bucket
+
+    async def submit(self, api_method, args, send):
+        """Run send() once the rate limits for api_method and its channel allow it"""
+        channel = args.get("channel")
+
+        if api_method == "chat.update" and args.get("ts"):
+            key = (channel, args["ts"])
+            pending = self.pending_updates.get(key)
+            if pending is not None:
+                # An older update to this message is still queued; only send the latest state
+                pending.send = send
+                self.coalesced += 1
+                return await asyncio.shield(pending.future)
+
+            pending = PendingUpdate(send)
+            self.pending_updates[key] = pending
+            try:
+                await self._wait_for_turn(api_method, channel)
+                self.pending_updates.pop(key, None)
+                pending.future.set_result(await self._send(api_method, channel, pending.send))
+            except asyncio.CancelledError:
+                # Updates merged into this one wait on its future, so fail them rather than leave them hanging
+                self.pending_updates.pop(key, None)
+                pending.fail(SlackSchedulerError(f"{api_method} to {channel} was cancelled before it was sent"))
+                # Mark the error as seen in case no update was merged
+                pending.future.exception()
+                raise
+            except Exception as e:
+                self.pending_updates.pop(key, None)
+                pending.fail(e)
+            return await pending.future
+
+        await self._wait_for_turn(api_method, channel)
+        return await self._send(api_method, channel, send)
+
+    async def _wait_for_turn(self, api_method, channel):
+        started = time.monotonic()
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            await self.method_bucket(api_method).acquire()
+            if channel and api_method in CHANNEL_LIMITED_METHODS:
+                await self.channel_bucket(channel).acquire()
+        finally:
+            self.queue_depth -= 1
+            self.wait_seconds[api_method] = self.wait_seconds.get(api_method, 0.0) + time.monotonic() - started
+
+    async def _send(self, api_method, channel, send):
+        attempt = 0
+        while True:
+            self.calls[api_method] = self.calls.get(api_method, 0) + 1
+            SLACK_API_CALLS.inc(method=api_method)
+            started = time.perf_counter()
+            try:
+                return await send()
+            except SlackApiError as e:
+                if e.response.status_code != 429:
+                    SLACK_API_ERRORS.inc(method=api_method)
+                    raise
+                SLACK_API_RATE_LIMITED.inc(method=api_method)
+                if attempt >= self.max_retries:
+                    SLACK_API_ERRORS.inc(method=api_method)
+                    raise
+                attempt += 1
+                self.rate_limited[api_method] = self.rate_limited.get(api_method, 0) + 1
+                headers = e.response.headers or {}
+                retry_after = float(headers.get("Retry-After") or headers.get("retry-after") or 1)
+            except Exception:
+                SLACK_API_ERRORS.inc(method=api_method)
+                raise
+            finally:
+                SLACK_API_DURATION.observe(time.perf_counter() - started, method=api_method)
+
+            logger.warning("Slack rate limited %s, retrying in %ss", api_method, retry_after)
+            self.method_bucket(api_method).pause(retry_after)
+            await self._wait_for_turn(api_method, channel)
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "calls": dict(self.calls),
+            "wait_seconds": dict(self.wait_seconds),
+            "rate_limited": dict(self.rate_limited),
+            "coalesced_updates": self.coalesced
+        }
+
+class ScheduledWebClient(AsyncWebClient):
+    """AsyncWebClient whose API calls go through a SlackScheduler"""
+
+    scheduler = None
+
+    @classmethod
+    def wrap(cls, client, scheduler):
+        """Build a scheduled copy of a per-request Bolt client"""
+        scheduled = cls(
+            token=client.token,
+            base_url=client.base_url,
+            timeout=client.timeout,
+            ssl=client.ssl,
+            proxy=client.proxy,
+            session=client.session,
+            trust_env_in_session=client.trust_env_in_session,
+            headers=client.headers,
+            team_id=client.default_params.get("team_id"),
+            retry_handlers=client.retry_handlers
+        )
+        scheduled.scheduler = scheduler
+        return scheduled
+
+    async def api_call(self, api_method, **kwargs):
+        args = kwargs.get("json") or kwargs.get("data") or kwargs.get("params") or {}
+        with tracer.span(f"slack.{api_method}", **{"slack.channel": args.get("channel", "")}):
+            if self.scheduler is None:
+                return await super().api_call(api_method, **kwargs)
+            return await self.scheduler.submit(
+                api_method, args, lambda: super(ScheduledWebClient, self).api_call(api_method, **kwargs)
+            )
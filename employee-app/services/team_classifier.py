@@ -0,0 +1,150 @@
+import logging
+import asyncio
+import json
+import os
+import time
+import zlib
+import config
+from .semantic_matcher import ngram_features
+
+try:
+    import numpy as np
+except ImportError:
+    # The classifier is skipped without NumPy; unstructured cases get the generic buttons
+    np = None
+
+logger = logging.getLogger(__name__)
+
+def hashed_features(text, dim):
+    """(indices, values) of the L2-normalized log counts of the text's hashed n-grams"""
+    counts = {}
+    for feature in ngram_features(text):
+        index = zlib.crc32(feature.encode()) % dim
+        counts[index] = counts.get(index, 0) + 1
+    if not counts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    values = np.log1p(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+    return indices, values / np.linalg.norm(values)
+
+class HandoffLog:
+    """Appends each hand-off decision (case text and chosen team) to a JSON Lines file for training"""
+
+    def __init__(self, path=None):
+        self.path = path or config.HANDOFF_LOG_PATH
+        self.recorded = 0
+
+    def _append(self, line):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    async def record(self, text, team_name, user_id=None):
+        line = json.dumps({"ts": time.time(), "text": text, "team": team_name, "user": user_id}) + "\n"
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._append, line)
+            self.recorded += 1
+        except OSError as e:
+            logger.error("Could not record hand-off decision to %s: %s", self.path, e)
+
+def read_handoff_log(path):
+    """(text, team name) pairs, keeping only the latest decision for each case text"""
+    latest = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("text") and record.get("team"):
+                latest[record["text"]] = record["team"]
+    return latest.items()
+
+class TeamClassifier:
+    """Softmax regression over hashed n-gram features, trained from past hand-offs.
+
+    predict() hashes the text (a few dozen features), gathers those
+    columns of the weight matrix and takes a softmax over the teams, so
+    a prediction takes microseconds and never leaves the process.
+    Training is offline: see train_classifier.py.
+    """
+
+    def __init__(self, weights, bias, teams):
+        self.weights = weights
+        self.bias = bias
+        self.teams = list(teams)
+        self.dim = weights.shape[1]
+
+    @classmethod
+    def load(cls, path=None):
+        """The saved model, or None when it is missing or NumPy is not installed"""
+        path = path or config.CLASSIFIER_MODEL_PATH
+        if np is None:
+            logger.warning("NumPy is not installed, unstructured cases get no team suggestion")
+            return None
+        try:
+            with np.load(path) as model:
+                classifier = cls(model["weights"], model["bias"], model["teams"].tolist())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Ignoring unreadable team classifier %s: %s", path, e)
+            return None
+        logger.info("Loaded team classifier for %d teams from %s", len(classifier.teams), path)
+        return classifier
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, weights=self.weights, bias=self.bias, teams=np.array(self.teams))
+        os.replace(tmp_path, path)
+
+    def predict(self, text):
+        """(team name, confidence 0-100), or None for text with no words"""
+        indices, values = hashed_features(text, self.dim)
+        if not len(indices):
+            return None
+        logits = self.weights[:, indices] @ values + self.bias
+        probabilities = np.exp(logits - logits.max())
+        best = int(probabilities.argmax())
+        return self.teams[best], int(100 * probabilities[best] / probabilities.sum())
+
+    @classmethod
+    def train(cls, texts, labels, dim=4096, epochs=300, learning_rate=1.0, l2=1e-4):
+        """Fit by full-batch gradient descent on sparse features; returns the classifier"""
+        teams = sorted(set(labels))
+        label_ids = np.array([teams.index(label) for label in labels])
+        rows = [hashed_features(text, dim) for text in texts]
+        lengths = np.array([len(indices) for indices, _ in rows])
+        keep = lengths > 0
+        indices = np.concatenate([i for i, _ in rows]) if rows else np.zeros(0, dtype=np.int64)
+        values = np.concatenate([v for _, v in rows]) if rows else np.zeros(0, dtype=np.float32)
+        row_of = np.repeat(np.arange(len(rows)), lengths)
+        label_ids, n = label_ids[keep], int(keep.sum())
+        row_of = np.searchsorted(np.flatnonzero(keep), row_of)
+
+        weights = np.zeros((len(teams), dim), dtype=np.float32)
+        bias = np.zeros(len(teams), dtype=np.float32)
+        targets = np.zeros((len(teams), n), dtype=np.float32)
+        targets[label_ids, np.arange(n)] = 1.0
+        for _ in range(epochs):
+            # logits[c, i] = sum of weights[c, feature] * value over sample i's features
+            contributions = weights[:, indices] * values
+            logits = np.zeros((len(teams), n), dtype=np.float32)
+            for c in range(len(teams)):
+                logits[c] = np.bincount(row_of, weights=contributions[c], minlength=n)
+            logits += bias[:, None]
+            logits -= logits.max(axis=0)
+            probabilities = np.exp(logits)
+            probabilities /= probabilities.sum(axis=0)
+            error = (probabilities - targets) / n
+            per_feature = error[:, row_of] * values
+            for c in range(len(teams)):
+                gradient = np.bincount(indices, weights=per_feature[c], minlength=dim)
+                weights[c] -= learning_rate * (gradient + l2 * weights[c])
+            bias -= learning_rate * error.sum(axis=1)
+        return cls(weights, bias, teams)
+
+def build_classifier():
+    """TeamClassifier from CLASSIFIER_MODEL_PATH, or None until a model has been trained"""
+    if not config.CLASSIFIER_MODEL_PATH:
+        return None
+    return TeamClassifier.load()
@@ -0,0 +1,145 @@
+import logging
+import asyncio
+import json
+import os
+import re
+import config
+
+logger = logging.getLogger(__name__)
+
+# Teams used when no TEAMS_FILE is configured; the first three get hand-off buttons
+DEFAULT_TEAMS = [
+    {"name": "Support", "channel": "${SUPPORT_CHANNEL_ID}", "button": True},
+    {"name": "Sales", "channel": "${SALES_CHANNEL_ID}", "button": True},
+    {"name": "Engineering", "channel": "${ENGINEERING_CHANNEL_ID}", "button": True},
+    {"name": "IAM", "channel": "${IAM_CHANNEL_ID}"}
+]
+
+def normalize_team_name(name):
+    """Lower-case key used in indexes and action IDs: "Customer Success" -> "customer_success" """
+    return re.sub(r"[\s\-]+", "_", name.strip().lower())
+
+class Team:
+    """One routable team and its Slack channel"""
+
+    def __init__(self, name, channel_id, aliases=(), button=False):
+        self.name = name
+        self.key = normalize_team_name(name)
+        self.channel_id = channel_id
+        self.aliases = tuple(aliases)
+        self.button = button
+
+    @property
+    def action_id(self):
+        return f"handoff_{self.key}"
+
+    def __repr__(self):
+        return f"Team({self.name!r}, {self.channel_id!r})"
+
+class TeamTable:
+    """An immutable set of teams with an index for each lookup direction"""
+
+    def __init__(self, teams):
+        self.teams = tuple(teams)
+        self.by_name = {}
+        self.by_action_id = {}
+        self.by_channel = {}
+        for team in self.teams:
+            for name in (team.name, *team.aliases):
+                key = normalize_team_name(name)
+                if key in self.by_name and self.by_name[key] is not team:
+                    raise ValueError(f"Team name or alias {name!r} is used twice")
+                self.by_name[key] = team
+            self.by_action_id[team.action_id] = team
+            if team.channel_id:
+                self.by_channel.setdefault(team.channel_id, team)
+        self.button_teams = tuple(team for team in self.teams if team.button)
+
+    @classmethod
+    def from_entries(cls, entries):
+        teams = []
+        for entry in entries:
+            # "${VAR}" channels read the channel ID from the environment
+            channel = os.path.expandvars(entry.get("channel") or "")
+            teams.append(Team(
+                entry["name"],
+                channel if channel and not channel.startswith("$") else None,
+                entry.get("aliases", ()),
+                entry.get("button", False)
+            ))
+        return cls(teams)
+
+class TeamRegistry:
+    """Team routing table loaded from TEAMS_FILE and reloaded when the file changes.
+
+    Every lookup is a dict access on the current TeamTable. A reload
+    builds a complete new table and swaps it in with one assignment, so
+    a lookup sees either the old teams or the new ones, never a mix. A
+    file that fails to parse is logged and the old table is kept.
+    """
+
+    def __init__(self, path=None, reload_interval=None):
+        self.path = config.TEAMS_FILE if path is None else path
+        self.reload_interval = reload_interval or config.TEAMS_RELOAD_INTERVAL
+        self.reloads = 0
+        self._mtime = None
+        self._task = None
+        self.table = self._load() if self.path else TeamTable.from_entries(DEFAULT_TEAMS)
+
+    def _load(self):
+        self._mtime = os.stat(self.path).st_mtime_ns
+        with open(self.path) as f:
+            data = json.load(f)
+        table = TeamTable.from_entries(data["teams"] if isinstance(data, dict) else data)
+        logger.info("Loaded %d teams from %s", len(table.teams), self.path)
+        return table
+
+    def reload_if_changed(self):
+        """Swap in the file's teams if it changed since the last load; return True if it did"""
+        try:
+            if os.stat(self.path).st_mtime_ns == self._mtime:
+                return False
+            self.table = self._load()
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.error("Keeping the current teams, could not reload %s: %s", self.path, e)
+            return False
+        self.reloads += 1
+        return True
+
+    async def start(self):
+        """Watch TEAMS_FILE for changes"""
+        if self.path and self._task is None:
+            self._task = asyncio.ensure_future(self._watch())
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            self.reload_if_changed()
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    @property
+    def teams(self):
+        return self.table.teams
+
+    @property
+    def button_teams(self):
+        return self.table.button_teams
+
+    def get(self, name):
+        """Find a team by name or alias, ignoring case and spacing"""
+        if not name:
+            return None
+        return self.table.by_name.get(normalize_team_name(name))
+
+    def for_action(self, action_id):
+        return self.table.by_action_id.get(action_id)
+
+    def for_channel(self, channel_id):
+        return self.table.by_channel.get(channel_id)
+
+    def is_team_channel(self, channel_id):
+        return channel_id in self.table.by_channel
@@ -1,87 +1,121 @@
 import logging
+import asyncio
+import re
 import config
+from .message_cache import MessageCache
+from .team_registry import TeamRegistry, normalize_team_name
+from .tracing import traced
 
 logger = logging.getLogger(__name__)
 
+# Separates teams in a case's Team field, e.g. "Support, Engineering"
+TEAM_SEPARATOR_RE = re.compile(r"\s*(?:,|;|&|\+|/|\band\b)\s*", re.I)
+
 class TeamService:
-    def __init__(self):
-        self.team_channels = {
-            "support": config.SUPPORT_CHANNEL_ID,
-            "sales": config.SALES_CHANNEL_ID,
-            "engineering": config.ENGINEERING_CHANNEL_ID,
-            "iam": config.IAM_CHANNEL_ID
-        }
+    def __init__(self, message_cache=None, team_registry=None, handoff_log=None):
+        self.message_cache = message_cache or MessageCache()
+        self.team_registry = team_registry or TeamRegistry()
+        self.handoff_log = handoff_log
         
     def get_team_channel(self, team_name):
-        """Get the channel ID for a team name"""
-        return self.team_channels.get(team_name.lower())
+        """Get the channel ID for a team name or alias"""
+        team = self.team_registry.get(team_name)
+        return team.channel_id if team else None
         
     def normalize_team_name(self, team_name):
         """Convert team name to a format suitable for action IDs"""
-        return team_name.lower().replace(' ', '_')
+        return normalize_team_name(team_name)
         
+    def resolve_teams(self, team_field):
+        """Split a Team field such as "Support, Engineering" into teams; return (teams, unknown names)"""
+        team = self.team_registry.get(team_field)
+        if team:
+            return [team], []
+        teams, unknown = [], []
+        for name in TEAM_SEPARATOR_RE.split(team_field):
+            if not name.strip():
+                continue
+            team = self.team_registry.get(name)
+            if team is None or not team.channel_id:
+                unknown.append(name.strip())
+            elif team not in teams:
+                teams.append(team)
+        return teams, unknown
+
+    @traced("route_to_team")
     async def route_to_team(self, case_data, user_id, thread_ts, say, client):
-        """Route a case to a specific team channel"""
-        team = case_data['team']
-        target_channel = self.get_team_channel(team)
+        """Route a case to every team named in its Team field"""
+        teams, unknown = self.resolve_teams(case_data['team'])
         
-        if not target_channel:
-            logger.error(f"No channel found for team {team}")
+        if not teams:
+            logger.error("No channel found for team %s", case_data['team'])
             await say(
-                text=f"⚠️ Failed to route case. Could not find channel for team {team}.",
+                text=f"⚠️ Failed to route case. Could not find channel for team {case_data['team']}.",
                 thread_ts=thread_ts
             )
             return False
-            
-        # Forward the case to the team channel
-        await client.chat_postMessage(
-            channel=target_channel,
-            text=f"*Case #{case_data['case_number']} from <@{user_id}>*\n\n"
-                 f"*Team:* {team}\n"
-                 f"*Confidence:* {case_data['confidence']}%\n"
-                 f"*Summary:* {case_data['summary']}\n\n"
-        )
         
-        # Confirm in the original thread
-        await say(
-            text=f"✅ This case has been routed to *{team}* with {case_data['confidence']}% confidence.",
-            thread_ts=thread_ts
+        async def forward(team):
+            await client.chat_postMessage(
+                channel=team.channel_id,
+                text=f"*Case #{case_data['case_number']} from <@{user_id}>*\n\n"
+                     f"*Team:* {team.name}\n"
+                     f"*Confidence:* {case_data['confidence']}%\n"
+                     f"*Summary:* {case_data['summary']}\n\n"
+            )
+        
+        # The team posts and the thread confirmation do not depend on each other
+        names = ", ".join(f"*{team.name}*" for team in teams)
+        confirmed, *forwarded = await asyncio.gather(
+            say(
+                text=f"✅ This case has been routed to {names} with {case_data['confidence']}% confidence.",
+                thread_ts=thread_ts
+            ),
+            *(forward(team) for team in teams),
+            return_exceptions=True
         )
+        if isinstance(confirmed, Exception):
+            logger.error("Failed to confirm routing of case %s: %s", case_data['case_number'], confirmed)
         
-        return True
+        failed = []
+        for team, result in zip(teams, forwarded):
+            if isinstance(result, Exception):
+                logger.error("Failed to route case %s to %s: %s", case_data['case_number'], team.name, result)
+                failed.append(team.name)
+        if failed or unknown:
+            # Correct the confirmation for the teams that did not get the case
+            await say(
+                text=f"⚠️ Could not route this case to {', '.join(failed + unknown)}.",
+                thread_ts=thread_ts
+            )
         
-    async def update_handoff_status(self, team_name, user_id, timestamp, body, client):
-        """Update the UI to show handoff status"""
-        # Update the status with loading indicator
-        await client.chat_update(
-            channel=config.CENTRAL_CASE_CHANNEL_ID,
-            ts=body["message"]["ts"],
-            text=f":hourglass: Processing hand-off to {team_name} team...",
-        )
+        return len(failed) < len(teams)
         
-        # Get the original message from the central_case channel
-        original_msg_result = await client.conversations_history(
-            channel=config.CENTRAL_CASE_CHANNEL_ID,
-            inclusive=True,
-            latest=timestamp,
-            limit=1
-        )
+    @traced("update_handoff_status")
+    async def update_handoff_status(self, team_name, user_id, timestamp, body, client):
+        """Share the case with the team and mark the case reply as handed off"""
+        reply_ts = body["message"]["ts"]
+        target_channel = self.get_team_channel(team_name)
         
-        if original_msg_result["ok"] and original_msg_result["messages"]:
-            original_message = original_msg_result["messages"][0]["text"]
-            
+        async def share_case():
+            if not target_channel:
+                raise LookupError(f"no channel for team {team_name}")
+            # Get the original message from the central_case channel
+            original_msg = await self.message_cache.get_message(client, config.CENTRAL_CASE_CHANNEL_ID, timestamp)
+            if not original_msg:
+                raise LookupError(f"original message {timestamp} not found")
             # Share to target channel as a new message but include context
-            target_channel = self.get_team_channel(team_name)
-            if target_channel:
-                await client.chat_postMessage(
-                    channel=target_channel,
-                    text=f"*Case handed off by <@{user_id}> to {team_name} team*\n\n{original_message}"
-                )
-            
-            # Update the reply in the thread to show it was handed off
-            await client.chat_update(
+            await client.chat_postMessage(
+                channel=target_channel,
+                text=f"*Case handed off by <@{user_id}> to {team_name} team*\n\n{original_msg['text']}"
+            )
+            return original_msg['text']
+        
+        # Mark the reply while the case is shared; it is corrected below if sharing fails
+        marked, shared = await asyncio.gather(
+            client.chat_update(
                 channel=config.CENTRAL_CASE_CHANNEL_ID,
-                ts=body["message"]["ts"],
+                ts=reply_ts,
                 text=f"Case has been handed off to {team_name} team by <@{user_id}>",
                 blocks=[
                     {
@@ -92,7 +126,26 @@ class TeamService:
                         }
                     }
                 ]
+            ),
+            share_case(),
+            return_exceptions=True
+        )
+        if isinstance(marked, Exception):
+            logger.error("Failed to mark hand-off to %s on %s: %s", team_name, reply_ts, marked)
+        
+        if isinstance(shared, Exception):
+            logger.error("Failed to hand off case %s to %s: %s", timestamp, team_name, shared)
+            # Slack shows blocks instead of text, so the notice goes above the original buttons
+            notice = f"⚠️ Hand-off to {team_name} team failed. Please try again."
+            await client.chat_update(
+                channel=config.CENTRAL_CASE_CHANNEL_ID,
+                ts=reply_ts,
+                text=notice,
+                blocks=[{"type": "section", "text": {"type": "mrkdwn", "text": notice}}] + (body["message"].get("blocks") or [])
             )
-            
-            
-        return False 
\ No newline at end of file
+            return False
+        
+        # Each hand-off is a labelled example for train_classifier.py
+        if self.handoff_log:
+            await self.handoff_log.record(shared, team_name, user_id)
+        return True
@@ -0,0 +1,92 @@
+import logging
+import asyncio
+import time
+
+logger = logging.getLogger(__name__)
+
+class TokenManager:
+    """Caches an OAuth access token and refreshes it before it expires"""
+
+    def __init__(self, fetch_token, default_ttl=3600, refresh_margin=300):
+        # fetch_token is an async callable returning (token, ttl_seconds) or None
+        self.fetch_token = fetch_token
+        self.default_ttl = default_ttl
+        self.refresh_margin = refresh_margin
+        self.token = None
+        self.expires_at = 0.0
+        self.refresh_count = 0
+        self._refresh_task = None
+        self._background_task = None
+
+    def is_valid(self):
+        """Return True if the cached token can still be used"""
+        return self.token is not None and time.monotonic() < self.expires_at
+
+    async def get_token(self):
+        """Return a valid token, refreshing it if needed"""
+        if self.is_valid():
+            return self.token
+        return await self.refresh()
+
+    async def refresh(self, stale_token=None):
+        """Refresh the token, sharing one in-flight request between callers.
+
+        If stale_token is given and the cached token has already moved on
+        (another caller refreshed it), the newer token is returned instead
+        of fetching again.
+        """
+        if stale_token is not None and self.token != stale_token and self.is_valid():
+            return self.token
+
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self._do_refresh())
+
+        # Shield so a cancelled caller does not cancel the shared refresh
+        return await asyncio.shield(self._refresh_task)
+
+    async def _do_refresh(self):
+        self.refresh_count += 1
+        result = await self.fetch_token()
+        if not result or not result[0]:
+            return None
+
+        token, ttl = result
+        if not ttl:
+            ttl = self.default_ttl
+        self.token = token
+        self.expires_at = time.monotonic() + ttl
+        logger.info("Access token refreshed, valid for %ss", int(ttl))
+        self._schedule_background_refresh(ttl)
+        return token
+
+    def _schedule_background_refresh(self, ttl):
+        """Refresh the token ahead of expiry so requests never wait on it"""
+        if self._background_task is not None and not self._background_task.done():
+            self._background_task.cancel()
+        delay = max(ttl - self.refresh_margin, ttl / 2)
+        self._background_task = asyncio.ensure_future(self._refresh_after(delay))
+
+    async def _refresh_after(self, delay):
+        try:
+            await asyncio.sleep(delay)
+            logger.info("Refreshing access token ahead of expiry")
+            # Drop our own handle so the new refresh can reschedule us
+            self._background_task = None
+            await self.refresh()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.exception("Background token refresh failed: %s", e)
+
+    def invalidate(self):
+        """Forget the cached token"""
+        self.token = None
+        self.expires_at = 0.0
+
+    async def close(self):
+        """Cancel any pending background refresh"""
+        for task in (self._background_task, self._refresh_task):
+            if task is not None and not task.done():
+                task.cancel()
+        self._background_task = None
+        self._refresh_task = None
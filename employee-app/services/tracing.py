@@ -0,0 +1,231 @@
+import logging
+import contextvars
+import functools
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+import config
+
+logger = logging.getLogger(__name__)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+class Span:
+    """One timed operation within a trace"""
+
+    def __init__(self, name, trace_id, parent_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": (self.end_ns - self.start_ns) / 1e6 if self.end_ns else None,
+            "attributes": self.attributes,
+            "error": self.error
+        }
+
+class NoopSpan:
+    """Stand-in used when tracing is disabled"""
+
+    trace_id = None
+    span_id = None
+
+    def set_attribute(self, key, value):
+        pass
+
+NOOP_SPAN = NoopSpan()
+
+def trace_id_for(key):
+    """Deterministic trace id, so every event about one Slack thread joins one trace"""
+    return hashlib.md5(repr(key).encode()).hexdigest()
+
+class JsonlSpanExporter:
+    """Appends finished spans to a JSON Lines file"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def export(self, spans):
+        with open(self.path, "a") as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+class OtlpSpanExporter:
+    """Posts finished spans to an OTLP/HTTP collector using the JSON encoding"""
+
+    def __init__(self, endpoint, service_name="employee-app"):
+        self.endpoint = endpoint
+        self.service_name = service_name
+
+    def _attribute(self, key, value):
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": key, "value": {"doubleValue": value}}
+        return {"key": key, "value": {"stringValue": str(value)}}
+
+    def _span(self, span):
+        otlp_span = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [self._attribute(k, v) for k, v in span.attributes.items()],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1}
+        }
+        if span.parent_id:
+            otlp_span["parentSpanId"] = span.parent_id
+        return otlp_span
+
+    def export(self, spans):
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [self._attribute("service.name", self.service_name)]},
+                "scopeSpans": [{"scope": {"name": self.service_name}, "spans": [self._span(s) for s in spans]}]
+            }]
+        }
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(payload).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=5) as response:
+            response.read()
+
+class Tracer:
+    """Creates spans and hands finished ones to an exporter on a background thread"""
+
+    def __init__(self, exporter=None, batch_size=100, flush_interval=2.0):
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        if exporter is not None:
+            self._thread = threading.Thread(target=self._export_loop, name="span-exporter", daemon=True)
+            self._thread.start()
+
+    @property
+    def enabled(self):
+        return self.exporter is not None
+
+    def current_span(self):
+        return _current_span.get()
+
+    def set_attribute(self, key, value):
+        """Set an attribute on the current span, if there is one"""
+        span = _current_span.get()
+        if span is not None:
+            span.set_attribute(key, value)
+
+    @contextmanager
+    def span(self, name, trace_key=None, parent=None, activate=True, **attributes):
+        """Time a block as a span.
+
+        The span is a child of parent, or of the current span. If trace_key
+        is given, e.g. (channel, thread_ts), a new root span is started in
+        that key's trace instead. Pass activate=False from async generators
+        so the span does not leak into the caller between yields.
+        """
+        if not self.enabled:
+            yield NOOP_SPAN
+            return
+
+        if trace_key is not None:
+            span = Span(name, trace_id_for(trace_key), attributes=attributes)
+        else:
+            parent = parent or _current_span.get()
+            if parent is None or parent is NOOP_SPAN:
+                span = Span(name, os.urandom(16).hex(), attributes=attributes)
+            else:
+                span = Span(name, parent.trace_id, parent.span_id, attributes)
+
+        token = _current_span.set(span) if activate else None
+        try:
+            yield span
+        except Exception as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            if token is not None:
+                _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            self._queue.put(span)
+
+    def _export(self, batch):
+        try:
+            self.exporter.export(batch)
+        except Exception as e:
+            logger.warning("Failed to export %d spans: %s", len(batch), e)
+
+    def _export_loop(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                span = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                if span is None:
+                    break
+                batch.append(span)
+            except queue.Empty:
+                pass
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._export(batch)
+                batch = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+        if batch:
+            self._export(batch)
+
+    def close(self, timeout=5.0):
+        """Export the spans still queued and stop the exporter thread"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+def build_tracer():
+    """Create the tracer selected by TRACING_EXPORTER (none, jsonl or otlp)"""
+    if config.TRACING_EXPORTER == "jsonl":
+        return Tracer(JsonlSpanExporter(config.TRACING_JSONL_PATH))
+    if config.TRACING_EXPORTER == "otlp":
+        return Tracer(OtlpSpanExporter(config.TRACING_OTLP_ENDPOINT))
+    return Tracer()
+
+# Process-wide tracer, like the metrics registry
+tracer = build_tracer()
+
+def traced(name, **attributes):
+    """Decorator running an async function inside a span"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with tracer.span(name, **attributes):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
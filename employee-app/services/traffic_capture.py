@@ -0,0 +1,149 @@
+import logging
+import gzip
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Fields holding credentials or signed URLs
+SECRET_KEYS = {"token", "app_token", "bot_token", "access_token", "response_url", "trigger_id"}
+
+# Fields naming a person; their values are replaced by a pseudonym that is stable within a process
+IDENTITY_KEYS = {
+    "name", "real_name", "real_name_normalized", "display_name", "display_name_normalized",
+    "username", "user_name", "first_name", "last_name", "email", "phone", "title"
+}
+# Slack user profiles; every string in them is pseudonymized
+PROFILE_KEYS = {"profile", "user_profile"}
+# Salted so pseudonyms cannot be reversed by hashing a guessed name
+_PSEUDONYM_SALT = os.urandom(16)
+
+# Case fields that decide routing; their values survive redaction so replays take the same path
+FIELD_LINE_RE = re.compile(r"^([ \t>*_]*(case number|summary|team|confidence|bot)[ \t]*:[*_ \t]*)(.*)$", re.I)
+WORD_RE = re.compile(r"<[@#!][^>]*>|\w+")
+
+def _mask(text):
+    """Replace words with x's of the same length, keeping mentions and the agentforce keyword"""
+    def mask_word(match):
+        word = match.group()
+        if word.startswith("<") or word.lower() == "agentforce":
+            return word
+        return "x" * len(word)
+    return WORD_RE.sub(mask_word, text)
+
+def redact_text(text):
+    """Mask free text in a message, keeping the layout of structured cases"""
+    lines = []
+    for line in text.split("\n"):
+        match = FIELD_LINE_RE.match(line)
+        if match is None:
+            lines.append(_mask(line))
+        elif match.group(2).lower() == "summary":
+            lines.append(match.group(1) + _mask(match.group(3)))
+        else:
+            lines.append(line)
+    return "\n".join(lines)
+
+def pseudonymize(value):
+    """Replace every string in value with a short salted hash, keeping its structure"""
+    if isinstance(value, str) and value:
+        return "anon-" + hashlib.blake2b(value.encode(), digest_size=6, key=_PSEUDONYM_SALT).hexdigest()
+    if isinstance(value, dict):
+        return {key: pseudonymize(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [pseudonymize(item) for item in value]
+    return value
+
+def redact(value):
+    """Return a copy of an envelope with secrets removed, user text masked and names pseudonymized"""
+    if isinstance(value, dict):
+        redacted = {}
+        for key, item in value.items():
+            if key in SECRET_KEYS:
+                redacted[key] = "REDACTED"
+            elif key in PROFILE_KEYS or (key in IDENTITY_KEYS and isinstance(item, str)):
+                redacted[key] = pseudonymize(item)
+            elif key == "actions":
+                # The clicked button: bot-defined ids and values, needed for replay
+                redacted[key] = item
+            elif key == "text" and isinstance(item, str):
+                redacted[key] = redact_text(item)
+            else:
+                redacted[key] = redact(item)
+        return redacted
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    return value
+
+class TrafficRecorder:
+    """Writes incoming Socket Mode envelopes to a gzip-compressed JSON Lines file.
+
+    record() is registered as a Socket Mode message listener. It only
+    queues the envelope; compression and disk writes happen on a
+    background thread.
+    """
+
+    def __init__(self, path, redact_content=True, flush_interval=1.0):
+        self.path = path
+        self.redact_content = redact_content
+        self.flush_interval = flush_interval
+        self.recorded = 0
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._write_loop, name="traffic-capture", daemon=True)
+        self._thread.start()
+        logger.info("Capturing Socket Mode traffic to %s", path)
+
+    async def record(self, client, message, raw_message=None):
+        if not message.get("envelope_id"):
+            # hello, disconnect and other control messages
+            return
+        self.recorded += 1
+        self._queue.put((time.time(), message))
+
+    def _write_loop(self):
+        # Append mode adds a new gzip member per run; readers see one stream
+        with gzip.open(self.path, "at", encoding="utf-8") as f:
+            last_flush = time.monotonic()
+            while True:
+                try:
+                    item = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    item = ()
+                if item is None:
+                    break
+                if item:
+                    received_at, message = item
+                    envelope = redact(message) if self.redact_content else message
+                    f.write(json.dumps({"received_at": received_at, "envelope": envelope}) + "\n")
+                if time.monotonic() - last_flush >= self.flush_interval:
+                    # Sync flush so a crashed process still leaves a readable capture
+                    f.flush()
+                    last_flush = time.monotonic()
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+            logger.info("Captured %d Socket Mode envelopes to %s", self.recorded, self.path)
+
+def read_capture(path):
+    """Yield (received_at, envelope) from a capture, stopping at a truncated tail"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.warning("Skipping unreadable line in %s", path)
+                    continue
+                yield record["received_at"], record["envelope"]
+        except (EOFError, gzip.BadGzipFile):
+            logger.warning("Capture %s ends early, probably from an unclean shutdown", path)
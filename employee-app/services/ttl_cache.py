@@ -0,0 +1,97 @@
+import time
+from collections import OrderedDict
+
+class TTLCache:
+    """Bounded LRU cache whose entries also expire after a fixed time.
+
+    With sizeof, the cache also keeps the total size of its values in bytes.
+    """
+
+    def __init__(self, maxsize=1000, ttl=None, sizeof=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.peek(key) is not None
+
+    def _expired(self, stored_at, now):
+        return self.ttl is not None and now - stored_at > self.ttl
+
+    def _remove(self, key):
+        value, _ = self._data.pop(key)
+        if self.sizeof is not None:
+            self.bytes -= self.sizeof(value)
+        return value
+
+    def get(self, key, default=None):
+        """Return a cached value and mark it as recently used"""
+        entry = self._data.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            if not self._expired(stored_at, time.monotonic()):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            self._remove(key)
+        self.misses += 1
+        return default
+
+    def peek(self, key, default=None):
+        """Return a cached value without touching LRU order or counters"""
+        entry = self._data.get(key)
+        if entry is None or self._expired(entry[1], time.monotonic()):
+            return default
+        return entry[0]
+
+    def set(self, key, value, age=0.0):
+        """Store a value, evicting the least recently used entries if full.
+
+        age counts time the value already spent elsewhere, e.g. in a disk
+        cache, against its TTL.
+        """
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (value, time.monotonic() - age)
+        if self.sizeof is not None:
+            self.bytes += self.sizeof(value)
+        while len(self._data) > self.maxsize:
+            self._remove(next(iter(self._data)))
+            self.evictions += 1
+
+    def pop(self, key, default=None):
+        if key not in self._data:
+            return default
+        return self._remove(key)
+
+    def purge_expired(self):
+        """Drop every expired entry and return how many were removed"""
+        if self.ttl is None:
+            return 0
+        now = time.monotonic()
+        expired = [key for key, (_, stored_at) in self._data.items() if self._expired(stored_at, now)]
+        for key in expired:
+            self._remove(key)
+        return len(expired)
+
+    def clear(self):
+        self._data.clear()
+        self.bytes = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / total if total else 0.0
+        }
@@ -0,0 +1,283 @@
+import logging
+import asyncio
+import time
+from collections import OrderedDict, deque
+import config
+from .metrics import WORK_QUEUE_PROCESSING, WORK_QUEUE_SHED, WORK_QUEUE_WAIT
+from .log_pipeline import current_log_context, log_context
+from .tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("reject", "drop_lower", "block")
+
+OVERLOADED_TEXT = ":warning: The bot is overloaded and could not take this request. Please try again in a few minutes."
+
+def overloaded_notice(client, channel, thread_ts):
+    """Coroutine factory that tells a thread its request was shed because the queue was full"""
+    return lambda: client.chat_postMessage(channel=channel, thread_ts=thread_ts, text=OVERLOADED_TEXT)
+
+# Priority classes for case work, highest first
+PRIORITY_CLASSES = ("auto_route", "handoff", "agentforce", "generic")
+
+class Job:
+    """A unit of background work and the time it was queued"""
+
+    def __init__(self, name, run, priority="generic", team=None, user=None, on_drop=None):
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority class: {priority}")
+        self.name = name
+        self.run = run
+        self.priority = priority
+        self.team = team
+        self.user = user
+        self.on_drop = on_drop
+        self.enqueued_at = time.monotonic()
+        # The span that queued the job, so its work joins the same trace
+        self.parent_span = tracer.current_span()
+        # Workers outlive the submitter's context, so carry its log fields along
+        self.log_context = current_log_context()
+
+class FairQueue:
+    """Priority queue that shares each class fairly between teams and users.
+
+    Higher classes are always served first. Within a class, teams take
+    turns, and within a team, reporting users take turns, so one noisy
+    reporter only delays their own cases.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        # priority -> team -> user -> deque of jobs
+        self.classes = {priority: OrderedDict() for priority in PRIORITY_CLASSES}
+        self.size = 0
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+        self._unfinished = 0
+        self._finished = asyncio.Event()
+        self._finished.set()
+
+    def qsize(self):
+        return self.size
+
+    def full(self):
+        return self.size >= self.maxsize
+
+    def class_sizes(self):
+        return {
+            priority: sum(len(jobs) for users in teams.values() for jobs in users.values())
+            for priority, teams in self.classes.items()
+        }
+
+    def put_nowait(self, job):
+        teams = self.classes[job.priority]
+        users = teams.setdefault(job.team, OrderedDict())
+        users.setdefault(job.user, deque()).append(job)
+        self.size += 1
+        self._unfinished += 1
+        self._finished.clear()
+        self._not_empty.set()
+        if self.full():
+            self._not_full.clear()
+
+    async def put(self, job):
+        while self.full():
+            await self._not_full.wait()
+        self.put_nowait(job)
+
+    def _pop(self, teams, busiest=False):
+        if busiest:
+            # Take the oldest job of the team and user with the most queued work
+            team = max(teams, key=lambda t: sum(len(jobs) for jobs in teams[t].values()))
+            users = teams[team]
+            user = max(users, key=lambda u: len(users[u]))
+            job = users[user].popleft()
+        else:
+            team, users = next(iter(teams.items()))
+            user, jobs = next(iter(users.items()))
+            job = jobs.popleft()
+            # Rotate so the next team and user get their turn
+            users.move_to_end(user)
+            teams.move_to_end(team)
+        if not users[user]:
+            del users[user]
+        if not users:
+            del teams[team]
+        self.size -= 1
+        if not self.size:
+            self._not_empty.clear()
+        self._not_full.set()
+        return job
+
+    async def get(self):
+        while not self.size:
+            await self._not_empty.wait()
+        for priority in PRIORITY_CLASSES:
+            if self.classes[priority]:
+                return self._pop(self.classes[priority])
+
+    def drop_one(self, priority):
+        """Remove a job no more important than priority, from the lowest busy class and its noisiest flow.
+
+        Returns None when every queued job outranks priority.
+        """
+        # PRIORITY_CLASSES runs highest first, so these are priority and every class below it
+        for candidate in reversed(PRIORITY_CLASSES[PRIORITY_CLASSES.index(priority):]):
+            if self.classes[candidate]:
+                job = self._pop(self.classes[candidate], busiest=True)
+                self.task_done()
+                return job
+        return None
+
+    def task_done(self):
+        self._unfinished -= 1
+        if self._unfinished <= 0:
+            self._finished.set()
+
+    async def join(self):
+        await self._finished.wait()
+
+class StageStats:
+    """Running totals for one stage (queue wait or processing) of one job type"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "avg": self.total / self.count if self.count else 0.0,
+            "max": self.max
+        }
+
+class WorkQueue:
+    """Runs event-handler work on a bounded pool of asyncio workers"""
+
+    def __init__(self, workers=None, maxsize=None, overflow=None):
+        self.workers = workers or config.WORK_QUEUE_WORKERS
+        self.maxsize = maxsize or config.WORK_QUEUE_SIZE
+        self.overflow = overflow or config.WORK_QUEUE_OVERFLOW
+        if self.overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown work queue overflow policy: {self.overflow}")
+        self.queue = FairQueue(self.maxsize)
+        self.in_flight = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.failed = 0
+        self.wait_stats = {}
+        self.class_wait_stats = {}
+        self.run_stats = {}
+        self._tasks = []
+        self._notices = set()
+
+    async def start(self):
+        """Start the worker tasks"""
+        if self._tasks:
+            return
+        self._tasks = [asyncio.ensure_future(self._worker(i)) for i in range(self.workers)]
+        logger.info("Work queue started with %s workers (max %s queued)", self.workers, self.maxsize)
+
+    async def close(self, drain_timeout=10):
+        """Let queued work finish for up to drain_timeout seconds, then stop the workers"""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Work queue closed with %s jobs still queued", self.queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, name, run, priority="generic", team=None, user=None, on_drop=None):
+        """Queue run() (a coroutine factory) and return True if it was accepted.
+
+        A rejected job is never run, so callers must tell the user. on_drop()
+        (a coroutine factory) does that for a job that was accepted but later
+        dropped to make room.
+        """
+        job = Job(name, run, priority, team, user, on_drop)
+        if not self.queue.full():
+            self.queue.put_nowait(job)
+            return True
+
+        if self.overflow == "block":
+            # Backpressure: the caller waits for a free slot
+            await self.queue.put(job)
+            return True
+
+        if self.overflow == "drop_lower":
+            # Make room by shedding the least important work, but never for a less important job
+            dropped = self.queue.drop_one(priority)
+            if dropped is not None:
+                self.dropped += 1
+                logger.warning("Work queue full, dropped %s job %s", dropped.priority, dropped.name)
+                WORK_QUEUE_SHED.inc(job=dropped.name, reason="dropped")
+                self._notify_dropped(dropped)
+                self.queue.put_nowait(job)
+                return True
+
+        self.rejected += 1
+        WORK_QUEUE_SHED.inc(job=name, reason="rejected")
+        logger.warning("Work queue full, rejected job %s", name)
+        return False
+
+    def _notify_dropped(self, job):
+        if job.on_drop is None:
+            return
+        async def notify():
+            try:
+                with log_context(**job.log_context):
+                    await job.on_drop()
+            except Exception as e:
+                logger.exception("Could not report dropped job %s: %s", job.name, e)
+        task = asyncio.ensure_future(notify())
+        # Keep a reference until it finishes so the task is not garbage collected
+        self._notices.add(task)
+        task.add_done_callback(self._notices.discard)
+
+    async def _worker(self, index):
+        while True:
+            job = await self.queue.get()
+            started = time.monotonic()
+            self.wait_stats.setdefault(job.name, StageStats()).record(started - job.enqueued_at)
+            self.class_wait_stats.setdefault(job.priority, StageStats()).record(started - job.enqueued_at)
+            WORK_QUEUE_WAIT.observe(started - job.enqueued_at, job=job.name, priority=job.priority)
+            self.in_flight += 1
+            try:
+                with log_context(**job.log_context), tracer.span(
+                    f"job.{job.name}",
+                    parent=job.parent_span,
+                    **{"job.priority": job.priority, "job.wait_ms": round((started - job.enqueued_at) * 1000, 1)}
+                ):
+                    await job.run()
+            except Exception as e:
+                self.failed += 1
+                logger.exception("Error in background job %s: %s", job.name, e)
+            finally:
+                self.in_flight -= 1
+                self.run_stats.setdefault(job.name, StageStats()).record(time.monotonic() - started)
+                WORK_QUEUE_PROCESSING.observe(time.monotonic() - started, job=job.name)
+                self.queue.task_done()
+
+    def stats(self):
+        return {
+            "queued": self.queue.qsize(),
+            "queued_by_class": self.queue.class_sizes(),
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "queue_wait": {name: s.as_dict() for name, s in self.wait_stats.items()},
+            "class_wait": {priority: s.as_dict() for priority, s in self.class_wait_stats.items()},
+            "processing": {name: s.as_dict() for name, s in self.run_stats.items()}
+        }
@@ -0,0 +1,58 @@
+import argparse
+import logging
+import random
+import time
+import config
+
+from services.team_classifier import TeamClassifier, read_handoff_log
+from services.log_pipeline import configure_logging
+
+# Configure logging
+log_pipeline = configure_logging()
+logger = logging.getLogger(__name__)
+
+def accuracy(classifier, examples, min_confidence=0):
+    """Share of the examples with at least min_confidence that were predicted correctly, and how many had it"""
+    correct = total = 0
+    for text, team in examples:
+        predicted, confidence = classifier.predict(text) or (None, 0)
+        if confidence >= min_confidence:
+            total += 1
+            correct += predicted == team
+    return (correct / total if total else 0.0), total
+
+def train(args):
+    """Fit the team classifier on logged hand-offs and save it"""
+    examples = list(read_handoff_log(args.log))
+    if len({team for _, team in examples}) < 2:
+        logger.error("Need hand-offs to at least two teams in %s, found %d examples", args.log, len(examples))
+        return
+    random.Random(0).shuffle(examples)
+    held_out = int(len(examples) * args.holdout)
+    test, training = examples[:held_out], examples[held_out:]
+
+    started = time.monotonic()
+    classifier = TeamClassifier.train([text for text, _ in training], [team for _, team in training],
+                                      dim=args.dim, epochs=args.epochs, l2=args.l2)
+    logger.info("Trained on %d hand-offs to %d teams in %.1fs", len(training), len(classifier.teams),
+                time.monotonic() - started)
+    if test:
+        overall, _ = accuracy(classifier, test)
+        routed, count = accuracy(classifier, test, 90)
+        logger.info("Held-out accuracy %.1f%% on %d cases; %.1f%% on the %d that would be auto-routed",
+                    overall * 100, len(test), routed * 100, count)
+    classifier.save(args.model)
+    logger.info("Saved team classifier to %s", args.model)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the team classifier from logged hand-off decisions")
+    parser.add_argument("--log", default=config.HANDOFF_LOG_PATH, help="Hand-off decisions (JSON Lines)")
+    parser.add_argument("--model", default=config.CLASSIFIER_MODEL_PATH, help="Where to save the model")
+    parser.add_argument("--dim", type=int, default=4096, help="Hashed feature dimensions")
+    parser.add_argument("--epochs", type=int, default=300, help="Gradient descent passes over the log")
+    parser.add_argument("--l2", type=float, default=1e-4, help="L2 regularization strength")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Share of the log held out for evaluation")
+    try:
+        train(parser.parse_args())
+    finally:
+        log_pipeline.close()